@@ -16,23 +16,46 @@ from batspp._exceptions import (
     warning_not_intended_for_cmd,
     )
 from batspp._token import (
-    Token,
+    Token, TokenData,
     )
 
 class ASTnode:
     """Abstract Syntax Tree node for Batspp"""
 
+    # First and last line of the tokens consumed by the rule that
+    # built the node, these are only set by the parser (see _Rule._run_rule)
+    #
+    # NOTE: child nodes are declared in the slots of every node class
+    __slots__ = ('start_line', 'end_line')
+
     def __init__(self) -> None:
         """Initialize AST node"""
         pass
 
+    def children(self) -> dict:
+        """Return child nodes (tokens, nodes or lists of them) by name"""
+        return {name: getattr(self, name) for name in type(self).__slots__}
+
+    def fingerprint(self, memo:'FingerprintMemo|None'=None) -> tuple:
+        """Return hashable representation of the node and its
+           descendants, with their values and line numbers, the
+           ones of descendants are kept in MEMO if provided"""
+        result = [type(self).__name__, getattr(self, 'start_line', None)]
+        for name in type(self).__slots__:
+            result.append(_fingerprint_of(getattr(self, name), memo))
+        return tuple(result)
+
     @property
     def line(self) -> int:
         """Return the line number of the node"""
-        # Search in children the lower line number
+        start_line = getattr(self, 'start_line', None)
+        if start_line is not None:
+            return start_line
+        # Nodes not built by the parser (e.g. by the semantic analizer)
+        # don't have a span, search in children the lower line number
         child_lines = []
-        for child in self.__dict__.values():
-            if isinstance(child, ASTnode) or isinstance(child, Token):
+        for child in self.children().values():
+            if isinstance(child, (ASTnode, Token)):
                 child_lines.append(child.line)
             elif isinstance(child, list):
                 for subchild in child:
@@ -43,9 +66,77 @@ class ASTnode:
             return min(child_lines)
         raise Exception('ASTnode.line: no line number found')
 
+def _fingerprint_of(child, memo:'FingerprintMemo|None'=None) -> any:
+    """Return hashable representation of CHILD (token, node or list of them)"""
+    if isinstance(child, ASTnode):
+        return child.fingerprint() if memo is None else memo.fingerprint(child)
+    if isinstance(child, Token):
+        return (child.variant, child.value, child.data.line)
+    if isinstance(child, list):
+        return tuple(_fingerprint_of(subchild, memo) for subchild in child)
+    return child
+
+class FingerprintMemo:
+    """
+    Fingerprints of nodes (see ASTnode.fingerprint()) kept for successive
+    trees sharing their unchanged nodes (see copy_tree()), only the
+    ones used since the previous call to rotate() are kept
+    """
+
+    def __init__(self) -> None:
+        # Fingerprints by the id of the node, with the node itself
+        # so the id isn't reused by another one while it's kept
+        self._previous = {}
+        self._current = {}
+
+    def fingerprint(self, node:ASTnode) -> tuple:
+        """Return fingerprint of NODE"""
+        key = id(node)
+        entry = self._current.get(key) or self._previous.get(key)
+        if entry is None or entry[0] is not node:
+            entry = (node, node.fingerprint(self))
+        self._current[key] = entry
+        return entry[1]
+
+    def rotate(self) -> None:
+        """Forget the fingerprints not used since the previous call"""
+        self._previous = self._current
+        self._current = {}
+
+def copy_tree(child, line_offset:int=0, copied:tuple=(ASTnode,)) -> any:
+    """Return copy of CHILD (token, node or list of them) and its descendant
+       nodes of COPIED types, with their line numbers moved by LINE_OFFSET (e.g.
+       to reuse the tree of a block of tests moved in the file), other nodes
+       and tokens are only copied if moved, otherwise these are shared"""
+    if isinstance(child, ASTnode):
+        if not line_offset and not isinstance(child, copied):
+            return child
+        result = object.__new__(type(child))
+        for name in ASTnode.__slots__:
+            line = getattr(child, name, None)
+            if line is not None:
+                setattr(result, name, line + line_offset)
+        for name in type(child).__slots__:
+            value = getattr(child, name)
+            # NOTE: checked here, as most children are shared tokens
+            if line_offset or isinstance(value, (list, copied)):
+                value = copy_tree(value, line_offset, copied)
+            setattr(result, name, value)
+        return result
+    if isinstance(child, Token):
+        if not line_offset or child.data.line is None:
+            return child
+        data = child.data
+        return Token(child.variant, child.value, TokenData(data.text_line, data.line + line_offset, data.column))
+    if isinstance(child, list):
+        return [copy_tree(subchild, line_offset, copied) for subchild in child]
+    return child
+
 class Text(ASTnode):
     """Text node"""
 
+    __slots__ = ('text',)
+
     def __init__(self, text: Token) -> None:
         """Initialize AST node"""
         self.text = text
@@ -53,6 +144,8 @@ class Text(ASTnode):
 class MultilineText(ASTnode):
     """Multiline text node"""
 
+    __slots__ = ('text_lines',)
+
     def __init__(self, text_lines: list) -> None:
         """Initialize AST node"""
         self.text_lines = text_lines # Tokens or Text nodes
@@ -60,6 +153,8 @@ class MultilineText(ASTnode):
 class CommandExtension(ASTnode):
     """Command extension node"""
 
+    __slots__ = ('greater', 'command')
+
     def __init__(self, greater: Token, command: Token) -> None:
         """Initialize AST node"""
         self.greater = greater
@@ -68,6 +163,8 @@ class CommandExtension(ASTnode):
 class Command(ASTnode):
     """Command node"""
 
+    __slots__ = ('peso', 'command', 'extensions')
+
     def __init__(self, peso: Token, command: Token, extensions: list=None) -> None:
         """Initialize AST node"""
         self.peso = peso
@@ -77,6 +174,8 @@ class Command(ASTnode):
 class ArrowAssertion(ASTnode):
     """Arrow EQ assertion node"""
 
+    __slots__ = ('actual', 'assertion', 'expected_lines')
+
     def __init__(self, actual: Token, assertion: Token, expected_lines: list) -> None:
         """Initialize AST node"""
         self.actual = actual
@@ -86,6 +185,8 @@ class ArrowAssertion(ASTnode):
 class CommandAssertion(ASTnode):
     """Command assertion node"""
 
+    __slots__ = ('command', 'expected')
+
     def __init__(self, command: Command, expected: MultilineText) -> None:
         """Initialize AST node"""
         self.command = command
@@ -94,6 +195,8 @@ class CommandAssertion(ASTnode):
 class Assertion(ASTnode):
     """Assertion node"""
 
+    __slots__ = ('assertion',)
+
     def __init__(self, assertion: 'CommandAssertion|ArrowAssertion') -> None:
         """Initialize AST node"""
         self.assertion = assertion
@@ -101,6 +204,8 @@ class Assertion(ASTnode):
 class ContinuationReferencePrefix(ASTnode):
     """Continuation reference prefix node"""
 
+    __slots__ = ('continuation', 'pointer')
+
     def __init__(self, continuation: Token, pointer: Token) -> None:
         """Initialize AST node"""
         self.continuation = continuation
@@ -109,6 +214,7 @@ class ContinuationReferencePrefix(ASTnode):
 class TestReference(ASTnode):
     """Test reference node"""
     __test__ = False # This is not a test case
+    __slots__ = ('pointer', 'reference')
 
     def __init__(self, pointer: 'Token|ContinuationReferencePrefix', reference: Token) -> None:
         """Initialize AST node"""
@@ -118,6 +224,8 @@ class TestReference(ASTnode):
 class SetupReference(ASTnode):
     """Setup reference node"""
 
+    __slots__ = ('setup', 'pointer', 'reference')
+
     def __init__(self, setup: Token, pointer: Token, reference: Token) -> None:
         """Initialize AST node"""
         self.setup = setup
@@ -127,12 +235,16 @@ class SetupReference(ASTnode):
 class StandaloneCommands(ASTnode):
     """Standalone commands node"""
 
+    __slots__ = ('commands',)
+
     def __init__(self, commands: list=[]) -> None:
         self.commands = commands
 
 class Setup(ASTnode):
     """Setup node"""
 
+    __slots__ = ('reference', 'commands')
+
     def __init__(self, reference: SetupReference, commands: StandaloneCommands) -> None:
         """Initialize AST node"""
         self.reference = reference
@@ -141,6 +253,7 @@ class Setup(ASTnode):
 class Test(ASTnode):
     """Test node"""
     __test__ = False # This is not a test case
+    __slots__ = ('reference', 'setup_assertions')
 
     def __init__(self, reference: TestReference, setup_assertions: list) -> None:
         """Initialize AST node"""
@@ -150,6 +263,8 @@ class Test(ASTnode):
 class GlobalSetup(ASTnode):
     """Global setup node"""
 
+    __slots__ = ('globalt', 'setup', 'one_time_commands', 'commands')
+
     def __init__(self, globalt:Token, setup: Token, commands: StandaloneCommands) -> None:
         """Initialize AST node"""
         self.globalt = globalt
@@ -160,6 +275,8 @@ class GlobalSetup(ASTnode):
 class GlobalTeardown(ASTnode):
     """Global teardown node"""
 
+    __slots__ = ('globalt', 'teardown', 'commands')
+
     def __init__(self, globalt:Token, teardown: Token, commands: StandaloneCommands) -> None:
         """Initialize AST node"""
         self.globalt = globalt
@@ -169,6 +286,7 @@ class GlobalTeardown(ASTnode):
 class TestOrSetup(ASTnode):
     """Test or setup node"""
     __test__ = False # This is not a test case
+    __slots__ = ('child',)
 
     ## TODO: remove all ast nodes like this that only are used to store one child node
 
@@ -179,6 +297,7 @@ class TestOrSetup(ASTnode):
 class TestSuite(ASTnode):
     """Test suite node"""
     __test__ = False # This is not a test case
+    __slots__ = ('constants', 'global_setup', 'tests_or_setups', 'global_teardown', 'eof')
 
     def __init__(
             self,
@@ -197,6 +316,8 @@ class TestSuite(ASTnode):
 class SetupAssertion(ASTnode):
     """Setup assertion node"""
 
+    __slots__ = ('setup', 'assertion')
+
     def __init__(self, setup: Setup, assertion: Assertion) -> None:
         """Initialize AST node"""
         self.setup = setup
@@ -205,6 +326,8 @@ class SetupAssertion(ASTnode):
 class Constants(ASTnode):
     """Constants node"""
 
+    __slots__ = ('constants',)
+
     def __init__(self, constants: list) -> None:
         """Initialize AST node"""
         self.constants = constants
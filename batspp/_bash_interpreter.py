@@ -8,12 +8,13 @@ Bash interpreter module
 """
 
 # Standard packages
-## NOTE: this is empty for now
+from io import TextIOBase
 
 # Installed packages
-from mezcla import debug
+## NOTE: this is empty for now
 
 # Local packages
+from batspp._trace import trace
 from batspp._exceptions import (
     warning_not_intended_for_cmd,
     )
@@ -38,18 +39,17 @@ class BashInterpreter(Interpreter):
         super().__init__()
 
     # pylint: disable=invalid-name
-    def visit_TestSuite(self, node: TestSuite) -> str:
-        """Visit TestSuite NODE"""
-        result = super().visit_TestSuite(node)
-        result += f'{SUMMARY_FUNCTION}\n'
-        return result
+    def emit_TestSuite(self, node: TestSuite, sink: TextIOBase) -> None:
+        """Write text of TestSuite NODE to SINK, followed by the summary"""
+        super().emit_TestSuite(node, sink)
+        sink.write(f'{SUMMARY_FUNCTION}\n')
 
     def build_test_header(self, test_name:str) -> str:
         """Build test header"""
         flatten_name = flatten_str(test_name)
         result = (
             f'function {flatten_name} {{\n'
-            f'    exec > /dev/null # avoid setup commands to show output\n'
+            f'    exec 3>&1 > /dev/null # save stdout, avoid setup commands to show output\n'
             f'    {SETUP_FUNCTION} "{flatten_name}"\n'
             )
         return result
@@ -60,7 +60,7 @@ class BashInterpreter(Interpreter):
         result = (
             '\n'
             f'    {TEARDOWN_FUNCTION}\n'
-            '    exec >/dev/tty # restore stdout\n'
+            '    exec >&3 # restore stdout\n'
             '    return 0\n'
             '}\n'
             f'{RUN_TEST_FUNCTION} "{test_name}" "{flatten_name}"\n\n'
@@ -87,7 +87,7 @@ class BashInterpreter(Interpreter):
         # Unify everything
         result = (
             f'{debug_cmd}'
-            '    exec >/dev/tty # restore stdout\n'
+            '    exec >&3 # restore stdout\n'
             f'    if [ "$({actual})" {operator} "$(echo -e {expected})" ]\n'
             '    then\n'
             '        : # keep\n'
@@ -97,7 +97,7 @@ class BashInterpreter(Interpreter):
             '    fi\n'
             '    exec > /dev/null # next setup commands should not show output\n'
             )
-        debug.trace(7, f'interpreter.build_assertion(operator={operator}, actual={actual}, expeted={expected}) => {result}')
+        trace(7, lambda: f'interpreter.build_assertion(operator={operator}, actual={actual}, expeted={expected}) => {result}')
         return result
 
 bash_interpreter = BashInterpreter()
@@ -11,9 +11,10 @@ Bats interpreter module
 ## NOTE: this is empty for now
 
 # Installed packages
-from mezcla import debug
+## NOTE: this is empty for now
 
 # Local packages
+from batspp._trace import trace
 from batspp._exceptions import (
     warning_not_intended_for_cmd,
     )
@@ -75,7 +76,7 @@ class BatsInterpreter(Interpreter):
             f'{debug_cmd}'
             f'\t[ "$({actual})" {operator} "$(echo -e {expected})" ]\n'
             )
-        debug.trace(7, f'interpreter.build_assertion(operator={operator}, actual={actual}, expeted={expected}) => {result}')
+        trace(7, lambda: f'interpreter.build_assertion(operator={operator}, actual={actual}, expeted={expected}) => {result}')
         return result
 
 bats_interpreter = BatsInterpreter()
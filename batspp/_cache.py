@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+#
+# Cache module
+#
+# This is responsible for caching on disk the abstract
+# syntax trees (AST) and the transpiled output of test files
+#
+
+"""
+Cache module
+
+This is responsible for caching on disk the abstract
+syntax trees (AST) of parsed test files, so unchanged
+files skip the lexer and the parser, and their transpiled
+output, so unchanged files skip the transpilation
+"""
+
+# Standard packages
+import os
+import pickle
+from contextlib import contextmanager
+from hashlib import sha256
+from io import StringIO, TextIOBase
+from shutil import copyfileobj
+from threading import get_ident
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._trace import trace
+from batspp.__version__ import __version__
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+from batspp._ast_node import TestSuite
+from batspp._parser import paused_gc
+from batspp._settings import (
+    AST_CACHE_SIZE, OUTPUT_CACHE_SIZE,
+    )
+from batspp.batspp_args import (
+    BatsppArgs,
+    )
+from batspp.batspp_opts import (
+    BatsppOpts,
+    )
+
+# Size of the chunks read to hash files
+CHUNK_SIZE = 1024 * 1024
+
+# Arguments that don't change the transpiled output
+IGNORED_ARGS = ('parse_workers', 'cache_dir')
+
+def fingerprint(opts:BatsppOpts, args:BatsppArgs) -> str:
+    """Return fingerprint of the OPTS and ARGS that change the transpiled output,
+       this is stable between processes unlike their hash"""
+    args_items = tuple(item for item in args.items() if item[0] not in IGNORED_ARGS)
+    return repr((opts.items(), args_items))
+
+class _DiskCache:
+    """
+    Base class of caches of test files, the entries are keyed by the
+    content of the file, the Batspp version and other KEY_PARTS (see key()),
+    entries are evicted by least recent use
+    """
+
+    # Extension of cache entries, this must be
+    # different for caches sharing the directory
+    entry_extension = ''
+
+    def __init__(self, directory:str, max_size:int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+
+    def key(self, file:str, *key_parts) -> str:
+        """Return cache key of test FILE with KEY_PARTS"""
+        digest = sha256()
+        with open(file, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest.update('|'.join(str(part) for part in (__version__,) + key_parts).encode())
+        return digest.hexdigest()
+
+    def _path(self, key:str) -> str:
+        """Return path of the entry of KEY"""
+        return os.path.join(self.directory, f'{key}{self.entry_extension}')
+
+    def _read(self, key:str) -> 'any|None':
+        """Return unpickled entry of KEY or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle, paused_gc():
+                result = pickle.load(handle)
+        except FileNotFoundError:
+            trace(5, f'{type(self).__name__}._read() miss {key}')
+            return None
+        except OSError as exc:
+            # E.g. the directory is not readable
+            trace(3, f'{type(self).__name__}._read() cannot read {path}: {exc}')
+            return None
+        except Exception as exc: # pylint: disable=broad-except
+            # Corrupted entries or from an incompatible version
+            trace(3, f'{type(self).__name__}._read() discarding {path}: {exc}')
+            self._remove(path)
+            return None
+        # Mark as recently used, unless it was just evicted
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        trace(5, f'{type(self).__name__}._read() hit {key}')
+        return result
+
+    def _write(self, key:str, entry:any) -> None:
+        """Pickle ENTRY of KEY, and evict entries if required,
+           the entry is not stored if the disk fails (e.g. if it's full)"""
+        try:
+            with self._writing(key, 'wb') as handle:
+                pickle.dump(entry, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as exc:
+            trace(3, f'{type(self).__name__}._write() not storing {key}: {exc}')
+
+    @contextmanager
+    def _writing(self, key:str, mode:str, encoding:'str|None'=None) -> 'Iterator[IO]':
+        """Yield handle opened with MODE to write the entry of KEY, the entry
+           is only stored if no exception is raised, then entries are evicted if required"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # NOTE: this is written to a temporal file of the process and thread
+        #       and renamed, so a concurrent load never reads an incomplete entry
+        temp_path = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+        try:
+            with open(temp_path, mode, encoding=encoding) as handle:
+                yield handle
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until
+           the size of the cache is not over MAX_SIZE"""
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(self.entry_extension):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            trace(5, f'{type(self).__name__}.evict() {path}')
+            self._remove(path)
+            total_size -= size
+
+    def _remove(self, path:str) -> None:
+        """Remove entry at PATH, if it still exists"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class AstCache(_DiskCache):
+    """
+    Cache of the trees of parsed test files, keyed by
+    the options that change the tokens (see key())
+    """
+
+    entry_extension = '.ast'
+
+    def __init__(self, directory:str, max_size:int=AST_CACHE_SIZE) -> None:
+        super().__init__(directory, max_size)
+
+    def key(self, file:str, opts:BatsppOpts, is_notebook:bool=False) -> str:
+        """Return cache key of test FILE parsed with OPTS,
+           IS_NOTEBOOK if FILE is converted from a Jupyter notebook"""
+        # NOTE: 'tree' tells apart older entries, which
+        #       also kept the optimization flags of the lexer
+        return super().key(file, opts.embedded_tests, is_notebook, 'tree')
+
+    def load(self, key:str) -> 'TestSuite|None':
+        """Return cached tree of KEY or None"""
+        return self._read(key)
+
+    def store(self, key:str, tree:TestSuite) -> None:
+        """Store TREE of KEY"""
+        self._write(key, tree)
+
+class OutputCache(_DiskCache):
+    """
+    Cache of the transpiled output of test files, keyed by
+    all the options and arguments that change it (see fingerprint()),
+    entries are plain text so these can be copied without loading them
+    """
+
+    entry_extension = '.txt'
+
+    def __init__(self, directory:str, max_size:int=OUTPUT_CACHE_SIZE) -> None:
+        super().__init__(directory, max_size)
+
+    def key(self, file:str, opts:BatsppOpts, args:BatsppArgs, is_notebook:bool=False) -> str:
+        """Return cache key of test FILE transpiled with OPTS and ARGS,
+           IS_NOTEBOOK if FILE is converted from a Jupyter notebook"""
+        return super().key(file, args.runner, fingerprint(opts, args), is_notebook)
+
+    def load(self, key:str) -> 'str|None':
+        """Return cached output of KEY or None"""
+        sink = StringIO()
+        return sink.getvalue() if self.copy_to(key, sink) else None
+
+    def copy_to(self, key:str, sink:TextIOBase) -> bool:
+        """Write cached output of KEY to SINK, returns False if it isn't cached"""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as handle:
+                # Mark as recently used
+                os.utime(path)
+                copyfileobj(handle, sink, CHUNK_SIZE)
+        except FileNotFoundError:
+            trace(5, f'OutputCache.copy_to() miss {key}')
+            return False
+        trace(5, f'OutputCache.copy_to() hit {key}')
+        return True
+
+    def store(self, key:str, transpiled:str) -> None:
+        """Store TRANSPILED output of KEY"""
+        with self.storing(key) as handle:
+            handle.write(transpiled)
+
+    def storing(self, key:str) -> 'ContextManager[TextIOBase]':
+        """Return context manager with the sink to write the output of KEY,
+           the output is only stored if no exception is raised"""
+        return self._writing(key, 'w', encoding='utf-8')
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#
+# Frozen module
+#
+# This provides the base class of
+# immutable and hashable configurations
+#
+
+"""
+Frozen module
+
+This provides the base class of immutable and hashable
+configurations, so these can be shared between threads
+and files, and used as (part of) cache keys
+"""
+
+# Standard packages
+## NOTE: this is empty for now
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+
+class Frozen:
+    """
+    Base class of immutable objects, the attributes are set
+    by __init__ and then frozen (see _freeze()), changed
+    copies are made with replace(), attributes must be hashable
+    """
+
+    def _freeze(self) -> None:
+        """Forbid changes to the attributes, this must be called at the end of __init__"""
+        object.__setattr__(self, '_frozen', True)
+
+    def __setattr__(self, name:str, value:any) -> None:
+        if self.__dict__.get('_frozen'):
+            raise AttributeError(f'{type(self).__name__} is immutable, use replace() to change {name}')
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name:str) -> None:
+        if self.__dict__.get('_frozen'):
+            raise AttributeError(f'{type(self).__name__} is immutable, {name} cannot be deleted')
+        object.__delattr__(self, name)
+
+    def fields(self) -> dict:
+        """Return attributes by name, these are the
+           keyword arguments of __init__ to rebuild the object"""
+        return {name: value for name, value in vars(self).items() if name != '_frozen'}
+
+    def items(self) -> tuple:
+        """Return sorted (name, value) pairs of the attributes"""
+        return tuple(sorted(self.fields().items()))
+
+    def replace(self, **changes) -> 'Frozen':
+        """Return a copy with the attributes of CHANGES"""
+        return type(self)(**{**self.fields(), **changes})
+
+    def __eq__(self, other:any) -> bool:
+        return type(self) is type(other) and self.items() == other.items()
+
+    def __hash__(self) -> int:
+        return hash((type(self).__name__, self.items()))
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={value!r}' for name, value in self.items())
+        return f'{type(self).__name__}({fields})'
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+#
+# Incremental parser module
+#
+# This is responsible for parsing successive versions of a
+# test file, tokenizing and parsing again only the changed parts
+#
+
+"""
+Incremental parser module
+
+This is responsible for parsing successive versions of a test file
+(e.g. while it's edited, see BatsppTest.watch()), only the lines changed
+since the previous version are tokenized again and only the blocks of
+tests with changed tokens are parsed again, the trees of the other
+blocks are reused (moved to their new lines if required)
+"""
+
+# Standard packages
+## NOTE: this is empty for now
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._trace import trace
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+from batspp._token import (
+    EOF, Token, TokenData, TokenList,
+    )
+from batspp._ast_node import copy_tree
+from batspp._lexer import (
+    Lexer, LexFacts, TextLiner,
+    _normalize_embedded_tests,
+    )
+from batspp._parser import (
+    parser, join_block_trees,
+    _encode_block, _parse_block,
+    )
+from batspp._semantic_analizer import MODIFIED_NODES
+from batspp._timer import Timer
+from batspp.batspp_args import (
+    BatsppArgs,
+    )
+from batspp.batspp_opts import (
+    BatsppOpts,
+    )
+
+class IncrementalParser:
+    """
+    Parser of successive versions of a test file, this keeps the tokens
+    of every line and the tree of every block of tests of the last version
+    """
+
+    def __init__(self) -> None:
+        self.lexer = Lexer()
+        # Tokens (variant, value and column) of every line by its
+        # text, with the facts found by the lexer in the line
+        self._line_spans = {}
+        # Token objects of every line by its index and text
+        self._line_tokens = {}
+        # Tree of every block of tokens by its key (see _block_key()),
+        # with the line of its first token
+        self._block_trees = {}
+        # Work done by the last parse()
+        self.lexed_lines = 0
+        self.parsed_blocks = 0
+        self.reused_blocks = 0
+
+    def _tokenize_line(self, line:str, index:int) -> tuple:
+        """Return (tokens, has_arrow_assertion, greater_token_present) of
+           LINE with INDEX, tokens are (variant, value, column) tuples"""
+        lexer = self.lexer
+        lexer.facts = LexFacts()
+        lexer.token_array = None
+        lexer.tokens_stack = []
+        lexer.extract_tokens_from_line(line, index)
+        tokens = tuple((token.variant, token.value, token.data.column) for token in lexer.pop_tokens())
+        return tokens, lexer.facts.has_arrow_assertion, lexer.facts.greater_token_present
+
+    def tokenize(self, text:str, opts:BatsppOpts) -> tuple:
+        """Return lines, list of tokens and LexFacts of TEXT, same as
+           Lexer.tokenize(), only the lines not found in the previous
+           version are tokenized, and only the moved ones are built again"""
+        if opts.embedded_tests:
+            text = _normalize_embedded_tests(text)
+        lines = TextLiner(text).lines
+        line_spans = {}
+        line_tokens = {}
+        facts = LexFacts()
+        tokens = []
+        self.lexed_lines = 0
+        for index, line in enumerate(lines):
+            entry = line_spans.get(line) or self._line_spans.get(line)
+            if entry is None:
+                entry = self._tokenize_line(line, index)
+                self.lexed_lines += 1
+            line_spans[line] = entry
+            spans, has_arrow_assertion, greater_token_present = entry
+            facts.has_arrow_assertion = facts.has_arrow_assertion or has_arrow_assertion
+            facts.greater_token_present = facts.greater_token_present or greater_token_present
+            if not spans:
+                continue
+            # NOTE: tokens aren't modified, so these are shared by the versions
+            key = (index, line)
+            line_tokens[key] = self._line_tokens.get(key) or [
+                Token(variant, value, TokenData(text_line=line, line=index + 1, column=column))
+                for variant, value, column in spans
+                ]
+            tokens += line_tokens[key]
+        tokens.append(Token(EOF, None, TokenData(text_line=None, line=len(lines) + 1, column=1)))
+        # Only the lines of the last version are kept
+        self._line_spans = line_spans
+        self._line_tokens = line_tokens
+        return lines, tokens, facts
+
+    def _block_key(self, lines:list, store:TokenList, start:int, stop:int, facts:LexFacts) -> tuple:
+        """Return key of the block of tokens of STORE from START to STOP,
+           i.e. the LINES of its tokens and the columns where it starts
+           and ends, so blocks only moved in the file have the same key"""
+        # NOTE: the tokens of a line only depend on its text
+        first = store.get(start).data
+        if stop < len(store):
+            # Blocks not at the end are parsed ended by an EOF token at the following one
+            following = store.get(stop).data
+            return (facts.has_arrow_assertion, facts.greater_token_present, first.column,
+                    following.column, tuple(lines[first.line - 1:following.line]))
+        return (facts.has_arrow_assertion, facts.greater_token_present, first.column,
+                None, tuple(lines[first.line - 1:]))
+
+    def parse(
+            self,
+            text: str,
+            opts: BatsppOpts = BatsppOpts(),
+            args: BatsppArgs = BatsppArgs(),
+            ) -> tuple:
+        """Builds an AST from TEXT, same as _Parser.parse(), the nodes
+           modified by the semantic analizer are copied (see MODIFIED_NODES).\n
+           Embedded tests are tokenized incrementally, but parsed whole"""
+        timer = Timer()
+        timer.start()
+        lines, tokens, facts = self.tokenize(text, opts)
+        self.parsed_blocks = 0
+        self.reused_blocks = 0
+        if opts.embedded_tests:
+            self.parsed_blocks = 1
+            return parser.parse(tokens, opts=opts, args=args, facts=facts)
+        store = TokenList(tokens)
+        # NOTE: cut before every test, so a change only affects its own block,
+        #       but the first one, as a global setup isn't a suite by itself
+        blocks = parser.split_blocks(store, len(store))
+        if len(blocks) > 1:
+            blocks[:2] = [(blocks[0][0], blocks[1][1])]
+        block_trees = {}
+        trees = []
+        for start, stop in blocks:
+            key = self._block_key(lines, store, start, stop, facts)
+            base = store.get(start).data.line
+            entry = block_trees.get(key) or self._block_trees.get(key)
+            if entry is None:
+                entry = (_parse_block(_encode_block(store, start, stop), facts), base)
+                self.parsed_blocks += 1
+            else:
+                self.reused_blocks += 1
+            block_trees[key] = entry
+            tree, tree_base = entry
+            trees.append(copy_tree(tree, base - tree_base, MODIFIED_NODES) if tree is not None else None)
+        # Only the blocks of the last version are kept
+        self._block_trees = block_trees
+        tree = join_block_trees(trees)
+        if tree is None:
+            trace(5, 'IncrementalParser.parse() failed, parsing again to get the syntax error')
+            return parser.parse(tokens, opts=opts, args=args, facts=facts)
+        trace(5, f'IncrementalParser.parse() lexed {self.lexed_lines} lines, parsed {self.parsed_blocks} '
+                 f'blocks, reused {self.reused_blocks} blocks in {timer.stop()} seconds')
+        return tree, opts, args
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
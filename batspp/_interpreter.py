@@ -14,12 +14,14 @@ bats-core tests from abstract syntax trees for Batspp
 """
 
 # Standard packages
+from io import StringIO, TextIOBase
 from re import sub as re_sub
 
 # Installed packages
-from mezcla import debug
+## NOTE: this is empty for now
 
 # Local packages
+from batspp._trace import trace
 from batspp._node_visitor import (
     ReferenceNodeVisitor,
     )
@@ -71,7 +73,19 @@ class Interpreter(ReferenceNodeVisitor):
     # pylint: disable=invalid-name
     def visit_TestSuite(self, node: TestSuite) -> str:
         """Visit TestSuite NODE"""
-        # Build text parts
+        sink = StringIO()
+        self.emit_TestSuite(node, sink)
+        result = sink.getvalue()
+        trace(7, lambda: f'interpreter.visit_TestsSuite(node={node}) => {result}')
+        return result
+
+    # pylint: disable=invalid-name
+    def emit_TestSuite(self, node: TestSuite, sink: TextIOBase) -> None:
+        """Write text of TestSuite NODE to SINK, test by test"""
+        # Tests suite should contain only tests on this point
+        # due to the semantic analyzer that merges setups into tests
+        if not node.tests_or_setups:
+            return
         header_text = (
             f'#!/usr/bin {self.args.runner}'
             f'{" " if self.args.run_opts else ""}'
@@ -81,24 +95,14 @@ class Interpreter(ReferenceNodeVisitor):
             '# https://github.com/LimaBD/batspp\n'
             '#\n\n'
             )
-        constants_text = self.visit(node.constants)
-        global_setup_text = self.visit_optional(node.global_setup, '')
-        global_teardown_text = self.visit_optional(node.global_teardown, '')
-        # Tests suite should contain only tests on this point
-        # due to the semantic analyzer that merges setups into tests
-        tests_text = ''.join([self.visit(test) for test in node.tests_or_setups])
-        # Finally merge all parts
-        result = ''
-        if tests_text:
-            result += '' \
-                + header_text \
-                + constants_text \
-                + global_setup_text \
-                + global_teardown_text \
-                + tests_text \
-                + ''
-        debug.trace(7, f'interpreter.visit_TestsSuite(node={node}) => {result}')
-        return result
+        sink.write(header_text)
+        sink.write(self.visit(node.constants))
+        if node.global_setup:
+            sink.write(self.visit(node.global_setup))
+        if node.global_teardown:
+            sink.write(self.visit(node.global_teardown))
+        for test in node.tests_or_setups:
+            sink.write(self.visit(test))
 
     # pylint: disable=invalid-name
     def visit_GlobalSetup(self, node: GlobalSetup) -> str:
@@ -120,7 +124,7 @@ class Interpreter(ReferenceNodeVisitor):
             )
         result += build_commands_block(self.visit(node.commands), '    ')
         result += '}\n\n'
-        debug.trace(7, f'interpreter.visit_GlobalSetup() => {result}')
+        trace(7, lambda: f'interpreter.visit_GlobalSetup() => {result}')
         return result
 
     # pylint: disable=invalid-name
@@ -143,7 +147,7 @@ class Interpreter(ReferenceNodeVisitor):
             f'{body}\n'
             '}\n\n'
             )
-        debug.trace(7, f'interpreter.visit_GlobalTeardown() => {result}')
+        trace(7, lambda: f'interpreter.visit_GlobalTeardown() => {result}')
         return result
 
     # pylint: disable=invalid-name
@@ -167,7 +171,7 @@ class Interpreter(ReferenceNodeVisitor):
             assert isinstance(t, SetupAssertion), 'Only SetupAssertion nodes should be at this point'
             result += self.visit(t)
         result += self.build_test_footer(name)
-        debug.trace(7, f'interpreter.visit_Test(node={node}) => {result}')
+        trace(7, lambda: f'interpreter.visit_Test(node={node}) => {result}')
         return result
 
     def build_test_header(self, test_name:str) -> str:
@@ -296,7 +300,7 @@ class Interpreter(ReferenceNodeVisitor):
         result = f'# Constants\n'
         result += '\n'.join([self.visit(cst) for cst in node.constants ])
         result += '\n\n'
-        debug.trace(7, f'Interpreter.visit_Constants() => "{result}"')
+        trace(7, lambda: f'Interpreter.visit_Constants() => "{result}"')
         return result
 
     # pylint: disable=invalid-name
@@ -313,6 +317,23 @@ class Interpreter(ReferenceNodeVisitor):
         """
         Interpret Batspp abstract syntax tree and build tests
         """
+        sink = StringIO()
+        self.interpret_into(tree, sink, opts=opts, args=args)
+        tests = sink.getvalue()
+        trace(7, lambda: f'Interpreter.interpret() => "{tests}"')
+        return tests
+
+    def interpret_into(
+            self,
+            tree: TestSuite,
+            sink: TextIOBase,
+            opts: BatsppOpts = BatsppOpts(),
+            args: BatsppArgs = BatsppArgs(),
+            ) -> None:
+        """
+        Interpret Batspp abstract syntax tree and write
+        the tests to SINK (e.g. a file) as they are built
+        """
         timer = Timer()
         timer.start()
         assert tree, 'invalid tree node'
@@ -321,14 +342,13 @@ class Interpreter(ReferenceNodeVisitor):
         self.opts = opts
         self.args = args
         #
-        tests = self.visit(tree)
-        debug.trace(7, f'Interpreter.interpret() => "{tests}" in {timer.stop()} seconds')
-        return tests
+        self.emit_TestSuite(tree, sink)
+        trace(5, f'Interpreter.interpret_into() in {timer.stop()} seconds')
 
 def flatten_str(string: str) -> str:
     """Returns unspaced and lowercase STRING"""
     result = re_sub(r' +', '-', string.lower())
-    debug.trace(7, f'interpreter.flatten_str({string}) => {result}')
+    trace(7, lambda: f'interpreter.flatten_str({string}) => {result}')
     return result
 
 def build_commands_block(
@@ -352,7 +372,7 @@ def build_commands_block(
         result += f'{indent}{command.strip()}{end_of_line}'
     if result and not result.endswith('\n'):
         result += '\n'
-    debug.trace(7, f'interpreter.build_commands_block({commands}) => {result}')
+    trace(7, lambda: f'interpreter.build_commands_block({commands}) => {result}')
     return result
 
 if __name__ == '__main__':
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+#
+# Lazy module
+#
+# This provides modules imported
+# on their first use
+#
+
+"""
+Lazy module
+
+This provides modules imported on their first use, for
+dependencies that are expensive to import and not
+required by the transpilation (e.g. mezcla.glue_helpers)
+"""
+
+# Standard packages
+from importlib import import_module
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+
+class LazyModule:
+    """Module NAME, imported on the first access to its attributes"""
+
+    def __init__(self, name:str) -> None:
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute:str) -> any:
+        # NOTE: only called for attributes not found, i.e. of the module
+        if self._module is None:
+            self._module = import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self) -> str:
+        return f'LazyModule({self._name!r}, imported={self._module is not None})'
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
@@ -17,23 +17,27 @@ a sentence/text apart into tokens for Batspp
 from re import (
     match as re_match,
     sub as re_sub,
+    compile as re_compile,
+    escape as re_escape,
     MULTILINE as re_MULTILINE,
     )
 from enum import Enum
 
 # Installed packages
-from mezcla import debug
+## NOTE: this is empty for now
 
 # Local packages
+from batspp._trace import trace, tracing
 from batspp._exceptions import (
     error, warning_not_intended_for_cmd,
     )
 from batspp._token import (
-    TokenData, Token, PESO, GREATER, SETUP, TEARDOWN,
+    TokenData, Token, TokenArray, PESO, GREATER, SETUP, TEARDOWN,
     TEST, POINTER, CONTINUATION, ASSERT_EQ, ASSERT_NE,
     TEXT, EOF, NEW_LINE, MINOR, GLOBAL,
     )
 from batspp._timer import Timer
+from batspp._source import MappedSource
 from batspp.batspp_args import (
     BatsppArgs,
     )
@@ -47,6 +51,69 @@ class Tags(Enum):
     END = '<END>' # end of assertion
     BLANK = '<BLANK>' # blank line
 
+# Master patterns
+#
+# All token patterns are compiled once (on first use) into a single alternation
+# with named groups, so every step of the lexer is one regex scan.
+#
+# NOTE: alternatives are tried in order from the current column,
+#       so the order of the groups is the priority of the tokens.
+#
+# Patterns checked against the full line, only at column 0
+LINE_PATTERN_SOURCE = (
+    r'(?P<DOUBLE_COMMENT>##)'
+    r'|(?P<EMPTY_COMMAND> *(?:\$|\>) *(?:#.+?)? *$)'
+    r'|(?P<EMPTY_LINE>$)'
+    )
+# Patterns checked from the current column
+TOKEN_PATTERN_SOURCE = (
+    r'(?P<PESO> *\$ *)'
+    r'|(?P<GREATER>\> )'
+    r'|(?P<TEST># *[Tt]est(?: +|$))'
+    r'|(?P<GLOBAL_SETUP># *[Gg]lobal *[Ss]etup(?: +|$))'
+    r'|(?P<SETUP># *[Ss]etup(?: +|$))'
+    r'|(?P<GLOBAL_TEARDOWN># *[Gg]lobal *[Tt]eardown(?: +|$))'
+    r'|(?P<TEARDOWN># *[Tt]eardown(?: +|$))'
+    r'|(?P<CONTINUATION># *(?:[Cc]ontinue|[Cc]ontinuation)(?: +|$))'
+    rf'|(?P<END_TAG>{re_escape(Tags.END.value)}|{re_escape(Tags.EOF.value)})'
+    rf'|(?P<BLANK_TAG>{re_escape(Tags.BLANK.value)})'
+    r'|(?P<POINTER> *of)'
+    r'|(?P<ASSERT_EQ> *=> *)'
+    r'|(?P<ASSERT_NE> *=\/> *)'
+    r'|(?P<COMMENT> *#.*?$)'
+    ## TODO: fix pattern not matching char before '#'
+    r'|(?P<TEXT>.+?(?=(?:[^\\](?:=>|=\/>|#)|$)))'
+    )
+# Compiled master patterns (LINE_PATTERN_SOURCE, TOKEN_PATTERN_SOURCE),
+# these are compiled on first use, see master_patterns()
+_master_patterns = None
+
+def master_patterns() -> tuple:
+    """Return compiled (line pattern, token pattern), compiling
+       them on the first call, so importing the lexer is cheap"""
+    global _master_patterns # pylint: disable=global-statement
+    if _master_patterns is None:
+        # NOTE: compiling twice from threads is harmless
+        _master_patterns = (re_compile(LINE_PATTERN_SOURCE), re_compile(TOKEN_PATTERN_SOURCE))
+    return _master_patterns
+
+# Token variants pushed by every matched group,
+# these reuse the matched text as token value.
+GROUP_VARIANTS = {
+    'PESO': (PESO,),
+    'GREATER': (GREATER,),
+    'TEST': (TEST,),
+    'GLOBAL_SETUP': (GLOBAL, SETUP),
+    'SETUP': (SETUP,),
+    'GLOBAL_TEARDOWN': (GLOBAL, TEARDOWN),
+    'TEARDOWN': (TEARDOWN,),
+    'CONTINUATION': (CONTINUATION,),
+    'POINTER': (POINTER,),
+    'ASSERT_EQ': (ASSERT_EQ,),
+    'ASSERT_NE': (ASSERT_NE,),
+    'TEXT': (TEXT,),
+    }
+
 class TextLiner:
     """
     This provides functionality to process text line per line
@@ -90,31 +157,71 @@ class TextLiner:
         self.line += 1
         self.column = 0
 
+class LexFacts:
+    """
+    Facts of a test file found by the lexer, these
+    are used to optimize the grammar (see _Parser.build_grammar())
+    """
+
+    __slots__ = ('has_arrow_assertion', 'greater_token_present')
+
+    def __init__(
+            self,
+            has_arrow_assertion: bool = False,
+            greater_token_present: bool = False,
+            ) -> None:
+        self.has_arrow_assertion = has_arrow_assertion
+        self.greater_token_present = greater_token_present
+
+    def __eq__(self, other:any) -> bool:
+        return isinstance(other, LexFacts) and (
+            self.has_arrow_assertion == other.has_arrow_assertion and
+            self.greater_token_present == other.greater_token_present
+            )
+
+    def __repr__(self) -> str:
+        return (
+            f'LexFacts(has_arrow_assertion={self.has_arrow_assertion}, '
+            f'greater_token_present={self.greater_token_present})'
+            )
+
 class Lexer:
     """
     This is responsible for breaking
     a sentence/text apart into tokens for Batspp
     """
 
-    def __init__(self) -> None:
+    def __init__(self, legacy_extraction:bool=False) -> None:
         # Global states variables
         self.opts = None
         self.args = None
+        # Facts of the text being tokenized
+        self.facts = None
         self.text = None
         self.tokens_stack = []
+        # Whether pushed tokens are traced, checked once per text (see push_token)
+        self._trace_tokens = False
+        # If present, tokens are stored here instead of in the stack
+        self.token_array = None
+        # The legacy extraction tries every pattern one by one,
+        # this is kept as reference for benchmarks and tests.
+        self.legacy_extraction = legacy_extraction
 
     def push_token(self, token: Token) -> None:
         """
         Push TOKEN to stack, this provides a debug trace
         """
-        debug.trace(7, f'Lexer.push_token(\ntoken={token}\n)')
+        # NOTE: guarded by a flag set per text instead of using trace(),
+        #       as this is called for every token
+        if self._trace_tokens:
+            trace(7, f'Lexer.push_token(\ntoken={token}\n)')
         self.tokens_stack.append(token)
 
     def pop_tokens(self) -> list:
         """Pop all tokens from the stack"""
         result = self.tokens_stack
         self.tokens_stack = []
-        debug.trace(7, f'lexer.pop_tokens => {result}')
+        trace(7, lambda: f'lexer.pop_tokens => {result}')
         return result
 
     def push_minor_token(self, token: Token) -> None:
@@ -125,13 +232,106 @@ class Lexer:
         assert token.variant is MINOR, 'wrong token variant, must be a MINOR'
 
         if self.tokens_stack and self.tokens_stack[-1].variant is MINOR:
-            debug.trace(7, f'Lexer.push_minor_token(token={token}) -> kicked!')
+            trace(7, lambda: f'Lexer.push_minor_token(token={token}) -> kicked!')
             return
 
         self.push_token(token)
 
-    def run_extraction_of_tokens(self):
+    def run_extraction_of_tokens(self) -> None:
         """Run extraction of all tokens from text"""
+        lines = self.text.lines
+        for index in range(self.text.line, len(lines)):
+            self.extract_tokens_from_line(lines[index], index, lines)
+        self.text.line = len(lines)
+        self.text.column = 0
+        self.push_eof_token(len(lines))
+
+    def push_eof_token(self, lines_count:int) -> None:
+        """Tokenize End of file after LINES_COUNT lines"""
+        self.emit_token(EOF, None, lines_count + 1, 1)
+
+    def emit_token(
+            self,
+            variant:str,
+            value:'str|None',
+            line:int,
+            column:int,
+            text_line:'str|None' = None,
+            lines = None,
+            literal:bool = False,
+            ) -> None:
+        """Emit token of VARIANT with VALUE at LINE and COLUMN, this is
+           appended to the token array if tokenizing into one, otherwise
+           is pushed as a Token object.\n
+           LITERAL values aren't part of the source line"""
+        if self.token_array is None:
+            self.push_token(Token(
+                variant,
+                value,
+                TokenData(text_line=text_line, line=line, column=column, lines=lines),
+                ))
+        elif literal:
+            self.token_array.append_literal(variant, value, line, column)
+        else:
+            self.token_array.append(variant, value, line, column)
+
+    def extract_tokens_from_line(self, line:str, index:int, lines=None) -> None:
+        """Extract tokens from text LINE with INDEX in a single scan,
+           if the source LINES are provided, tokens refer to them
+           instead of keeping a reference to the text line"""
+        text_line = None if lines is not None else line
+        line_number = index + 1
+        line_pattern, token_pattern = _master_patterns or master_patterns()
+        # For convention each token is responsible
+        # (at least) for the space that precedes it
+        #
+        # Skip double comments, empty commands (optionally
+        # with comments) and tokenize empty lines
+        match = line_pattern.match(line)
+        if match:
+            if match.lastgroup == 'EMPTY_LINE':
+                self.emit_token(NEW_LINE, match.group(), line_number, 1, text_line, lines)
+            return
+
+        column = 0
+        length = len(line)
+        while column < length:
+            match = token_pattern.match(line, column)
+            if match is None:
+                error(
+                    message='invalid syntax',
+                    text_line=line,
+                    line=line_number,
+                    column=column + 1,
+                    )
+            group = match.lastgroup
+            token_column = column + 1
+            column = match.end()
+
+            if group in GROUP_VARIANTS:
+                value = match.group()
+                for variant in GROUP_VARIANTS[group]:
+                    self.emit_token(variant, value, line_number, token_column, text_line, lines)
+                if group == 'GREATER':
+                    self.facts.greater_token_present = True
+                elif group in ('ASSERT_EQ', 'ASSERT_NE'):
+                    self.facts.has_arrow_assertion = True
+
+            # Tokenize tags EOF and END
+            elif group == 'END_TAG':
+                self.emit_token(MINOR, None, line_number, token_column, text_line, lines)
+
+            # Tokenize BLANK tag
+            elif group == 'BLANK_TAG':
+                self.emit_token(TEXT, '\n', line_number, token_column, text_line, lines, literal=True)
+
+            # Skip other comments that are not directives
+            else:
+                break
+
+    def run_extraction_of_tokens_by_patterns(self) -> None:
+        """Run extraction of all tokens from text,
+           trying every pattern one by one (legacy)"""
         ## TODO: refactor this copypaste caos
         ## TODO: implement usage of extra_indent to comments embedded tests
 
@@ -195,7 +395,7 @@ class Lexer:
                     match.group(),
                     data,
                     ))
-                self.opts.greater_token_present = True
+                self.facts.greater_token_present = True
                 continue
 
             # Tokenize test
@@ -316,7 +516,7 @@ class Lexer:
                     match.group(),
                     data,
                     ))
-                self.opts.has_arrow_assertion = True
+                self.facts.has_arrow_assertion = True
                 continue
 
             # Tokenize assert not equal
@@ -328,7 +528,7 @@ class Lexer:
                     match.group(),
                     data,
                     ))
-                self.opts.has_arrow_assertion = True
+                self.facts.has_arrow_assertion = True
                 continue
 
             # Skip other comments that are not directives
@@ -361,26 +561,108 @@ class Lexer:
 
     def tokenize(
             self,
-            text: str,
+            text: 'str|MappedSource',
             opts: BatsppOpts = BatsppOpts(),
             args: BatsppArgs = BatsppArgs()
-            ) -> list:
-        """Tokenize text"""
-        self.opts = opts
-        self.args = args
+            ) -> tuple:
+        """Tokenize text, which could be a memory-mapped source,
+           returns the list of tokens and their LexFacts"""
+        timer = Timer()
+        timer.start()
+        #
+        self.token_array = None
+        self._prepare_text(text, opts, args)
+        if self.legacy_extraction:
+            self.run_extraction_of_tokens_by_patterns()
+        else:
+            self.run_extraction_of_tokens()
         #
+        trace(7, lambda:
+            f'Lexer.tokenize(text={text}, opts, args) in {timer.stop()} seconds'
+            )
+        return self.pop_tokens(), self.facts
+
+    def tokenize_to_array(
+            self,
+            text: 'str|MappedSource',
+            opts: BatsppOpts = BatsppOpts(),
+            args: BatsppArgs = BatsppArgs()
+            ) -> tuple:
+        """Tokenize text into a compact TokenArray instead of a
+           list of tokens, returns the array and the LexFacts"""
         timer = Timer()
         timer.start()
         #
+        self._prepare_text(text, opts, args)
+        self.token_array = TokenArray(self.text.lines)
+        try:
+            self.run_extraction_of_tokens()
+            result = self.token_array
+        finally:
+            self.token_array = None
+        #
+        trace(7, lambda: f'Lexer.tokenize_to_array() in {timer.stop()} seconds')
+        return result, self.facts
+
+    def _prepare_text(
+            self,
+            text: 'str|MappedSource',
+            opts: BatsppOpts,
+            args: BatsppArgs,
+            ) -> None:
+        """Prepare TEXT to be tokenized"""
+        self.opts = opts
+        self.args = args
+        self.facts = LexFacts()
+        self._trace_tokens = tracing(7)
         if opts.embedded_tests:
+            if isinstance(text, MappedSource):
+                text = text.read()
             text = _normalize_embedded_tests(text)
         self.text = TextLiner(text)
-        self.run_extraction_of_tokens()
+
+    def tokenize_stream(
+            self,
+            file,
+            opts: BatsppOpts = BatsppOpts(),
+            args: BatsppArgs = BatsppArgs()
+            ):
+        """Tokenize text from FILE handle lazily, yielding tokens line per line.\n
+           Note that the LexFacts are unknown until the stream is exhausted,
+           so the parser uses the complete grammar for streams"""
+        self.opts = opts
+        self.args = args
+        self.facts = LexFacts()
+        self._trace_tokens = tracing(7)
+        self.tokens_stack = []
+        self.token_array = None
         #
-        debug.trace(7,
-            f'Lexer.tokenize(text={text}, opts, args) in {timer.stop()} seconds'
-            )
-        return self.pop_tokens(), opts, args
+        lines_count = 0
+        for line in _read_lines(file, opts.embedded_tests):
+            self.extract_tokens_from_line(line, lines_count)
+            lines_count += 1
+            yield from self.pop_tokens()
+        self.push_eof_token(lines_count)
+        yield from self.pop_tokens()
+
+def _read_lines(file, embedded_tests:bool):
+    """Yield lines from FILE handle, same as str.splitlines() over the
+       whole content, normalizing embedded tests if EMBEDDED_TESTS"""
+    if not embedded_tests:
+        for physical_line in file:
+            yield from physical_line.splitlines()
+        return
+
+    # Normalization patterns never match across a line with a '#',
+    # so the content is normalized in chunks ending with one of them
+    chunk = []
+    for physical_line in file:
+        chunk.append(physical_line)
+        if '#' in physical_line:
+            yield from _normalize_embedded_tests(''.join(chunk)).splitlines()
+            chunk = []
+    if chunk:
+        yield from _normalize_embedded_tests(''.join(chunk)).splitlines()
 
 def _normalize_embedded_tests(content: str) -> str:
     """Normalize embedded comment tests into tests"""
@@ -398,7 +680,7 @@ def _normalize_embedded_tests(content: str) -> str:
         flags=re_MULTILINE,
         )
 
-    debug.trace(7, f'normalize_embedded_tests({content}) => \n{result}')
+    trace(7, lambda: f'normalize_embedded_tests({content}) => \n{result}')
     return result
 
 lexer = Lexer()
@@ -11,9 +11,10 @@ Node visitor module
 ## NOTE: this is empty for now
 
 # Installed packages
-from mezcla import debug
+## NOTE: this is empty for now
 
 # Local packages
+from batspp._trace import trace
 from batspp._exceptions import (
     warning_not_intended_for_cmd,
     )
@@ -22,19 +23,77 @@ from batspp._ast_node import (
     ASTnode,
     )
 
+def node_types() -> dict:
+    """Return AST node classes by name"""
+    result = {}
+    pending = [ASTnode]
+    while pending:
+        node_type = pending.pop()
+        result[node_type.__name__] = node_type
+        pending += node_type.__subclasses__()
+    return result
+
+def walk(node: ASTnode, post_order:bool=False) -> 'Iterator[ASTnode]':
+    """Yield NODE and its descendant nodes in pre-order, or in
+       post-order if POST_ORDER, using an explicit stack instead
+       of recursion so the depth of the tree is not limited"""
+    # Pending nodes, with whether their children were already pushed
+    stack = [(node, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+            continue
+        if not post_order:
+            yield node
+        else:
+            stack.append((node, True))
+        children = []
+        for child in node.children().values():
+            if isinstance(child, ASTnode):
+                children.append(child)
+            elif isinstance(child, list):
+                children += [subchild for subchild in child if isinstance(subchild, ASTnode)]
+        # NOTE: reversed so the first child is the next one popped
+        stack += [(child, False) for child in reversed(children)]
+
 class NodeVisitor:
     """Implements a generic method visit"""
 
+    # Visit function by node type, built once for every visitor
+    # class from its visit_<node type> methods (see __init_subclass__)
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        types_by_name = node_types()
+        cls._dispatch = {}
+        for name in dir(cls):
+            node_type = types_by_name.get(name[len('visit_'):]) if name.startswith('visit_') else None
+            if node_type is not None:
+                cls._dispatch[node_type] = getattr(cls, name)
+
     def visit(self, node):
         """Generic method to visit NODE"""
+        try:
+            visitor = self._dispatch[type(node)]
+        except KeyError:
+            visitor = self._resolve_visitor(node)
+        return visitor(self, node)
+
+    def _resolve_visitor(self, node) -> 'function':
+        """Return visit function of NODE not found in the dispatch table
+           (e.g. node types defined after the visitor), this is then added"""
         if node is None:
             raise Exception("Node to visit can't be None")
         if not isinstance(node, ASTnode):
             raise Exception(f"Node to visit must be a ASTnode, not a {type(node).__name__}")
         method_name = f'visit_{type(node).__name__}'
-        visitor = getattr(self, method_name, self.generic_visitor)
-        debug.trace(7, f'NodeVisitor.visitor({node}) => {method_name}({node})')
-        return visitor(node)
+        visitor = getattr(type(self), method_name, type(self).generic_visitor)
+        trace(7, lambda: f'NodeVisitor._resolve_visitor({node}) => {visitor.__name__}')
+        # NOTE: copied, so the table of the base class is not updated
+        type(self)._dispatch = {**self._dispatch, type(node): visitor}
+        return visitor
 
     def visit_optional(self, node, default=None):
         """Generic method to visit optional NODE"""
@@ -42,6 +101,12 @@ class NodeVisitor:
             return default
         return self.visit(node)
 
+    def visit_walk(self, node: ASTnode, post_order:bool=False) -> None:
+        """Visit NODE and its descendant nodes without recursion, see walk(),
+           the visit methods shouldn't visit the children on this case"""
+        for descendant in walk(node, post_order=post_order):
+            self.visit(descendant)
+
     def generic_visitor(self, node) -> None:
         """Raise exception if the visit method to NODE not exist"""
         raise Exception(f'No visit_{type(node).__name__} method founded')
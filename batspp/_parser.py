@@ -14,10 +14,13 @@ an Abstract Syntax Tree (AST) for Batspp
 """
 
 # Standard packages
-## NOTE: this is empty for now
+import gc
+from contextlib import contextmanager
+from itertools import product, repeat
+from threading import RLock
 
 # Installed packages
-from mezcla import debug
+## NOTE: this is empty for now
 
 # Local packages
 from batspp._exceptions import (
@@ -27,6 +30,8 @@ from batspp._token import (
     PESO, GREATER, SETUP, TEARDOWN,
     TEST, POINTER, CONTINUATION, ASSERT_EQ,
     ASSERT_NE, TEXT, EOF, NEW_LINE, GLOBAL,
+    Token, TokenData, TokenArray, TokenList, TokenStream,
+    TokenView, VARIANTS, variant_code,
     )
 from batspp._ast_node import (
     ASTnode, TestSuite, TestOrSetup, GlobalTeardown,
@@ -36,7 +41,13 @@ from batspp._ast_node import (
     MultilineText, ArrowAssertion, StandaloneCommands,
     SetupAssertion,
     )
+from batspp._lexer import LexFacts
+from batspp._lazy import LazyModule
 from batspp._timer import Timer
+from batspp._trace import trace, tracing
+from batspp._settings import (
+    PARSE_BLOCKS_PER_WORKER,
+    )
 from batspp.batspp_args import (
     BatsppArgs,
     )
@@ -44,27 +55,166 @@ from batspp.batspp_opts import (
     BatsppOpts,
     )
 
-def copy_with_nested_lists(list_to_copy:list) -> list:
-    """Copy a list with nested lists, better than using list.copy(), [:]
-       because this copies the nested lists too, and better than a deepcopy
-       because only copy a limited deep level"""
-    result_copy = list_to_copy[:]
-    for i, item in enumerate(result_copy):
-        if isinstance(item, list):
-            result_copy[i] = item[:]
-    return result_copy
+# NOTE: imported on first use, only required to parse in parallel
+futures = LazyModule('concurrent.futures')
+# NOTE: imported on first use, only required to compile grammars
+parser_generator = LazyModule('batspp._parser_generator')
+
+# Lock of the built grammars of parsers, and of the pauses
+# of the garbage collector, as these are shared by threads
+_lock = RLock()
+# Nested or concurrent pauses of the garbage collector, see paused_gc()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+class _PackratMemo:
+    """
+    Results of the rules already run during a parse by (rule, token position),
+    so speculative lookaheads and backtracking never parse the same tokens twice
+    """
+
+    def __init__(self) -> None:
+        # Entries by position and then by rule,
+        # with (tree or _Failure, end position)
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, rule:'_Rule', position:int) -> 'tuple|None':
+        """Return memoized entry of RULE at POSITION, or None"""
+        entries = self._entries.get(position)
+        entry = entries.get(rule) if entries else None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, rule:'_Rule', position:int, entry:tuple) -> None:
+        """Store ENTRY of RULE at POSITION"""
+        entries = self._entries.get(position)
+        if entries is None:
+            entries = self._entries[position] = {}
+        entries[rule] = entry
+
+    def release(self, position:int) -> None:
+        """Release entries before POSITION"""
+        for released in [key for key in self._entries if key < position]:
+            del self._entries[released]
+
+    def hit_rate(self) -> float:
+        """Return ratio of lookups that were hits"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+class _TokenCursor:
+    """
+    Current position of a parse over a token store, the store is
+    shared by all the rules and never copied, so backtracking (or
+    recovering from a failed rule) only needs to restore the position
+    """
+
+    __slots__ = ('store', 'position', 'memo', 'traced')
+
+    def __init__(
+            self,
+            store: 'TokenList|TokenArray|TokenStream',
+            position:int = 0,
+            memo:_PackratMemo = None,
+            ) -> None:
+        self.store = store
+        self.position = position
+        self.memo = memo
+        # Whether the rules print debug traces, checked once per parse
+        self.traced = tracing(6)
+
+    def __bool__(self) -> bool:
+        return self.store.variant_code(self.position) is not None
+
+    def current(self) -> Token:
+        """Return current token, or raise IndexError if there are no more tokens"""
+        token = self.store.get(self.position)
+        if token is None:
+            raise IndexError('no more tokens to parse')
+        return token
+
+    def variant_code(self) -> 'int|None':
+        """Return variant code of the current token"""
+        return self.store.variant_code(self.position)
+
+    def release(self) -> None:
+        """Release tokens of the store (and memoized results) before current position"""
+        self.store.release(self.position)
+        if self.memo is not None:
+            self.memo.release(self.position)
+
+class _Failure:
+    """
+    Failure of a rule at some token position, rules return this instead of
+    raising a SyntaxError, as most of the failures are discarded by the
+    alternatives and loops, the error message (with the text line and
+    caret) is only built if the whole parse fails, see raise_error()
+    """
+
+    __slots__ = ('kind', 'expected', 'position')
+
+    # Kinds of failures
+    EXPECTED_TOKEN = 'expected token'
+    EXPECTED_SOME_OF = 'expected some of'
+    NOT_EXPECTED_FOUND = 'not-expected found'
+
+    def __init__(self, kind:str, expected, position:int) -> None:
+        self.kind = kind
+        # Token, tuple of tokens or rules, or (expected, not-expected)
+        self.expected = expected
+        self.position = position
+
+    def raise_error(self, store: 'TokenList|TokenArray|TokenStream') -> None:
+        """Raise the SyntaxError of this failure over the tokens of STORE"""
+        if self.kind == self.NOT_EXPECTED_FOUND:
+            expected, not_expected = self.expected
+            raise SyntaxError(f'Expected "{expected}" but got "{not_expected}"')
+        current = store.get(self.position)
+        if self.kind == self.EXPECTED_SOME_OF:
+            message = f'Expected some of "{self.expected}" but got "{current.variant}"'
+        else:
+            message = f'Expected "{self.expected}" but got "{current.variant}"'
+        error(
+            message=message,
+            text_line=current.data.text_line,
+            line=current.data.line,
+            column=current.data.column,
+            )
 
 class _RuleState:
-    """Rule state class"""
+    """
+    State of a single run of a rule, this is kept apart
+    from the rule definition, so the same rule (or grammar)
+    can be used by nested and consecutive parses safely
+    """
+
+    __slots__ = ('nodes', 'in_loop', 'cursor', 'debug_deep_level')
 
     def __init__(
             self,
-            nodes:list=[],
-            in_loop:bool=False,
+            cursor:_TokenCursor,
+            debug_deep_level:int = 1,
             ) -> None:
-        """init rule state"""
-        self.nodes = nodes
-        self.in_loop = in_loop
+        # Generated child nodes will be appended to the base AST node generated by the rule.
+        #    resulting_ast_node
+        #    /                \
+        # child_node_1 ... child_node_N
+        self.nodes = []
+        # This is used for loop instructions, determine if the child node should
+        # be appended to the child nodes or in a list, used for loop instructions.
+        #   resulting_ast_node
+        #  /                \
+        # child_node_N ... [child_node_N+1 ... ]
+        self.in_loop = False
+        # Position over the tokens to be parsed, shared with the nested rules
+        self.cursor = cursor
+        # This used for print debug messages
+        self.debug_deep_level = debug_deep_level
 
 class _Rule:
     """Grammar rule class"""
@@ -84,24 +234,13 @@ class _Rule:
         # Instructions are a list of tuples with a function and its parameters
         # that will be executed in order to build the AST tree from a list of tokens.
         self._instructions = []
-        # Generated child nodes will be appended to the base AST node generated by this rule.
-        #    resulting_ast_node
-        #    /                \
-        # child_node_1 ... child_node_N
-        self._generated_child_nodes = []
-        # This is used for loop instructions, determine if the child node should
-        # be appended to the child nodes or in a list, used for loop instructions.
-        #   resulting_ast_node
-        #  /                \
-        # child_node_N ... [child_node_N+1 ... ]
-        self._running_loop_instruction = False
-        # This is used when multiple parent rules use this rule,
-        # avoid mix the states of every call to this rule.
-        self._state_stack = []
-        # List of tokens to be parsed
-        self.tokens = []
-        # This used for print debug messages
-        self._debug_deep_level = 1
+        # NOTE: the state of every run of this rule (generated child
+        #       nodes, tokens...) is kept apart in a _RuleState
+        # Lookahead of this rule used by predictive parsing, FIRST is
+        # the set of variant codes that could start this rule (None while
+        # not computed) and NULLABLE if it could match without tokens
+        self._first = None
+        self._nullable = True
 
     def expect(self, token_or_rule) -> '_Rule':
         """Expect a token or another rule.\n
@@ -153,220 +292,328 @@ class _Rule:
         self._instructions[-1] = (func, (expected, not_expected))
         return self
 
-    def build_tree_from(self, tokens: list, debug_deep_level=0) -> ASTnode:
-        """Build an AST tree from a list of tokens"""
-        ## TODO: expecify that tuple(ASTnode, list) is returned
-        self._push_state()
-        self.tokens = tokens
-        self._debug_deep_level = debug_deep_level + 1
-        self._run_instructions()
+    def build_tree_from(self, tokens: 'list|TokenView', debug_deep_level=0) -> tuple:
+        """Build an AST tree from a list of tokens (or a view of a token store),
+           returns a tuple with the tree and the remaining tokens"""
+        if isinstance(tokens, TokenView):
+            cursor = _TokenCursor(tokens.store, tokens.position)
+        else:
+            cursor = _TokenCursor(TokenList(tokens))
+        generated_ast_tree = self.build_tree_at(cursor, debug_deep_level)
+        if isinstance(generated_ast_tree, _Failure):
+            generated_ast_tree.raise_error(cursor.store)
+        if isinstance(tokens, TokenView):
+            return generated_ast_tree, cursor.store.view(cursor.position)
+        return generated_ast_tree, tokens[cursor.position:]
+
+    def build_tree_at(self, cursor:_TokenCursor, debug_deep_level:int) -> 'ASTnode|_Failure':
+        """Build an AST tree from the tokens at CURSOR, advancing it, or return
+           a _Failure if the tokens don't match this rule (the cursor position
+           is undefined then), the result is memoized if the cursor has a memo"""
+        memo = cursor.memo
+        if memo is None:
+            return self._run_rule(cursor, debug_deep_level)
+        start = cursor.position
+        entry = memo.get(self, start)
+        if entry is not None:
+            tree, end = entry
+            if end is not None:
+                cursor.position = end
+            return tree
+        tree = self._run_rule(cursor, debug_deep_level)
+        if isinstance(tree, _Failure):
+            memo.store(self, start, (tree, None))
+        # NOTE: empty matches are not memoized, otherwise the same
+        #       node could be appended twice to the final tree
+        elif cursor.position > start:
+            memo.store(self, start, (tree, cursor.position))
+        return tree
+
+    def _run_rule(self, cursor:_TokenCursor, debug_deep_level:int) -> 'ASTnode|_Failure':
+        """Run instructions of this rule from CURSOR and build its AST node"""
+        state = _RuleState(cursor, debug_deep_level + 1)
+        start = cursor.position
+        # NOTE: the root rule releases the consumed tokens of
+        #       streams, so its first line is taken in advance
+        start_line = None
+        if state.debug_deep_level == 1:
+            start_line = cursor.store.line_number(start)
+        failure = self._run_instructions(state)
+        if failure is not None:
+            return failure
         generated_ast_tree = None
         if self._resulting_ast_node:
-            generated_ast_tree = self._resulting_ast_node(*self._generated_child_nodes)
-        self._pop_state()
-        return generated_ast_tree, self.tokens
+            generated_ast_tree = self._resulting_ast_node(*state.nodes)
+            # Span of lines of the consumed tokens, see ASTnode.line
+            if cursor.position > start:
+                if start_line is None:
+                    start_line = cursor.store.line_number(start)
+                generated_ast_tree.start_line = start_line
+                generated_ast_tree.end_line = cursor.store.line_number(cursor.position - 1)
+        return generated_ast_tree
+
+    def compute_lookahead(self) -> None:
+        """Compute FIRST set and nullability of this rule (and nested rules),
+           after this, alternatives that can't start with the next token are
+           skipped without running them, the rest are still run in order
+           (backtracking) which handles the choices that are not LL(1)"""
+        if self._first is not None:
+            return
+        first = set()
+        nullable = True
+        for func, params in self._instructions:
+            if func == self._run_expect_some_of:
+                subjects = params
+            elif func in (self._run_zero_or_more, self._run_one_or_more):
+                subjects = params[:1]
+                # Rule of until(), only used as lookahead
+                if params[1] is not None:
+                    _lookahead_of(params[1])
+            else:
+                subjects = (params,)
+            subjects_nullable = False
+            for subject in subjects:
+                # NOTE: nested rules are always computed, even
+                #       if they don't change the lookahead of this rule
+                subject_first, subject_nullable = _lookahead_of(subject)
+                if nullable:
+                    first |= subject_first
+                subjects_nullable = subjects_nullable or subject_nullable
+            optional = func in (self._run_optionally, self._run_zero_or_more, self._run_ignore_next)
+            if not (optional or subjects_nullable):
+                nullable = False
+        self._first = frozenset(first)
+        self._nullable = nullable
+
+    def _could_start_with_next(self, state:_RuleState, token_or_rule) -> bool:
+        """Predict if TOKEN_OR_RULE could match the next token, this is
+           only False when it is sure that running it will fail"""
+        code = state.cursor.variant_code()
+        if self._first is None or code is None:
+            return True
+        if isinstance(token_or_rule, str):
+            return code == variant_code(token_or_rule)
+        # pylint: disable=protected-access
+        if token_or_rule._first is None or token_or_rule._nullable:
+            return True
+        return code in token_or_rule._first
 
     def _append_instruction(self, func, params) -> None:
         """Append an rule instruction to the stack"""
         self._instructions.append((func, params))
 
-    def _run_instructions(self) -> None:
-        """Run all rule instructions in stack"""
-        self._print_debug('_run_instructions', '<start>')
+    def _run_instructions(self, state:_RuleState) -> 'None|_Failure':
+        """Run all rule instructions in stack, stops at the first failed one"""
+        self._print_debug(state, '_run_instructions', '<start>')
         for func, params in self._instructions:
             if isinstance(params, tuple):
-                func(*params)
+                failure = func(state, *params)
             else:
-                func(params)
-        self._print_debug('_run_instructions', '<stop>')
-
-    def _push_state(self) -> None:
-        """Save current state of this rule to the stack"""
-        new_state = _RuleState(
-            nodes=self._generated_child_nodes,
-            in_loop=self._running_loop_instruction
-        )
-        self._state_stack.append(new_state)
-        self._reset_state()
-
-    def _pop_state(self) -> None:
-        """Pop current state of this rule from the stack"""
-        if self._state_stack:
-            last_state = self._state_stack.pop()
-            self._generated_child_nodes = last_state.nodes
-            self._running_loop_instruction = last_state.in_loop
-        else:
-            self._reset_state()
-
-    def _reset_state(self) -> None:
-        """Reset current state of this rule"""
-        self._generated_child_nodes = []
-        self._running_loop_instruction = False
+                failure = func(state, params)
+            if failure is not None:
+                self._print_debug(state, '_run_instructions', '<failed>')
+                return failure
+        self._print_debug(state, '_run_instructions', '<stop>')
+        return None
 
-    def _eat_token(self, token) -> None:
-        """Eat a specific token from the tokens list, or raise an error"""
+    def _eat_token(self, state:_RuleState, token) -> 'None|_Failure':
+        """Eat a specific token from the tokens list, or return a failure"""
         def print_debug(result):
-            self._print_debug('_eat_token', f'{token} <{result}>')
-        if self.tokens[0].variant == token:
+            self._print_debug(state, '_eat_token', f'{token} <{result}>')
+        code = state.cursor.variant_code()
+        if code == variant_code(token):
             print_debug('ok')
-            self._append_child_node(self.tokens[0])
-            self.tokens = self.tokens[1:]
-        else:
-            print_debug('failed')
-            error(
-                message=f'Expected "{token}" but got "{self.tokens[0].variant}"',
-                text_line=self.tokens[0].data.text_line,
-                line=self.tokens[0].data.line,
-                column=self.tokens[0].data.column,
-                )
+            self._append_child_node(state, state.cursor.current())
+            state.cursor.position += 1
+            return None
+        print_debug('failed')
+        if code is None:
+            # NOTE: this raises IndexError, there are no more tokens
+            state.cursor.current()
+        return _Failure(_Failure.EXPECTED_TOKEN, token, state.cursor.position)
 
-    def _is_rule_followed(self, token_or_rule) -> bool:
+    def _mark_children(self, state:_RuleState) -> tuple:
+        """Return a mark of the generated child nodes to restore them later,
+           children are only appended (to the nodes or to the list of the
+           running loop) so lengths are enough instead of a copy"""
+        nodes = state.nodes
+        last_length = None
+        if nodes and isinstance(nodes[-1], list):
+            last_length = len(nodes[-1])
+        return len(nodes), last_length
+
+    def _restore_children(self, state:_RuleState, mark:tuple) -> None:
+        """Restore generated child nodes to MARK"""
+        length, last_length = mark
+        nodes = state.nodes
+        del nodes[length:]
+        if last_length is not None:
+            del nodes[-1][last_length:]
+
+    def _is_rule_followed(self, state:_RuleState, token_or_rule) -> bool:
         """Check if the next tokens follow a rule or match token without consuming them."""
-        self._print_debug('_is_rule_followed', str(token_or_rule))
+        self._print_debug(state, '_is_rule_followed', str(token_or_rule))
         result = False
-        tokens_backup = copy_with_nested_lists(self.tokens)
-        children_backup = copy_with_nested_lists(self._generated_child_nodes)
-        try:
-            self._run_expect(token_or_rule)
-            result = True
-        except SyntaxError:
-            pass
-        self.tokens = tokens_backup
-        self._generated_child_nodes = children_backup
+        if not self._could_start_with_next(state, token_or_rule):
+            return result
+        position = state.cursor.position
+        children_mark = self._mark_children(state)
+        result = self._run_expect(state, token_or_rule) is None
+        state.cursor.position = position
+        self._restore_children(state, children_mark)
         return result
 
-    def _run_expect(self, token_or_rule) -> None:
+    def _run_expect(self, state:_RuleState, token_or_rule) -> 'None|_Failure':
         """Run a expect rule"""
         def print_debug(result):
-            self._print_debug('_run_expect', f'{token_or_rule} <{result}>')
+            self._print_debug(state, '_run_expect', f'{token_or_rule} <{result}>')
         if isinstance(token_or_rule, _Rule):
             print_debug('running child tree')
-            child_tree, self.tokens = token_or_rule.build_tree_from(self.tokens, self._debug_deep_level)
-            self._append_child_node(child_tree)
-        elif isinstance(token_or_rule, str):
+            child_tree = token_or_rule.build_tree_at(state.cursor, state.debug_deep_level)
+            if isinstance(child_tree, _Failure):
+                return child_tree
+            self._append_child_node(state, child_tree)
+            return None
+        if isinstance(token_or_rule, str):
             print_debug('going to eat')
-            self._eat_token(token_or_rule)
-        else:
-            print_debug('failed')
-            raise Exception(f'Expected a Rule or Token but got {token_or_rule}')
+            return self._eat_token(state, token_or_rule)
+        print_debug('failed')
+        raise Exception(f'Expected a Rule or Token but got {token_or_rule}')
 
-    def _append_child_node(self, node: ASTnode) -> None:
+    def _append_child_node(self, state:_RuleState, node: ASTnode) -> None:
         """Append a child node to the generated child nodes list"""
-        self._print_debug('_append_child_node', f'{node}')
+        self._print_debug(state, '_append_child_node', f'{node}')
         # Loop instructions store a list of children instead of a single child node
-        if self._running_loop_instruction:
-            empty = not self._generated_child_nodes
-            no_list = not isinstance(self._generated_child_nodes[-1], list)
+        if state.in_loop:
+            empty = not state.nodes
+            no_list = not isinstance(state.nodes[-1], list)
             if empty or no_list:
                 raise Exception('Not appended a list when started running a loop')
-            self._generated_child_nodes[-1].append(node)
+            state.nodes[-1].append(node)
         else:
-            self._generated_child_nodes.append(node)
+            state.nodes.append(node)
 
-    def _run_optionally(self, token_or_rule) -> None:
+    def _run_optionally(self, state:_RuleState, token_or_rule) -> None:
         """Run a optionally rule if next tokens match,
            otherwise append a 'None' to the generated
            child nodes list and continue."""
-        self._print_debug('_run_optionally', f'{token_or_rule}')
-        tokens_backup = copy_with_nested_lists(self.tokens)
-        children_backup = copy_with_nested_lists(self._generated_child_nodes)
-        try:
-            self._run_expect(token_or_rule)
-        except SyntaxError:
-            self.tokens = tokens_backup
-            self._generated_child_nodes = children_backup
-            self._append_child_node(None)
+        self._print_debug(state, '_run_optionally', f'{token_or_rule}')
+        if not self._could_start_with_next(state, token_or_rule):
+            self._append_child_node(state, None)
+            return
+        position = state.cursor.position
+        children_mark = self._mark_children(state)
+        if self._run_expect(state, token_or_rule) is not None:
+            state.cursor.position = position
+            self._restore_children(state, children_mark)
+            self._append_child_node(state, None)
 
-    def _run_zero_or_more(self, expected, not_expected) -> None:
+    def _run_zero_or_more(self, state:_RuleState, expected, not_expected) -> None:
         """Run EXPECTED rule zero or more times until NOT_EXPECTED is found"""
         def print_debug(status):
-            self._print_debug('_run_zero_or_more', f'{expected} <{status}>')
-        self._setup_loop_instruction()
+            self._print_debug(state, '_run_zero_or_more', f'{expected} <{status}>')
+        self._setup_loop_instruction(state)
         print_debug('starting')
-        while self.tokens:
+        while state.cursor:
             print_debug('loop')
+            if not self._could_start_with_next(state, expected):
+                print_debug('predicted failure')
+                break
             if not_expected is not None:
-                if self._is_rule_followed(not_expected):
+                if self._is_rule_followed(state, not_expected):
                     print_debug('not-expected found')
                     break
-            try:
-                self._run_expect(expected)
-                print_debug('ok')
-                continue # not necessary, but more readable
-            except SyntaxError:
+            position = state.cursor.position
+            if self._run_expect(state, expected) is not None:
                 print_debug('failed')
+                state.cursor.position = position
                 break
-        self._teardown_loop_instruction()
+            print_debug('ok')
+            self._release_consumed_tokens(state)
+        self._teardown_loop_instruction(state)
 
-    def _run_one_or_more(self, expected, not_expected) -> None:
+    def _run_one_or_more(self, state:_RuleState, expected, not_expected) -> 'None|_Failure':
         """Run EXPECTED rule one or more times until NOT_EXPECTED is found"""
-        self._print_debug('_run_one_or_more', f'{expected}, {not_expected} <starting>')
-        self._setup_loop_instruction()
+        self._print_debug(state, '_run_one_or_more', f'{expected}, {not_expected} <starting>')
+        self._setup_loop_instruction(state)
         if not_expected is not None:
-            if self._is_rule_followed(not_expected):
-                self._print_debug('_run_one_or_more', f"{not_expected} <not-expected found>")
-                raise SyntaxError(f'Expected "{expected}" but got "{not_expected}"')
-        self._run_expect(expected)
-        self._run_zero_or_more(expected, not_expected)
-        self._teardown_loop_instruction()
-        self._print_debug('_run_one_or_more', f"{expected} <finished>")
-
-    def _setup_loop_instruction(self) -> None:
+            if self._is_rule_followed(state, not_expected):
+                self._print_debug(state, '_run_one_or_more', f"{not_expected} <not-expected found>")
+                return _Failure(_Failure.NOT_EXPECTED_FOUND, (expected, not_expected), state.cursor.position)
+        failure = self._run_expect(state, expected)
+        if failure is not None:
+            return failure
+        self._run_zero_or_more(state, expected, not_expected)
+        self._teardown_loop_instruction(state)
+        self._print_debug(state, '_run_one_or_more', f"{expected} <finished>")
+        return None
+
+    def _release_consumed_tokens(self, state:_RuleState) -> None:
+        """Release already consumed tokens of a stream, this is only
+           safe on the root rule, which never backtracks past a loop step"""
+        is_root = state.debug_deep_level == 1
+        if is_root:
+            state.cursor.release()
+
+    def _setup_loop_instruction(self, state:_RuleState) -> None:
         """Setup this rule to START a loop instruction"""
-        if not self._running_loop_instruction:
-            self._generated_child_nodes.append([])
-        self._running_loop_instruction = True
+        if not state.in_loop:
+            state.nodes.append([])
+        state.in_loop = True
 
-    def _teardown_loop_instruction(self) -> None:
+    def _teardown_loop_instruction(self, state:_RuleState) -> None:
         """Setup this rule to END a loop instruction"""
-        self._running_loop_instruction = False
+        state.in_loop = False
 
-    def _run_expect_some_of(self, *tokens_or_rules) -> None:
+    def _run_expect_some_of(self, state:_RuleState, *tokens_or_rules) -> 'None|_Failure':
         """Expect at least any TOKENS_OR_RULES next"""
         def print_debug(branch):
-            self._print_debug('_run_expect_some_of', f'{tokens_or_rules} <{branch}>')
+            self._print_debug(state, '_run_expect_some_of', f'{tokens_or_rules} <{branch}>')
         print_debug('starting')
         ## TODO: refactor, decide what branch of expected rules go without run entire rule first
+        position = state.cursor.position
         for token_or_rule in tokens_or_rules:
             print_debug(f'checking {token_or_rule}')
-            try:
-                self._run_expect(token_or_rule)
+            if not self._could_start_with_next(state, token_or_rule):
+                print_debug(f'{token_or_rule} predicted failure')
+                continue
+            if self._run_expect(state, token_or_rule) is None:
                 print_debug(f'{token_or_rule} ok')
-                return
-            except SyntaxError:
-                print_debug(f'{token_or_rule} failed')
-                continue # not necessary, but more readable
-        error(
-            message=f'Expected some of "{tokens_or_rules}" but got "{self.tokens[0].variant}"',
-            text_line=self.tokens[0].data.text_line,
-            line=self.tokens[0].data.line,
-            column=self.tokens[0].data.column,
-            )
+                return None
+            print_debug(f'{token_or_rule} failed')
+            state.cursor.position = position
+        if state.cursor.variant_code() is None:
+            # NOTE: this raises IndexError, there are no more tokens
+            state.cursor.current()
+        return _Failure(_Failure.EXPECTED_SOME_OF, tokens_or_rules, position)
 
-    def _run_ignore_next(self, token_or_rule) -> None:
+    def _run_ignore_next(self, state:_RuleState, token_or_rule) -> None:
         """Advance TOKEN_OR_RULE, but don't append any child node"""
-        children_backup = copy_with_nested_lists(self._generated_child_nodes)
-        while self.tokens:
-            self._print_debug('_run_ignore_next', f'{token_or_rule} <running loop>')
-            try:
-                self._run_expect(token_or_rule)
-            except SyntaxError:
+        children_mark = self._mark_children(state)
+        while state.cursor:
+            self._print_debug(state, '_run_ignore_next', f'{token_or_rule} <running loop>')
+            if not self._could_start_with_next(state, token_or_rule):
                 break
-        self._generated_child_nodes = children_backup
+            position = state.cursor.position
+            if self._run_expect(state, token_or_rule) is not None:
+                state.cursor.position = position
+                break
+        self._restore_children(state, children_mark)
 
-    def _print_debug(self, method_name:str, notes:str) -> None:
+    def _print_debug(self, state:_RuleState, method_name:str, notes:str) -> None:
         """Print debug information"""
         # Optimization shortcut if debugging is not required
         # This makes the parser x1.6 faster
-        if debug.trace_level < 6:
+        if not state.cursor.traced:
             return
         #
-        variant = self.tokens[0].variant if self.tokens else 'None'
-        line_number = self.tokens[0].data.line if self.tokens else -1
-        debug.trace(7, (
+        token = state.cursor.store.get(state.cursor.position)
+        variant = token.variant if token else 'None'
+        line_number = token.data.line if token else -1
+        trace(7, (
             f'{variant} '
             f'(l {str(line_number)})\t'
-            f'{">" * self._debug_deep_level}\t'
+            f'{">" * state.debug_deep_level}\t'
             f'{self}.{method_name}:\t'
             f'{notes}'
         ))
@@ -374,9 +621,90 @@ class _Rule:
     def __repr__(self):
         return self._alias
 
+def _lookahead_of(token_or_rule) -> tuple:
+    """Returns (FIRST set, nullable) of TOKEN_OR_RULE"""
+    if isinstance(token_or_rule, _Rule):
+        # pylint: disable=protected-access
+        token_or_rule.compute_lookahead()
+        return token_or_rule._first, token_or_rule._nullable
+    return {variant_code(token_or_rule)}, False
+
 class _Parser:
     """Batspp parser class"""
 
+    def __init__(
+            self,
+            predictive:bool = True,
+            memoize:bool = True,
+            compiled:bool = True,
+            generated_dir:str = '',
+            ) -> None:
+        # Predictive parsing skips alternatives using the next
+        # token, otherwise every alternative is tried (backtracking)
+        self.predictive = predictive
+        # Packrat memoization of rules results, the memo of the
+        # latest parse (of any thread) is kept to check its hit rate
+        self.memoize = memoize
+        self.last_memo = None
+        # Grammars already built by their flags, rules don't keep
+        # any state of the parses so the same grammar can be reused
+        self._grammars = {}
+        # Grammars compiled into Python functions (see _parser_generator),
+        # these are used for lists and arrays of tokens, the rules are still
+        # interpreted for streams, debug traces and to report syntax errors.
+        # The generated source is written to GENERATED_DIR if provided
+        self.compiled = compiled
+        self.generated_dir = generated_dir
+        self._compiled_grammars = {}
+
+    def build_all_grammars(self) -> None:
+        """Build (and compile, if enabled) the grammars of every combination
+           of flags, e.g. for a long-lived process serving many files"""
+        for flags in product((False, True), repeat=3):
+            if self.compiled:
+                self.get_compiled_grammar(*flags)
+            else:
+                self.get_grammar(*flags)
+
+    def get_compiled_grammar(
+            self,
+            embedded_tests:bool,
+            has_arrow_assertion:bool,
+            greater_token_present:bool,
+            ) -> '_CompiledGrammar':
+        """Returns the grammar rules for Batspp compiled
+           into Python functions, each grammar is compiled only once"""
+        key = (bool(embedded_tests), bool(has_arrow_assertion), bool(greater_token_present))
+        compiled_grammar = self._compiled_grammars.get(key)
+        if compiled_grammar is None:
+            with _lock:
+                compiled_grammar = self._compiled_grammars.get(key)
+                if compiled_grammar is None:
+                    path = ''
+                    if self.generated_dir:
+                        flags = '_'.join(str(int(flag)) for flag in key)
+                        path = f'{self.generated_dir}/grammar_{flags}.py'
+                    compiled_grammar = parser_generator.compile_grammar(self.get_grammar(*key), path)
+                    self._compiled_grammars[key] = compiled_grammar
+        return compiled_grammar
+
+    def get_grammar(
+            self,
+            embedded_tests:bool,
+            has_arrow_assertion:bool,
+            greater_token_present:bool,
+            ) -> '_Rule':
+        """Returns the grammar rules for Batspp, same as
+           build_grammar() but each grammar is built only once"""
+        key = (bool(embedded_tests), bool(has_arrow_assertion), bool(greater_token_present))
+        grammar = self._grammars.get(key)
+        if grammar is None:
+            with _lock:
+                grammar = self._grammars.get(key)
+                if grammar is None:
+                    grammar = self._grammars[key] = self.build_grammar(*key)
+        return grammar
+
     def build_grammar(
             self,
             embedded_tests:bool,
@@ -528,29 +856,196 @@ class _Parser:
             .one_or_more(test_or_setup).optionally(global_teardown) \
             .expect(EOF)
 
-        debug.trace(5, f'Parser.build_grammar(...) in {timer.stop()} seconds')
+        if self.predictive:
+            test_suite.compute_lookahead()
+
+        trace(5, f'Parser.build_grammar(...) in {timer.stop()} seconds')
         return test_suite
 
     def parse(
             self,
             tokens: list,
             opts: BatsppOpts = None,
-            args: BatsppArgs = None
+            args: BatsppArgs = None,
+            facts: 'LexFacts|None' = None,
             ) -> ASTnode:
-        """Builds an Abstract Syntax Tree (AST) from TOKENS list following the Batspp grammar."""
+        """Builds an Abstract Syntax Tree (AST) from TOKENS list following the Batspp grammar.\n
+           TOKENS could also be a TokenArray, or a lazy iterable (e.g. Lexer.tokenize_stream), which is
+           consumed through a lookahead buffer releasing every parsed test.\n
+           The grammar is optimized with the lexer FACTS of TOKENS, if provided"""
         timer = Timer()
         timer.start()
         #
-        grammar = self.build_grammar(
+        # Facts of streamed tokens are unknown until
+        # the end, so the complete grammar is used
+        streaming = not isinstance(tokens, (list, TokenArray))
+        if facts is None or streaming:
+            facts = LexFacts(has_arrow_assertion=True, greater_token_present=True)
+        grammar = self.get_grammar(
             opts.embedded_tests,
-            opts.has_arrow_assertion,
-            opts.greater_token_present
+            facts.has_arrow_assertion,
+            facts.greater_token_present,
             )
-        tree, _ = grammar.build_tree_from(tokens)
+        if streaming:
+            tokens = TokenStream(tokens)
+        elif isinstance(tokens, list):
+            tokens = TokenList(tokens)
         #
-        debug.trace(5, f'Parser.parse() in {timer.stop()} seconds')
+        result = None
+        if self.compiled and not streaming and not tracing(6):
+            compiled_grammar = self.get_compiled_grammar(
+                opts.embedded_tests,
+                facts.has_arrow_assertion,
+                facts.greater_token_present,
+                )
+            result = compiled_grammar.parse(tokens)
+        if result is not None:
+            tree, _ = result
+        else:
+            # NOTE: if the compiled grammar fails, the interpreted
+            #       grammar raises the syntax error with its details
+            memo = _PackratMemo() if self.memoize else None
+            tree = grammar.build_tree_at(_TokenCursor(tokens, memo=memo), debug_deep_level=0)
+            self.last_memo = memo
+            if memo is not None:
+                trace(5, f'Parser.parse() memo hits {memo.hits} misses {memo.misses}')
+            # NOTE: this is the only place where the syntax error is built
+            if isinstance(tree, _Failure):
+                tree.raise_error(tokens)
+        trace(5, f'Parser.parse() in {timer.stop()} seconds')
+        return tree, opts, args
+
+    def split_blocks(self, tokens: 'TokenList|TokenArray', count:int) -> list:
+        """Returns about COUNT (start, stop) ranges of TOKENS that can be parsed
+           independently, these are cut before a test reference (TEST or
+           CONTINUATION token) as no other rule could consume those tokens"""
+        if isinstance(tokens, TokenArray):
+            codes = tokens.variant_codes
+        else:
+            codes = [variant_code(token.variant) for token in tokens.tokens]
+        boundaries = (variant_code(TEST), variant_code(CONTINUATION))
+        target = max(1, len(codes) // count)
+        result = []
+        start = 0
+        for position, code in enumerate(codes):
+            if code in boundaries and position - start >= target:
+                result.append((start, position))
+                start = position
+        result.append((start, len(codes)))
+        return result
+
+    def parse_in_parallel(
+            self,
+            tokens: 'list|TokenArray',
+            opts: BatsppOpts = None,
+            args: BatsppArgs = None,
+            workers: int = 2,
+            facts: 'LexFacts|None' = None,
+            ) -> ASTnode:
+        """Same as parse(), but TOKENS are split in blocks (see split_blocks())
+           parsed by a pool of WORKERS processes, and then the tests of
+           every block are joined into a single test suite.\n
+           Embedded tests, streams of tokens and syntax errors are
+           parsed by this process instead"""
+        timer = Timer()
+        timer.start()
+        store = TokenList(tokens) if isinstance(tokens, list) else tokens
+        blocks = []
+        if workers > 1 and not opts.embedded_tests and isinstance(store, (TokenList, TokenArray)):
+            blocks = self.split_blocks(store, workers * PARSE_BLOCKS_PER_WORKER)
+        if len(blocks) < 2:
+            return self.parse(tokens, opts=opts, args=args, facts=facts)
+        if facts is None:
+            facts = LexFacts(has_arrow_assertion=True, greater_token_present=True)
+        encoded_blocks = [_encode_block(store, start, stop) for start, stop in blocks]
+        with futures.ProcessPoolExecutor(max_workers=workers) as executor, paused_gc():
+            trees = list(executor.map(_parse_block, encoded_blocks, repeat(facts)))
+        tree = join_block_trees(trees)
+        if tree is None:
+            trace(5, 'Parser.parse_in_parallel() failed, parsing again to get the syntax error')
+            return self.parse(tokens, opts=opts, args=args, facts=facts)
+        trace(5, f'Parser.parse_in_parallel() {len(blocks)} blocks in {timer.stop()} seconds')
         return tree, opts, args
 
+@contextmanager
+def paused_gc():
+    """Pause the cyclic garbage collector, the received trees (and
+       the parsed ones) are unpickled into lots of acyclic objects,
+       which triggers many collections that don't release anything.\n
+       Pauses could be nested or from many threads, the collector
+       is enabled again when the last one ends"""
+    global _gc_pauses, _gc_was_enabled # pylint: disable=global-statement
+    with _lock:
+        if not _gc_pauses:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _gc_pauses -= 1
+            if not _gc_pauses and _gc_was_enabled:
+                gc.enable()
+
+def _encode_block(tokens: 'TokenList|TokenArray', start:int, stop:int) -> tuple:
+    """Returns (variant codes, values, lines, columns) of TOKENS from START to
+       STOP to be sent to another process, blocks that aren't at the end of
+       TOKENS are ended with an EOF token, as the grammar requires it"""
+    if isinstance(tokens, TokenArray):
+        codes = tokens.variant_codes[start:stop].tolist()
+        values = [tokens.value(position) for position in range(start, stop)]
+        lines = tokens.line_numbers[start:stop].tolist()
+        columns = tokens.columns[start:stop].tolist()
+    else:
+        block = tokens.tokens[start:stop]
+        codes = [variant_code(token.variant) for token in block]
+        values = [token.value for token in block]
+        lines = [token.data.line for token in block]
+        columns = [token.data.column for token in block]
+    if stop < len(tokens):
+        following = tokens.get(stop)
+        codes.append(variant_code(EOF))
+        values.append(None)
+        lines.append(following.data.line)
+        columns.append(following.data.column)
+    return codes, values, lines, columns
+
+def join_block_trees(trees:list) -> 'TestSuite|None':
+    """Return test suite joining the tests of TREES, parsed from consecutive
+       blocks of tokens (see split_blocks()), None if some block had a syntax
+       error (i.e. its tree is None) or its tests can't be joined"""
+    # NOTE: a global teardown is only valid at the end of the suite
+    if any(tree is None for tree in trees):
+        return None
+    if any(tree.global_teardown is not None for tree in trees[:-1]):
+        return None
+    result = TestSuite(
+        trees[0].global_setup,
+        [test_or_setup for block_tree in trees for test_or_setup in block_tree.tests_or_setups],
+        trees[-1].global_teardown,
+        trees[-1].eof,
+        )
+    result.start_line = trees[0].start_line
+    result.end_line = trees[-1].end_line
+    return result
+
+def _parse_block(block:tuple, facts:LexFacts) -> 'TestSuite|None':
+    """Parse encoded BLOCK of tokens (see _encode_block()) with the grammar
+       of lexer FACTS, returns None on syntax errors, this is run by worker processes"""
+    codes, values, lines, columns = block
+    opts = BatsppOpts(embedded_tests=False)
+    with paused_gc():
+        tokens = [
+            Token(VARIANTS[code], value, TokenData(line=line, column=column))
+            for code, value, line, column in zip(codes, values, lines, columns)
+            ]
+        try:
+            tree, _, _ = parser.parse(tokens, opts=opts, facts=facts)
+        except SyntaxError:
+            return None
+    return tree
+
 parser = _Parser()
 
 if __name__ == '__main__':
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+#
+# Parser generator module
+#
+# This module is responsible for compiling the
+# grammar rules of the parser into Python functions
+#
+
+"""
+Parser generator module
+
+This module is responsible for compiling the
+grammar rules of the parser (see _parser._Rule)
+into Python functions, one function per rule
+with the token checks inlined
+"""
+
+# Standard packages
+from re import sub as re_sub
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._trace import trace
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+from batspp._timer import Timer
+from batspp._token import (
+    TokenArray, TokenList, variant_code,
+    )
+
+# pylint: disable=protected-access
+
+# Variant code after the last token
+NO_TOKEN = -1
+
+class _CompiledGrammar:
+    """
+    Grammar compiled into Python functions, the
+    generated functions return (node, next position)
+    or None when the rule doesn't match
+    """
+
+    def __init__(self, source:str, namespace:dict, filename:str='<generated grammar>') -> None:
+        self.source = source
+        exec(compile(source, filename, 'exec'), namespace) # pylint: disable=exec-used
+        self._make_parser = namespace['make_parser']
+
+    def parse(self, tokens: 'TokenList|TokenArray') -> 'tuple|None':
+        """Parse TOKENS, returns (tree, next position) or None if they
+           don't match the grammar, on that case use the interpreted
+           grammar to get the syntax error"""
+        if isinstance(tokens, TokenArray):
+            codes = tokens.variant_codes.tolist()
+            lines = tokens.line_numbers.tolist()
+        else:
+            codes = [variant_code(token.variant) for token in tokens.tokens]
+            lines = [token.data.line for token in tokens.tokens]
+        codes.append(NO_TOKEN)
+        return self._make_parser(codes, lines, tokens.get)(0)
+
+class _ParserGenerator:
+    """Batspp parser generator class, this
+       generates the source code of a GRAMMAR"""
+
+    def __init__(self, grammar) -> None:
+        self._grammar = grammar
+        # Name of the generated function by rule
+        self._names = {}
+        self._rules = []
+        self._collect_rules(grammar)
+
+    def generate(self) -> tuple:
+        """Returns source code of the grammar compiled into
+           Python functions, and the namespace required to execute it"""
+        grammar = self._grammar
+        lines = [
+            '# Generated by batspp._parser_generator, do not edit',
+            '',
+            'def make_parser(codes, lines, get):',
+            '    """Returns the root rule function for CODES of tokens,',
+            '       with their LINES, GET returns the token at some position"""',
+            ]
+        namespace = {'NO_TOKEN': NO_TOKEN}
+        for rule in self._rules:
+            name = self._names[rule]
+            if rule._resulting_ast_node:
+                namespace[f'NODE_{name}'] = rule._resulting_ast_node
+            lines += self._generate_rule(rule, name)
+        lines.append(f'    return {self._names[grammar]}')
+        return '\n'.join(lines) + '\n', namespace
+
+    def _collect_rules(self, rule) -> None:
+        """Name RULE and its nested rules, in depth-first order"""
+        if rule in self._names:
+            return
+        alias = re_sub(r'\W', '_', repr(rule))
+        self._names[rule] = f'rule_{len(self._names)}_{alias}'
+        self._rules.append(rule)
+        for subject in self._subjects_of(rule):
+            if not isinstance(subject, str):
+                self._collect_rules(subject)
+
+    @staticmethod
+    def _subjects_of(rule) -> list:
+        """Returns tokens and rules used by the instructions of RULE"""
+        result = []
+        for func, params in rule._instructions:
+            name = func.__name__
+            if name == '_run_expect_some_of':
+                result += params
+            elif name in ('_run_zero_or_more', '_run_one_or_more'):
+                result += [param for param in params if param is not None]
+            else:
+                result.append(params)
+        return result
+
+    def _attempt(self, token_or_rule) -> str:
+        """Returns expression with (node, next position) if
+           TOKEN_OR_RULE matches at position, or None"""
+        if isinstance(token_or_rule, str):
+            code = variant_code(token_or_rule)
+            return f'(get(pos), pos + 1) if codes[pos] == {code} else None'
+        call = f'{self._names[token_or_rule]}(pos)'
+        # Predictive shortcut, see _Rule.compute_lookahead()
+        first = token_or_rule._first
+        if first is None or token_or_rule._nullable:
+            return call
+        if not first:
+            return 'None'
+        if len(first) == 1:
+            return f'{call} if codes[pos] == {next(iter(first))} else None'
+        return f'{call} if codes[pos] in {{{", ".join(str(code) for code in sorted(first))}}} else None'
+
+    def _followed(self, token_or_rule) -> str:
+        """Returns condition, True if TOKEN_OR_RULE matches at position"""
+        if isinstance(token_or_rule, str):
+            return f'codes[pos] == {variant_code(token_or_rule)}'
+        return f'({self._attempt(token_or_rule)}) is not None'
+
+    def _generate_rule(self, rule, name:str) -> list:
+        """Returns source lines of the function of RULE"""
+        lines = [
+            '',
+            f'    def {name}(pos):',
+            f'        """{rule!r}"""',
+            ]
+        if rule._resulting_ast_node:
+            lines.append('        start = pos')
+        children = []
+        for func, params in rule._instructions:
+            instruction = func.__name__[len('_run_'):]
+            child = f'child_{len(children)}'
+            body = []
+            if instruction == 'expect':
+                body = self._generate_expect(params, child)
+            elif instruction == 'optionally':
+                body = self._generate_optionally(params, child)
+            elif instruction in ('zero_or_more', 'one_or_more'):
+                expected, not_expected = params
+                body = self._generate_loop(expected, not_expected, child, instruction == 'one_or_more')
+            elif instruction == 'expect_some_of':
+                body = self._generate_expect_some_of(params, child)
+            elif instruction == 'ignore_next':
+                body = self._generate_ignore_next(params)
+                child = None
+            else:
+                raise Exception(f'Unknown instruction "{instruction}" of rule {rule}')
+            if child:
+                children.append(child)
+            lines.append(f'        # {instruction} {self._describe(params)}')
+            lines += [f'        {line}' for line in body]
+        if rule._resulting_ast_node:
+            # Span of lines of the consumed tokens, see ASTnode.line
+            lines += [
+                f'        node = NODE_{name}({", ".join(children)})',
+                '        if pos > start:',
+                '            node.start_line = lines[start]',
+                '            node.end_line = lines[pos - 1]',
+                '        return node, pos',
+                ]
+        else:
+            lines.append('        return None, pos')
+        return lines
+
+    def _describe(self, params) -> str:
+        """Returns description of instruction PARAMS for comments"""
+        if not isinstance(params, tuple):
+            params = (params,)
+        return ', '.join(repr(param) for param in params if param is not None)
+
+    def _generate_expect(self, token_or_rule, child:str) -> list:
+        """Returns lines of expect(TOKEN_OR_RULE) stored in CHILD"""
+        if isinstance(token_or_rule, str):
+            return [
+                f'if codes[pos] != {variant_code(token_or_rule)}:',
+                '    return None',
+                f'{child} = get(pos)',
+                'pos += 1',
+                ]
+        return [
+            f'result = {self._attempt(token_or_rule)}',
+            'if result is None:',
+            '    return None',
+            f'{child}, pos = result',
+            ]
+
+    def _generate_optionally(self, token_or_rule, child:str) -> list:
+        """Returns lines of optionally(TOKEN_OR_RULE) stored in CHILD"""
+        return [
+            f'result = {self._attempt(token_or_rule)}',
+            'if result is None:',
+            f'    {child} = None',
+            'else:',
+            f'    {child}, pos = result',
+            ]
+
+    def _generate_loop(self, expected, not_expected, child:str, at_least_one:bool) -> list:
+        """Returns lines of loop of EXPECTED until NOT_EXPECTED stored in CHILD"""
+        result = [f'{child} = []']
+        if at_least_one:
+            if not_expected is not None:
+                result += [
+                    f'if {self._followed(not_expected)}:',
+                    '    return None',
+                    ]
+            result += [
+                f'result = {self._attempt(expected)}',
+                'if result is None:',
+                '    return None',
+                f'{child}.append(result[0])',
+                'pos = result[1]',
+                ]
+        result.append('while codes[pos] != NO_TOKEN:')
+        if not_expected is not None:
+            result += [
+                f'    if {self._followed(not_expected)}:',
+                '        break',
+                ]
+        result += [
+            f'    result = {self._attempt(expected)}',
+            '    if result is None:',
+            '        break',
+            f'    {child}.append(result[0])',
+            '    pos = result[1]',
+            ]
+        return result
+
+    def _generate_expect_some_of(self, tokens_or_rules:tuple, child:str) -> list:
+        """Returns lines of expect_some_of(TOKENS_OR_RULES) stored in CHILD"""
+        result = [f'result = {self._attempt(tokens_or_rules[0])}']
+        for token_or_rule in tokens_or_rules[1:]:
+            result += [
+                'if result is None:',
+                f'    result = {self._attempt(token_or_rule)}',
+                ]
+        result += [
+            'if result is None:',
+            '    return None',
+            f'{child}, pos = result',
+            ]
+        return result
+
+    def _generate_ignore_next(self, token_or_rule) -> list:
+        """Returns lines of ignore_next(TOKEN_OR_RULE)"""
+        if isinstance(token_or_rule, str):
+            return [
+                f'while codes[pos] == {variant_code(token_or_rule)}:',
+                '    pos += 1',
+                ]
+        return [
+            'while codes[pos] != NO_TOKEN:',
+            f'    result = {self._attempt(token_or_rule)}',
+            '    if result is None:',
+            '        break',
+            '    pos = result[1]',
+            ]
+
+def compile_grammar(grammar, path:str='') -> _CompiledGrammar:
+    """Compile GRAMMAR, if PATH is provided the generated source
+       is written there (useful to debug it or to profile it)"""
+    timer = Timer()
+    timer.start()
+    source, namespace = _ParserGenerator(grammar).generate()
+    filename = '<generated grammar>'
+    if path:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(source)
+        filename = path
+    result = _CompiledGrammar(source, namespace, filename)
+    trace(5, f'compile_grammar(...) in {timer.stop()} seconds')
+    return result
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
@@ -16,9 +16,10 @@ this verify and modity the AST tree if necessary.
 ## NOTE: this is empty for now
 
 # Installed packages
-from mezcla import debug
+## NOTE: this is empty for now
 
 # Local packages
+from batspp._trace import trace
 from batspp._exceptions import (
     warning_not_intended_for_cmd, error,
     )
@@ -28,11 +29,12 @@ from batspp._ast_node import (
     TestOrSetup, TestSuite,
     Constants, Text, Command,
     TestReference, ContinuationReferencePrefix,
-    StandaloneCommands,
+    StandaloneCommands, SetupAssertion,
     )
 from batspp._node_visitor import (
     ReferenceNodeVisitor,
     )
+from batspp._parser import paused_gc
 from batspp.batspp_args import (
     BatsppArgs,
     )
@@ -56,6 +58,10 @@ VERBOSE_DEBUG = 'VERBOSE_DEBUG'
 TEMP_DIR = 'TEMP_DIR'
 COPY_DIR = 'COPY_DIR'
 
+# Nodes modified by the analysis (e.g. merging the setups into the tests),
+# trees analized again must copy them (see copy_tree()), the others are kept
+MODIFIED_NODES = (TestSuite, GlobalSetup, TestOrSetup, Test, SetupAssertion, Setup, StandaloneCommands)
+
 def build_command_node(command:str) -> Command:
     """Build a command node"""
     return Command(None, Token(TEXT, command), None)
@@ -89,12 +95,16 @@ class _SemanticAnalizer(ReferenceNodeVisitor):
     def __init__(self) -> None:
         """Initialize the class"""
         self._entities = []
+        # References of the appended tests, see is_referenced_before_assignment()
+        self._test_references = set()
         self.args = BatsppArgs()
         self.opts = BatsppOpts()
 
     def _append_entity(self, reference:str, node: ASTnode) -> None:
         """Append NODE with REFERENCE to the list of entities"""
         self._entities.append(Entity(reference, node))
+        if isinstance(node, Test):
+            self._test_references.add(reference)
 
     # pylint: disable=invalid-name
     def visit_Setup(self, node: Setup) -> None:
@@ -122,8 +132,6 @@ class _SemanticAnalizer(ReferenceNodeVisitor):
                     message=f'Continuation "{reference}" referenced before assignment.',
                     )
         self._append_entity(reference, node)
-        # Enable debug if test is present
-        self.opts.verbose_debug = True
 
     # pylint: disable=invalid-name
     def visit_GlobalTeardown(self, node: GlobalTeardown) -> None:
@@ -209,23 +217,23 @@ class _SemanticAnalizer(ReferenceNodeVisitor):
     def merged_entities_into_tests(self) -> list:
         """Return list of tests with merged setups and continuations"""
         tests = []
-        setup_stack = []
-        for entity in self._entities:
+        # Tests by their reference, to find the test of continuations
+        tests_by_reference = {}
+        # Setups waiting for a test by their reference (empty for unreferenced
+        # setups), with their index to merge them in order of appearance
+        pending_setups = {}
+        for index, entity in enumerate(self._entities):
             if isinstance(entity.node, Setup):
-                setup_stack.append(entity)
+                pending_setups.setdefault(entity.reference or '', []).append((index, entity))
             elif isinstance(entity.node, Test):
                 # Merge setups into next test node, only if
                 # has the same reference or is unreferenced.
+                setups = pending_setups.pop('', [])
+                if entity.reference:
+                    setups = sorted(setups + pending_setups.pop(entity.reference, []))
                 commands_to_merge = []
-                new_setup_stack = []
-                for setup in setup_stack:
-                    no_reference = setup.reference is None or setup.reference == ''
-                    same_reference = setup.reference == entity.reference
-                    if no_reference or same_reference:
-                        commands_to_merge += setup.node.commands.commands
-                    else:
-                        new_setup_stack.append(setup)
-                setup_stack = new_setup_stack
+                for _, setup in setups:
+                    commands_to_merge += setup.node.commands.commands
                 # Add found setups to the first assertion
                 if not entity.node.setup_assertions[0].setup:
                     entity.node.setup_assertions[0].setup = build_setup_node(commands_to_merge)
@@ -236,18 +244,18 @@ class _SemanticAnalizer(ReferenceNodeVisitor):
                 # Merge continuation tests into a single test node
                 is_continuation = isinstance(entity.node.reference.pointer, ContinuationReferencePrefix)
                 if is_continuation:
-                    for test in tests:
-                        if test.reference.reference.value == entity.reference:
-                            test.setup_assertions += entity.node.setup_assertions
-                            break
+                    test = tests_by_reference.get(entity.reference)
+                    if test is not None:
+                        test.setup_assertions += entity.node.setup_assertions
                 else:
                     tests.append(entity.node)
+                    tests_by_reference.setdefault(entity.node.reference.reference.value, entity.node)
             else:
                 raise Exception(f'Unexpected node {entity.node}')
-        if setup_stack:
+        if pending_setups:
             error_msg = 'Found setups without porpuse, those must be used before an assertion:\n'
-            for setup in setup_stack:
-                error_msg += f'in line {setup.line}\n'
+            for _, setup in sorted(pair for setups in pending_setups.values() for pair in setups):
+                error_msg += f'in line {setup.node.line}\n'
             error(message=error_msg)
         return tests
 
@@ -296,11 +304,7 @@ class _SemanticAnalizer(ReferenceNodeVisitor):
         """Check reference is before assignment"""
         if reference is None:
             return True
-        for entity in self._entities:
-            if isinstance(entity.node, Test):
-                if entity.reference == reference:
-                    return False
-        return True
+        return reference not in self._test_references
 
     def analize(
             self,
@@ -315,9 +319,13 @@ class _SemanticAnalizer(ReferenceNodeVisitor):
         self.opts = opts
         self.args = args
         self._entities = []
-        self.visit(tree)
+        self._test_references = set()
+        # NOTE: the garbage collector is paused as large trees
+        #       trigger many collections that don't release anything
+        with paused_gc():
+            self.visit(tree)
         #
-        debug.trace(5, f'_SemanticAnalizer.analize() in {timer.stop()} seconds')
+        trace(5, f'_SemanticAnalizer.analize() in {timer.stop()} seconds')
         return tree, opts, args
 
 semantic_analizer = _SemanticAnalizer()
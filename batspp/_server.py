@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+#
+# Server module
+#
+# This keeps a warm Batspp process listening on a
+# Unix socket, to skip the startup of every run
+#
+
+"""
+Server module
+
+This keeps a warm Batspp process listening on a Unix socket, so the
+clients (see batsppc) skip the startup of Python, the imports and the
+grammars. Every request is handled by a forked process, which inherits
+all of that and runs the command-line with the arguments, working
+directory, environment and standard streams of the client.
+
+Protocol: the client sends the length of the request (struct
+REQUEST_HEADER) with its stdin, stdout and stderr file descriptors
+attached (SCM_RIGHTS), followed by the request as JSON, the server
+answers with the exit status (struct STATUS) once the run finished.
+NOTE: this only imports standard packages, as it's used by the client.
+"""
+
+# Standard packages
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+from array import array
+from signal import signal, default_int_handler, SIGTERM
+from socketserver import ForkingMixIn, UnixStreamServer, BaseRequestHandler
+from traceback import print_exc
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+
+REQUEST_HEADER = struct.Struct('!I')
+STATUS = struct.Struct('!i')
+# Standard streams of the client, in the order they are sent
+STREAMS = (0, 1, 2)
+
+def _receive_exactly(connection:socket.socket, size:int) -> bytes:
+    """Return SIZE bytes received from CONNECTION"""
+    chunks = []
+    while size:
+        chunk = connection.recv(size)
+        if not chunk:
+            raise ConnectionError('Connection closed before the whole message was received')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def send_request(connection:socket.socket, argv:list, cwd:str, env:dict) -> None:
+    """Send request to run the command-line with ARGV, on CWD with ENV"""
+    payload = json.dumps({'argv': argv, 'cwd': cwd, 'env': env}).encode()
+    connection.sendmsg(
+        [REQUEST_HEADER.pack(len(payload))],
+        [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array('i', STREAMS))],
+        )
+    connection.sendall(payload)
+
+def receive_request(connection:socket.socket) -> tuple:
+    """Return request received from CONNECTION, with the file descriptors of
+       the client standard streams, these must be closed by the caller,
+       the request is None if the client closed the connection without
+       sending it (e.g. to check whether the server is listening)"""
+    fds = array('i')
+    header, ancillary, _, _ = connection.recvmsg(
+        REQUEST_HEADER.size, socket.CMSG_SPACE(len(STREAMS) * fds.itemsize))
+    for level, kind, data in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+    if not header and not fds:
+        return None, []
+    if len(header) < REQUEST_HEADER.size:
+        header += _receive_exactly(connection, REQUEST_HEADER.size - len(header))
+    if len(fds) != len(STREAMS):
+        for fd in fds:
+            os.close(fd)
+        raise ConnectionError(f'Expected {len(STREAMS)} file descriptors, received {len(fds)}')
+    (size,) = REQUEST_HEADER.unpack(header)
+    request = json.loads(_receive_exactly(connection, size))
+    return request, list(fds)
+
+def peer_uid(connection:socket.socket) -> int:
+    """Return user id of the process on the other end of CONNECTION,
+       or None if the platform does not provide the credentials"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid
+
+def private_directory(directory:str) -> None:
+    """Create DIRECTORY only accessible by the user if missing, raises
+       PermissionError if it is owned by another user or accessible by others"""
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid():
+        raise PermissionError(f'{directory} is not a directory owned by the user')
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        raise PermissionError(f'{directory} is accessible by other users')
+
+def forward(socket_path:str, argv:list) -> int:
+    """Run the command-line with ARGV on the server listening on SOCKET_PATH,
+       the output is written by the server to the standard streams of this
+       process, returns the exit status, raises OSError if no server is listening
+       and PermissionError if the server is run by another user"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        # NOTE: checked before sending the environment and streams
+        uid = peer_uid(connection)
+        if uid is not None and uid != os.getuid():
+            raise PermissionError(f'The server listening on {socket_path} is run by another user')
+        send_request(connection, argv, os.getcwd(), dict(os.environ))
+        (status,) = STATUS.unpack(_receive_exactly(connection, STATUS.size))
+    return status
+
+def exit_status(exc:SystemExit) -> int:
+    """Return exit status of EXC, same as the Python interpreter"""
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+class _RequestHandler(BaseRequestHandler):
+    """Handle a request on the forked process, see Server"""
+
+    def handle(self) -> None:
+        if not self.server.is_allowed(self.request):
+            return
+        request, fds = receive_request(self.request)
+        if request is None:
+            return
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        for stream, fd in zip(STREAMS, fds):
+            os.dup2(fd, stream)
+            os.close(fd)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        # NOTE: updated in place, as it could be imported by reference
+        sys.argv[1:] = request['argv']
+        status = 0
+        try:
+            self.server.run_command()
+        except SystemExit as exc:
+            status = exit_status(exc)
+        except Exception: # pylint: disable=broad-except
+            print_exc()
+            status = 1
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                stream.flush()
+        self.request.sendall(STATUS.pack(status))
+
+class Server(ForkingMixIn, UnixStreamServer):
+    """
+    Server listening on SOCKET_PATH, every request is handled
+    by a forked process calling RUN_COMMAND(), with sys.argv,
+    working directory, environment and standard streams of the client
+    """
+
+    block_on_close = False
+
+    def __init__(self, socket_path:str, run_command:'Callable[[], None]') -> None:
+        self.socket_path = socket_path
+        self.run_command = run_command
+        self._remove_stale_socket()
+        # NOTE: only the user can connect, as the requests
+        #       run commands with the permissions of the server
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def _remove_stale_socket(self) -> None:
+        """Remove socket file of a server no longer listening"""
+        if not os.path.exists(self.socket_path):
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(self.socket_path)
+        except ConnectionRefusedError:
+            os.unlink(self.socket_path)
+        else:
+            raise OSError(f'A server is already listening on {self.socket_path}')
+
+    def is_allowed(self, connection:socket.socket) -> bool:
+        """Whether the client of CONNECTION is run by the same user,
+           this is only checked if the platform provides the credentials"""
+        uid = peer_uid(connection)
+        return uid is None or uid == os.getuid()
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+def serve(socket_path:str, run_command:'Callable[[], None]') -> None:
+    """Serve requests on SOCKET_PATH until interrupted or terminated, see Server"""
+    # NOTE: terminated same as interrupted, so the socket is removed
+    signal(SIGTERM, default_int_handler)
+    with Server(socket_path, run_command) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
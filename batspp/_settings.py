@@ -9,7 +9,9 @@
 """Settings module"""
 
 # Standard packages
-## NOTE: this is empty for now
+from os import environ as os_environ
+from os import getuid as os_getuid
+from os import path as os_path
 
 # Installed packages
 ## NOTE: this is empty for now
@@ -31,8 +33,44 @@ SETUP_FUNCTION = 'run_setup'
 TEARDOWN_FUNCTION = 'run_teardown'
 
 BATSPP_EXTENSION = 'batspp'
+
+# Globs of the test files discovered by default (see BatsppTest.discover),
+# scripts with embedded tests must be included explicitly
+DISCOVER_INCLUDE = (f'*.{BATSPP_EXTENSION}', '*.ipynb')
 TEST_OUTPUT_INTERPRETER = 'bash'
 
+# Files bigger than this (in bytes) are tokenized and
+# parsed as a stream instead of being loaded in memory
+STREAMING_FILE_SIZE = 1024 * 1024
+
+# Files bigger than this (in bytes) are parsed in parallel
+# if more than one parse worker is requested, every worker
+# process parses about PARSE_BLOCKS_PER_WORKER blocks of tests
+PARALLEL_PARSE_FILE_SIZE = 256 * 1024
+PARSE_BLOCKS_PER_WORKER = 4
+
+# Parsed and transpiled test files are cached in this directory (see _cache),
+# least recently used entries are evicted over AST_CACHE_SIZE
+# and OUTPUT_CACHE_SIZE bytes respectively
+CACHE_DIR = os_path.join(
+    os_environ.get('XDG_CACHE_HOME') or os_path.expanduser('~/.cache'),
+    'batspp',
+    )
+AST_CACHE_SIZE = 256 * 1024 * 1024
+OUTPUT_CACHE_SIZE = 64 * 1024 * 1024
+
+# Unix socket of the Batspp server (see _server), the
+# client (batsppc) runs Batspp directly if no server is listening,
+# the directory must be private to the user (see private_directory)
+SERVER_SOCKET_DIR = os_environ.get('XDG_RUNTIME_DIR') or f'/tmp/batspp-{os_getuid()}'
+SERVER_SOCKET = os_path.join(SERVER_SOCKET_DIR, 'batspp.sock')
+
+# Watched test files (see _watcher) are polled every WATCH_POLL_INTERVAL
+# seconds if inotify is not available, changes notified within
+# WATCH_SETTLE_TIME seconds of each other are handled together
+WATCH_POLL_INTERVAL = 0.1
+WATCH_SETTLE_TIME = 0.005
+
 # Runners
 BATS = 'bats'
 BASH = 'bash'
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# Source module
+#
+# This provides memory-mapped access to
+# source files, line per line
+#
+
+"""
+Source module
+
+This provides memory-mapped access to
+source files, line per line
+"""
+
+# Standard packages
+from array import array
+from mmap import (
+    mmap, ACCESS_READ,
+    )
+from re import compile as re_compile
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+
+# Line boundaries of str.splitlines() encoded as UTF-8
+LINE_BOUNDARY_PATTERN = re_compile(
+    rb'\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]'
+    )
+ENCODING = 'utf-8'
+
+class MappedSource:
+    """
+    Memory-mapped source file, this behaves like the
+    list of lines of the file (same as str.splitlines()),
+    but lines are only decoded when requested, the mapping is
+    released by close() (or using it as a context manager), then
+    it has no lines, e.g. for tokens still referencing the source
+    """
+
+    def __init__(self, path:str) -> None:
+        """Map file on PATH and build the line index"""
+        self.path = path
+        with open(path, 'rb') as file:
+            # NOTE: empty files can't be mapped
+            try:
+                self._content = mmap(file.fileno(), 0, access=ACCESS_READ)
+            except ValueError:
+                self._content = b''
+        # Line index, byte offsets where every line starts and ends
+        self._starts = array('Q')
+        self._ends = array('Q')
+        self._build_line_index()
+
+    def _build_line_index(self) -> None:
+        """Build the offsets of every line"""
+        start = 0
+        for boundary in LINE_BOUNDARY_PATTERN.finditer(self._content):
+            self._starts.append(start)
+            self._ends.append(boundary.start())
+            start = boundary.end()
+        if start < len(self._content):
+            self._starts.append(start)
+            self._ends.append(len(self._content))
+
+    def close(self) -> None:
+        """Release the mapped file"""
+        if isinstance(self._content, mmap):
+            self._content.close()
+        self._content = b''
+        self._starts = array('Q')
+        self._ends = array('Q')
+
+    def __enter__(self) -> 'MappedSource':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index:int) -> str:
+        """Return decoded line with INDEX"""
+        start, end = self.line_span(index)
+        return self._content[start:end].decode(ENCODING)
+
+    def line_span(self, index:int) -> tuple:
+        """Return (start, end) byte offsets of line with INDEX"""
+        return self._starts[index], self._ends[index]
+
+    def read(self) -> str:
+        """Return full decoded content, with universal newlines"""
+        content = self._content[:].decode(ENCODING)
+        return content.replace('\r\n', '\n').replace('\r', '\n')
+
+    def splitlines(self) -> 'MappedSource':
+        """Return lines, already indexed by this source,
+           this allows to use a source as TextLiner content"""
+        return self
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
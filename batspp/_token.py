@@ -6,7 +6,8 @@
 """Token module"""
 
 # Standard packages
-## NOTE: this is empty for now
+from array import array
+from threading import Lock
 
 # Installed packages
 ## NOTE: this is empty for now
@@ -40,24 +41,74 @@ EOF = 'EOF'
 NEW_LINE = 'NEW_LINE' ## TODO: unify to TEXT token
 MINOR = 'MINOR'
 
+# Small-integer codes of token variants
+#
+# NOTE: unknown variants (e.g. used on tests)
+#       are registered on demand by variant_code(),
+#       up to MAX_VARIANTS as codes are stored as bytes
+VARIANTS = [
+    PESO, GREATER, SETUP, GLOBAL, TEARDOWN, TEST, POINTER,
+    CONTINUATION, ASSERT_EQ, ASSERT_NE, TEXT, EOF, NEW_LINE, MINOR,
+    ]
+VARIANT_CODES = {variant: code for code, variant in enumerate(VARIANTS)}
+MAX_VARIANTS = 256
+_variants_lock = Lock()
+
+def variant_code(variant:str) -> int:
+    """Return small-integer code of token VARIANT"""
+    code = VARIANT_CODES.get(variant)
+    if code is None:
+        # NOTE: registered under the lock, as this can be called from threads
+        with _variants_lock:
+            code = VARIANT_CODES.get(variant)
+            if code is None:
+                code = len(VARIANTS)
+                if code >= MAX_VARIANTS:
+                    raise ValueError(f'Cannot register token variant {variant!r}, '
+                                     f'there are already {MAX_VARIANTS} variants')
+                VARIANTS.append(variant)
+                VARIANT_CODES[variant] = code
+    return code
+
 class TokenData:
     """Data class for token"""
 
+    __slots__ = ('_text_line', 'lines', 'line', 'column')
+
     def __init__(
             self,
             text_line:str = '',
             line:int = None,
             column:int = None,
+            lines = None,
             ) -> None:
-        self.text_line = text_line
+        # If the LINES of the source are provided, the text line
+        # is only retrieved when required (e.g. error messages)
+        self._text_line = text_line
+        self.lines = lines
         self.line = line
         self.column = column
 
+    def __reduce__(self) -> tuple:
+        # Faster pickling than the default one of slots (e.g. to send parsed trees
+        # between processes), the lines of the source are not pickled as they
+        # are only required by syntax errors (and could be a mapped file)
+        return TokenData, (self._text_line, self.line, self.column)
+
+    @property
+    def text_line(self) -> str:
+        """Return full text line of the token"""
+        if self.lines is not None and self.line <= len(self.lines):
+            return self.lines[self.line - 1]
+        return self._text_line
+
 class Token:
     """
     Token class
     """
 
+    __slots__ = ('variant', 'value', 'data')
+
     def __init__(
             self,
             variant: str,
@@ -71,10 +122,223 @@ class Token:
     def __repr__(self) -> str:
         return f'Token(var={self.variant.upper()}, val="{self.value}")'
 
+    def __reduce__(self) -> tuple:
+        # Faster pickling than the default one of slots
+        return _unpickle_token, (self.variant, self.value, self.data)
+
     @property
     def line(self) -> int:
         """Return token line"""
         return self.data.line
 
+def _unpickle_token(variant:str, value:any, data:TokenData) -> Token:
+    """Rebuild a pickled token, VARIANT is replaced by the string of the
+       variant constants, as token variants are compared by identity"""
+    return Token(VARIANTS[variant_code(variant)], value, data)
+
+class TokenArray:
+    """
+    Compact token store, tokens are kept in parallel arrays
+    (struct of arrays) and Token objects are only created on demand
+    """
+
+    # Length of values that aren't a slice of the source line
+    NONE_VALUE = -1
+    LITERAL_VALUE = -2
+
+    def __init__(self, lines) -> None:
+        # Lines of the source, values are slices of them
+        self.lines = lines
+        self.variant_codes = array('B')
+        self.line_numbers = array('I')
+        self.columns = array('I')
+        self.value_lengths = array('i')
+        # Values that aren't a slice of the source, by position
+        self._literal_values = {}
+
+    def __len__(self) -> int:
+        return len(self.variant_codes)
+
+    def append(self, variant:str, value:'str|None', line:int, column:int) -> None:
+        """Append token of VARIANT at LINE and COLUMN, VALUE must
+           be the slice of the source line that starts at COLUMN"""
+        self.variant_codes.append(variant_code(variant))
+        self.line_numbers.append(line)
+        self.columns.append(column)
+        self.value_lengths.append(self.NONE_VALUE if value is None else len(value))
+
+    def append_literal(self, variant:str, value:str, line:int, column:int) -> None:
+        """Append token of VARIANT at LINE and COLUMN, with
+           a VALUE that isn't part of the source line"""
+        self._literal_values[len(self)] = value
+        self.append(variant, None, line, column)
+        self.value_lengths[-1] = self.LITERAL_VALUE
+
+    def value(self, position:int) -> 'str|None':
+        """Return value of token at POSITION"""
+        length = self.value_lengths[position]
+        if length == self.NONE_VALUE:
+            return None
+        if length == self.LITERAL_VALUE:
+            return self._literal_values[position]
+        line = self.line_numbers[position]
+        start = self.columns[position] - 1
+        return self.lines[line - 1][start:start + length]
+
+    def get(self, position:int) -> 'Token|None':
+        """Create token at POSITION, or None if out of range"""
+        if position >= len(self.variant_codes):
+            return None
+        return Token(
+            VARIANTS[self.variant_codes[position]],
+            self.value(position),
+            TokenData(
+                text_line=None,
+                line=self.line_numbers[position],
+                column=self.columns[position],
+                lines=self.lines,
+                ),
+            )
+
+    def variant_code(self, position:int) -> 'int|None':
+        """Return variant code of token at POSITION"""
+        if position >= len(self.variant_codes):
+            return None
+        return self.variant_codes[position]
+
+    def line_number(self, position:int) -> 'int|None':
+        """Return line number of token at POSITION"""
+        if position >= len(self.line_numbers):
+            return None
+        return self.line_numbers[position]
+
+    def release(self, position:int) -> None:
+        """Nothing to release, tokens are already compact"""
+
+    def view(self, position:int=0) -> 'TokenView':
+        """Return a view of the tokens starting at POSITION"""
+        return TokenView(self, position)
+
+    def to_list(self) -> list:
+        """Return list with all tokens"""
+        return [self.get(position) for position in range(len(self))]
+
+class TokenList:
+    """
+    Token store over a plain list of tokens,
+    same interface of TokenArray and TokenStream
+    """
+
+    __slots__ = ('tokens',)
+
+    def __init__(self, tokens:list) -> None:
+        self.tokens = tokens
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def get(self, position:int) -> 'Token|None':
+        """Return token at POSITION, or None if out of range"""
+        if position >= len(self.tokens):
+            return None
+        return self.tokens[position]
+
+    def variant_code(self, position:int) -> 'int|None':
+        """Return variant code of token at POSITION"""
+        if position >= len(self.tokens):
+            return None
+        return variant_code(self.tokens[position].variant)
+
+    def line_number(self, position:int) -> 'int|None':
+        """Return line number of token at POSITION"""
+        if position >= len(self.tokens):
+            return None
+        return self.tokens[position].data.line
+
+    def release(self, position:int) -> None:
+        """Nothing to release, the list is owned by the caller"""
+
+    def view(self, position:int=0) -> 'TokenView':
+        """Return a view of the tokens starting at POSITION"""
+        return TokenView(self, position)
+
+class TokenStream:
+    """
+    Lookahead buffer over a lazy iterable of tokens,
+    tokens are pulled from the source only when required
+    and can be released once they are not needed anymore
+    """
+
+    def __init__(self, tokens) -> None:
+        self._source = iter(tokens)
+        # Buffered tokens, the first one is at position OFFSET
+        self._buffer = []
+        self._offset = 0
+
+    def get(self, position:int) -> 'Token|None':
+        """Return token at POSITION, or None if the stream is exhausted"""
+        index = position - self._offset
+        assert index >= 0, f'token at position {position} was already released'
+        while index >= len(self._buffer):
+            token = next(self._source, None)
+            if token is None:
+                return None
+            self._buffer.append(token)
+        return self._buffer[index]
+
+    def variant_code(self, position:int) -> 'int|None':
+        """Return variant code of token at POSITION"""
+        token = self.get(position)
+        return None if token is None else variant_code(token.variant)
+
+    def line_number(self, position:int) -> 'int|None':
+        """Return line number of token at POSITION"""
+        token = self.get(position)
+        return None if token is None else token.data.line
+
+    def release(self, position:int) -> None:
+        """Release buffered tokens before POSITION"""
+        index = position - self._offset
+        if index > 0:
+            del self._buffer[:index]
+            self._offset = position
+
+    def view(self, position:int=0) -> 'TokenView':
+        """Return a view of the tokens starting at POSITION"""
+        return TokenView(self, position)
+
+class TokenView:
+    """
+    Read-only view of a token store (TokenList, TokenArray or TokenStream)
+    starting at some position, this behaves like the remaining
+    list of tokens for the parser
+    """
+
+    __slots__ = ('store', 'position')
+
+    def __init__(self, store: 'TokenList|TokenArray|TokenStream', position:int) -> None:
+        self.store = store
+        self.position = position
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            assert key.stop is None and key.step is None, 'only slices like [N:] are supported'
+            return TokenView(self.store, self.position + (key.start or 0))
+        token = self.store.get(self.position + key)
+        if token is None:
+            raise IndexError('token view index out of range')
+        return token
+
+    def __bool__(self) -> bool:
+        return self.store.variant_code(self.position) is not None
+
+    def variant_code(self) -> 'int|None':
+        """Return variant code of the first token"""
+        return self.store.variant_code(self.position)
+
+    def release_before(self) -> None:
+        """Release tokens of the store before this view"""
+        self.store.release(self.position)
+
 if __name__ == '__main__':
     warning_not_intended_for_cmd()
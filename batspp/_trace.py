@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#
+# Trace module
+#
+# This provides lazy debug traces, so the
+# messages are only formatted if they are printed
+#
+
+"""
+Trace module
+
+This provides lazy debug traces over mezcla.debug,
+messages could be functions returning the message, so
+they are only formatted if the trace level prints them.
+mezcla.debug itself is only imported to print a trace,
+as it's expensive to import (see tools/run_benchmarks.py import_time)
+"""
+
+# Standard packages
+from importlib import import_module
+from os import environ as os_environ
+from sys import modules as sys_modules
+
+# Installed packages
+## NOTE: mezcla.debug is imported when required, see trace()
+
+# Local packages
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+
+def _initial_trace_level() -> int:
+    """Return trace level of mezcla.debug once imported, taken from DEBUG_LEVEL,
+       warnings by default (2) and none if optimized (python -O)"""
+    if not __debug__:
+        return 0
+    try:
+        return int(os_environ.get('DEBUG_LEVEL', '').strip() or 2)
+    except ValueError:
+        return 2
+
+# Trace level until mezcla.debug is imported
+INITIAL_TRACE_LEVEL = _initial_trace_level()
+
+def trace_level() -> int:
+    """Return trace level of mezcla.debug, without importing it"""
+    debug = sys_modules.get('mezcla.debug')
+    return INITIAL_TRACE_LEVEL if debug is None else debug.trace_level
+
+def tracing(level:int) -> bool:
+    """Return True if traces of LEVEL are printed, use this
+       as guard of traces that are expensive to build"""
+    return trace_level() >= level
+
+def trace(level:int, message:'str|Callable[[], str]') -> None:
+    """Trace MESSAGE at LEVEL, MESSAGE could be a function
+       returning the message, it is only called if LEVEL is printed"""
+    # NOTE: the level is checked here, as debug.trace
+    #       does it after the message was already built
+    if trace_level() >= level:
+        debug = import_module('mezcla.debug')
+        debug.trace(level, message() if callable(message) else message)
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+#
+# Watcher module
+#
+# This is responsible for waiting
+# changes of files (e.g. saved by an editor)
+#
+
+"""
+Watcher module
+
+This is responsible for waiting changes of files (e.g. test files
+saved by an editor, see BatsppTest.watch()), with Linux inotify if
+available, otherwise by polling the modification time of the files.
+The directories of the files are watched instead of the files, as
+many editors save by replacing the file (i.e. renaming another one).
+"""
+
+# Standard packages
+import ctypes
+import os
+import struct
+from select import select
+from time import monotonic, sleep
+
+# Installed packages
+## NOTE: this is empty for now
+
+# Local packages
+from batspp._trace import trace
+from batspp._exceptions import (
+    warning_not_intended_for_cmd,
+    )
+from batspp._settings import (
+    WATCH_POLL_INTERVAL,
+    WATCH_SETTLE_TIME,
+    )
+
+# Inotify flags and events, see inotify(7)
+IN_CLOEXEC = os.O_CLOEXEC
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct('iIII')
+# Events of a file saved, in place or replacing it
+WATCHED_EVENTS = IN_CLOSE_WRITE | IN_MOVED_TO
+
+def _inotify_init(directories:'Iterable[str]') -> 'tuple|None':
+    """Return inotify file descriptor watching DIRECTORIES, with the
+       directory of every watch descriptor, None if inotify is not available"""
+    # NOTE: the C library is already loaded by Python, searching it is slow
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        inotify_init1 = libc.inotify_init1
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    fd = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        trace(5, f'_inotify_init() failed: {os.strerror(ctypes.get_errno())}')
+        return None
+    directory_by_wd = {}
+    for directory in directories:
+        wd = inotify_add_watch(fd, os.fsencode(directory), WATCHED_EVENTS)
+        if wd < 0:
+            trace(5, f'_inotify_init() failed to watch {directory}: {os.strerror(ctypes.get_errno())}')
+            os.close(fd)
+            return None
+        directory_by_wd[wd] = directory
+    return fd, directory_by_wd
+
+class FileWatcher:
+    """
+    Watch changes of PATHS, i.e. files written or replaced, with inotify
+    if available, otherwise polling their modification time every
+    POLL_INTERVAL seconds, this must be closed when no longer used
+    """
+
+    def __init__(self, paths:'Iterable[str]', poll_interval:float=WATCH_POLL_INTERVAL) -> None:
+        self.paths = {os.path.abspath(path) for path in paths}
+        self.poll_interval = poll_interval
+        self._fd = None
+        self._directory_by_wd = {}
+        inotify = _inotify_init(sorted({os.path.dirname(path) for path in self.paths}))
+        if inotify is not None:
+            self._fd, self._directory_by_wd = inotify
+        self._stats = self._stat_paths()
+
+    @property
+    def uses_inotify(self) -> bool:
+        """Whether changes are notified by inotify instead of polled"""
+        return self._fd is not None
+
+    def _stat_paths(self) -> dict:
+        """Return modification time, size and inode of every path, None if missing"""
+        result = {}
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                result[path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            except FileNotFoundError:
+                result[path] = None
+        return result
+
+    def _read_events(self) -> set:
+        """Return watched paths with pending inotify events"""
+        result = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return result
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Some events were lost, every path could have changed
+                result.update(self.paths)
+            elif wd in self._directory_by_wd:
+                path = os.path.join(self._directory_by_wd[wd], name)
+                if path in self.paths:
+                    result.add(path)
+        return result
+
+    def _wait_inotify(self, timeout:'float|None') -> set:
+        """Return changed paths notified by inotify until TIMEOUT"""
+        deadline = None if timeout is None else monotonic() + timeout
+        result = set()
+        while not result:
+            remaining = None if deadline is None else max(0, deadline - monotonic())
+            ready, _, _ = select([self._fd], [], [], remaining)
+            if not ready:
+                return result
+            result = self._read_events()
+        # Editors could save with many events (e.g. a backup
+        # and the file), these are received as a single change
+        while select([self._fd], [], [], WATCH_SETTLE_TIME)[0]:
+            result |= self._read_events()
+        self._stats = self._stat_paths()
+        return result
+
+    def _wait_polling(self, timeout:'float|None') -> set:
+        """Return paths with changed stats until TIMEOUT"""
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            stats = self._stat_paths()
+            result = {path for path, stat in stats.items() if stat != self._stats[path]}
+            self._stats = stats
+            if result:
+                return result
+            if deadline is not None and monotonic() >= deadline:
+                return result
+            sleep(self.poll_interval)
+
+    def wait(self, timeout:'float|None'=None) -> set:
+        """Return the paths changed since the previous call (or the creation),
+           waiting for some change, or TIMEOUT seconds if provided"""
+        if self._fd is not None:
+            return self._wait_inotify(timeout)
+        return self._wait_polling(timeout)
+
+    def close(self) -> None:
+        """Stop watching the paths"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> 'FileWatcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+if __name__ == '__main__':
+    warning_not_intended_for_cmd()
@@ -15,29 +15,33 @@
 from batspp._exceptions import (
     assert_type, warning_not_intended_for_cmd,
     )
+from batspp._frozen import Frozen
 from batspp._settings import (
     BATS, BASH,
     )
 
-class BatsppArgs:
-    """Batspp test arguments class, useful
-       to share and set arguments between modules"""
+class BatsppArgs(Frozen):
+    """Batspp test arguments class, useful to share and set
+       arguments between modules, these are immutable and
+       hashable, see Frozen.replace()"""
 
     def __init__(
             self,
-            sources: 'list|None' = None,
+            sources: 'list|tuple|None' = None,
             temp_dir: str = '',
-            visible_paths: 'list|None' = None,
+            visible_paths: 'list|tuple|None' = None,
             run_opts: str = '',
             copy_dir: str = '',
             debug: str = '',
             runner: str = 'bats',
+            parse_workers: int = 0,
+            cache_dir: str = '',
             ) -> None:
 
         # Check for sources, filter empty sources
-        assert_type(sources, (list, type(None)))
+        assert_type(sources, (list, tuple, type(None)))
         if sources:
-            sources = [src for src in sources if src]
+            sources = tuple(src for src in sources if src)
         self.sources = sources if sources else None
 
         # Check for temp_dir
@@ -45,9 +49,9 @@ class BatsppArgs:
         self.temp_dir = temp_dir
 
         # Check for visible_path, filter empty paths
-        assert_type(visible_paths, (list, type(None)))
+        assert_type(visible_paths, (list, tuple, type(None)))
         if visible_paths:
-            visible_paths = [path for path in visible_paths if path]
+            visible_paths = tuple(path for path in visible_paths if path)
         self.visible_paths = visible_paths if visible_paths else None
 
         # Check for run_opts
@@ -68,5 +72,17 @@ class BatsppArgs:
             raise Exception(f'Unknown test runner, must be "{BATS}" or "{BASH}"')
         self.runner = runner.lower()
 
+        # Check for parse_workers, processes used to parse
+        # large test files, with 0 or 1 these are parsed serially
+        assert_type(parse_workers, int)
+        self.parse_workers = parse_workers
+
+        # Check for cache_dir, directory to cache parsed
+        # test files, if it is empty the cache is not used
+        assert_type(cache_dir, str)
+        self.cache_dir = cache_dir
+
+        self._freeze()
+
 if __name__ == '__main__':
     warning_not_intended_for_cmd()
@@ -17,11 +17,13 @@
 from batspp._exceptions import (
     assert_type, warning_not_intended_for_cmd,
     )
+from batspp._frozen import Frozen
 
 
-class BatsppOpts:
+class BatsppOpts(Frozen):
     """Batspp test options class, useful to share
-       and set options between modules"""
+       and set options between modules, these are
+       immutable and hashable, see Frozen.replace()"""
 
     def __init__(
             self,
@@ -30,8 +32,6 @@ class BatsppOpts:
             hexdump_debug: bool = False,
             omit_trace: bool = False,
             disable_aliases: bool = False,
-            has_arrow_assertion: bool = False,
-            greater_token_present: bool = False,
             ) -> None:
 
         # Check for embedded_tests
@@ -54,11 +54,9 @@ class BatsppOpts:
         assert_type(disable_aliases, bool)
         self.disable_aliases = disable_aliases
 
-        # Optimization flags
-        assert_type(has_arrow_assertion, bool)
-        self.has_arrow_assertion = has_arrow_assertion
-        assert_type(greater_token_present, bool)
-        self.greater_token_present = greater_token_present
+        # NOTE: the optimization flags found by the
+        #       lexer are kept apart, see _lexer.LexFacts
+        self._freeze()
 
 if __name__ == '__main__':
     warning_not_intended_for_cmd()
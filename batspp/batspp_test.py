@@ -6,22 +6,46 @@
 """Batspp test module"""
 
 # Standard packages
-from re import search as re_search
+from io import StringIO, TextIOBase
+from itertools import repeat
+from mmap import mmap, ACCESS_READ
+from re import (
+    search as re_search,
+    compile as re_compile,
+    MULTILINE,
+    )
+from os import (
+    cpu_count as os_cpu_count,
+    devnull as os_devnull,
+    getpid as os_getpid,
+    path as os_path,
+    remove as os_remove,
+    replace as os_replace,
+    walk as os_walk,
+    )
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from threading import get_ident
 
 # Installed packages
-from mezcla import glue_helpers as gh
-from mezcla import debug
+## NOTE: mezcla.glue_helpers is imported on first use, see gh below
 
 # Local packages
-from batspp._lexer import lexer
+from batspp._lazy import LazyModule
+from batspp._trace import trace
+from batspp._lexer import Lexer
 from batspp._parser import parser
-from batspp._semantic_analizer import semantic_analizer
+from batspp._ast_node import TestSuite, FingerprintMemo
+from batspp._semantic_analizer import _SemanticAnalizer
 from batspp._jupyter_to_batspp import jupyter_to_batspp
-from batspp._bats_interpreter import bats_interpreter
-from batspp._bash_interpreter import bash_interpreter
+from batspp._bats_interpreter import BatsInterpreter
+from batspp._bash_interpreter import BashInterpreter
 from batspp._settings import (
     BATSPP_EXTENSION,
+    DISCOVER_INCLUDE,
     BASH, BATS,
+    STREAMING_FILE_SIZE,
+    PARALLEL_PARSE_FILE_SIZE,
 )
 from batspp.batspp_opts import BatsppOpts
 from batspp.batspp_args import BatsppArgs
@@ -29,6 +53,7 @@ from batspp._exceptions import (
     warning_not_intended_for_cmd,
     )
 from batspp._timer import Timer
+from batspp._source import MappedSource
 from batspp.batspp_args import (
     BatsppArgs,
     )
@@ -36,6 +61,18 @@ from batspp.batspp_opts import (
     BatsppOpts,
     )
 
+# NOTE: imported on first use, as these are only required to
+#       save, run and watch the test files, not to transpile them
+gh = LazyModule('mezcla.glue_helpers')
+futures = LazyModule('concurrent.futures')
+subprocess = LazyModule('subprocess')
+watcher = LazyModule('batspp._watcher')
+# NOTE: imported on first use, as these are only required to
+#       cache, discover and watch the test files
+cache = LazyModule('batspp._cache')
+incremental = LazyModule('batspp._incremental')
+fnmatch = LazyModule('fnmatch')
+
 def add_prefix_to_filename(file:str, prefix:str) -> str:
     """Adds PREFIX to FILE path"""
     return f'{gh.dir_path(file)}/{prefix}{gh.basename(file)}'
@@ -82,6 +119,268 @@ def save_with_permissions(file:str, content:str) -> None:
     gh.write_file(file, content)
     gh.run(f'chmod +x {file}')
 
+def read_file(file:str) -> str:
+    """Return text of FILE, ending with a new line if
+       it's not empty, same as glue_helpers.read_file()"""
+    with open(file, encoding='utf-8') as handle:
+        text = handle.read()
+    return text if not text or text.endswith('\n') else f'{text}\n'
+
+def file_contains(file:str, text:str) -> bool:
+    """Whether FILE contains TEXT, without reading the whole file"""
+    if not os_path.getsize(file):
+        return False
+    with open(file, 'rb') as handle, mmap(handle.fileno(), 0, access=ACCESS_READ) as content:
+        return content.find(text.encode()) != -1
+
+class _SavedFileSink(TextIOBase):
+    """
+    Sink to save a transpiled file, trailing new lines are
+    written as a single one, same as glue_helpers.write_file(),
+    the text is written to a temporary file next to FILE, which
+    replaces FILE only if the sink is closed without error
+    """
+
+    def __init__(self, file:str) -> None:
+        super().__init__()
+        self._file = file
+        head, tail = os_path.split(file)
+        self._temp_file = os_path.join(head, f'.{tail}.{os_getpid()}-{get_ident()}.tmp')
+        self._handle = open(self._temp_file, 'w', encoding='utf-8') # pylint: disable=consider-using-with
+        # New lines written after the last text
+        self._new_lines = ''
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text:str) -> int:
+        stripped = text.rstrip('\n')
+        if stripped:
+            self._handle.write(self._new_lines + stripped)
+            self._new_lines = text[len(stripped):]
+        else:
+            self._new_lines += text
+        return len(text)
+
+    def discard(self) -> None:
+        """Close the sink removing the written text, FILE is left untouched"""
+        if not self.closed:
+            self._handle.close()
+            os_remove(self._temp_file)
+        super().close()
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                self._handle.write('\n')
+                self._handle.close()
+                os_replace(self._temp_file, self._file)
+            except BaseException:
+                self.discard()
+                raise
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+def matches_any(path:str, globs:'Iterable[str]') -> bool:
+    """Whether relative PATH or its basename matches some of GLOBS"""
+    basename = os_path.basename(path)
+    return any(fnmatch.fnmatch(path, glob) or fnmatch.fnmatch(basename, glob) for glob in globs)
+
+def find_test_files(
+        directory:str,
+        include:'Iterable[str]'=DISCOVER_INCLUDE,
+        exclude:'Iterable[str]'=(),
+        ) -> list:
+    """Return sorted test files under DIRECTORY matching INCLUDE globs (Batspp
+       and Jupyter notebook files by default) but not EXCLUDE globs, these
+       are matched against the path relative to DIRECTORY or the basename,
+       subdirectories matching EXCLUDE are not walked"""
+    result = []
+    for root, dirs, files in os_walk(directory):
+        relative_root = os_path.relpath(root, directory)
+        relative_root = '' if relative_root == '.' else relative_root
+        dirs[:] = [subdir for subdir in dirs
+                   if not matches_any(os_path.join(relative_root, subdir), exclude)]
+        for file in files:
+            relative_path = os_path.join(relative_root, file)
+            if matches_any(relative_path, include) and not matches_any(relative_path, exclude):
+                result.append(os_path.join(root, file))
+    return sorted(result)
+
+def _precompile_file(file:str, copy_path:str, args:BatsppArgs, opts:BatsppOpts) -> str:
+    """Transpile FILE to warm the cache (see BatsppTest.precompile()),
+       returns the error message or an empty string"""
+    try:
+        if copy_path:
+            BatsppTest().transpile_and_save_bats(file, output=copy_path, args=args, opts=opts)
+        else:
+            with open(os_devnull, 'w', encoding='utf-8') as sink:
+                BatsppTest().transpile_into(file, sink, args=args, opts=opts)
+    except Exception as exc: # pylint: disable=broad-except
+        return f'{type(exc).__name__}: {exc}'
+    return ''
+
+def _precompile_files(
+        files:list,
+        copy_paths:'Iterable[str]',
+        args:BatsppArgs,
+        opts:BatsppOpts,
+        workers:int,
+        ) -> list:
+    """Transpile FILES into the cache and/or COPY_PATHS, in parallel with
+       WORKERS processes (all CPUs if 0), returns the error message of every file"""
+    workers = workers or os_cpu_count() or 1
+    if workers > 1 and len(files) > 1:
+        with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_precompile_file, files, copy_paths, repeat(args), repeat(opts)))
+    return [_precompile_file(file, copy_path, args, opts) for file, copy_path in zip(files, copy_paths)]
+
+# Result lines of the tests, printed by Bats and
+# the Bash runner (see testing_utils.bash) e.g. 'not ok 2 test of line 7'
+TEST_RESULT_REGEX = re_compile(r'^(ok|not ok) \d+', MULTILINE)
+
+def _run_test_file(file:str, args:BatsppArgs) -> tuple:
+    """Run transpiled test FILE with the runner of ARGS,
+       returns its exit status and output (with errors)"""
+    sudo = 'sudo' if file_contains(file, 'sudo') else ''
+    process = subprocess.run(
+        f'{sudo} {args.runner} {args.run_opts} {file}',
+        shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, errors='replace', check=False,
+        )
+    return process.returncode, process.stdout
+
+class FileRunResult:
+    """
+    Result of a test FILE found by BatsppTest.discover(), the
+    ERROR message if it was not transpiled, otherwise the EXIT_STATUS
+    and OUTPUT of its run, the tests passed and failed are counted from OUTPUT
+    """
+
+    def __init__(self, file:str, error:str='', exit_status:int=0, output:str='') -> None:
+        self.file = file
+        self.error = error
+        self.exit_status = exit_status
+        self.output = output
+        results = TEST_RESULT_REGEX.findall(output)
+        self.failed = results.count('not ok')
+        self.passed = len(results) - self.failed
+
+    @property
+    def ok(self) -> bool:
+        """Whether the file was transpiled and all its tests passed"""
+        return not self.error and not self.exit_status and not self.failed
+
+    def __repr__(self) -> str:
+        return (f'FileRunResult(file={self.file!r}, error={self.error!r}, exit_status={self.exit_status}, '
+                f'passed={self.passed}, failed={self.failed})')
+
+class TranspileContext:
+    """
+    State of the transpilation of a test FILE with OPTS and ARGS,
+    this is passed through the stages so many files can be transpiled
+    at the same time (e.g. from threads), the stages keeping the state
+    of a file are built for every context, the parser keeps its state
+    per call so its grammars are shared
+    """
+
+    def __init__(self, file:str, opts:BatsppOpts, args:BatsppArgs) -> None:
+        self.file = file
+        self.opts = opts
+        self.args = args
+        self.lexer = Lexer()
+        self.semantic_analizer = _SemanticAnalizer()
+        ## TODO: refactor with polymorfism but carefull with circular imports!
+        self.interpreter = None
+        if args.runner == BATS:
+            self.interpreter = BatsInterpreter()
+        elif args.runner == BASH:
+            self.interpreter = BashInterpreter()
+
+class WatchSession:
+    """
+    Transpilation and runs of successive versions of a test FILE with OPTS
+    and ARGS (see BatsppTest.watch()), every update tokenizes and parses
+    only the changed parts of the file (see IncrementalParser), and runs
+    only the tests whose tree changed since the previous update, this must
+    be closed when no longer used
+    """
+
+    def __init__(self, file:str, opts:BatsppOpts, args:BatsppArgs) -> None:
+        self.file = file
+        self.opts = opts
+        self.args = args
+        self.context = TranspileContext(file, opts, args)
+        self.parser = incremental.IncrementalParser()
+        # NOTE: unchanged nodes are shared by the trees (see IncrementalParser.parse())
+        self._fingerprint_memo = FingerprintMemo()
+        # Fingerprints of the global setup and teardown, and of every
+        # test of the previous update, None if all tests must be run
+        self._suite_fingerprint = None
+        self._test_fingerprints = None
+        self.run_dir = mkdtemp(prefix='batspp-watch-')
+        self.output = f'{self.run_dir}/{os_path.basename(file)}.{args.runner}'
+        # Tests and seconds of the last update
+        self.changed_tests = 0
+        self.total_tests = 0
+        self.elapsed = 0.0
+
+    def invalidate(self) -> None:
+        """Run all the tests on the next update, e.g. if a sourced file changed"""
+        self._suite_fingerprint = None
+        self._test_fingerprints = None
+
+    def update(self) -> FileRunResult:
+        """Transpile the test file and run its changed tests, returns their
+           result, without output if no test changed"""
+        timer = Timer()
+        timer.start()
+        file, opts, args = self.file, self.opts, self.args
+        try:
+            text = read_file(file)
+            if file.endswith('.ipynb'):
+                text = jupyter_to_batspp.convert(text)
+            tree, opts, args = self.parser.parse(text, opts=opts, args=args)
+            tree, opts, args = self.context.semantic_analizer.analize(tree, opts=opts, args=args)
+        except Exception as exc: # pylint: disable=broad-except
+            self.elapsed = timer.stop()
+            return FileRunResult(file, error=f'{type(exc).__name__}: {exc}')
+        # NOTE: fingerprints have the line numbers, as these are part
+        #       of the names of the tests without reference
+        memo = self._fingerprint_memo
+        memo.rotate()
+        suite_fingerprint = (memo.fingerprint(tree.global_setup), memo.fingerprint(tree.global_teardown))
+        test_fingerprints = [memo.fingerprint(test) for test in tree.tests_or_setups]
+        changed = tree.tests_or_setups
+        if suite_fingerprint == self._suite_fingerprint:
+            previous = set(self._test_fingerprints)
+            changed = [test for test, fingerprint in zip(tree.tests_or_setups, test_fingerprints)
+                       if fingerprint not in previous]
+        self.changed_tests = len(changed)
+        self.total_tests = len(test_fingerprints)
+        result = FileRunResult(file)
+        if changed:
+            suite = TestSuite(tree.global_setup, changed, tree.global_teardown, tree.eof)
+            suite.constants = tree.constants
+            with _SavedFileSink(self.output) as sink:
+                self.context.interpreter.interpret_into(suite, sink, opts=opts, args=args)
+            exit_status, output = _run_test_file(self.output, args)
+            result = FileRunResult(file, exit_status=exit_status, output=output)
+        self._suite_fingerprint = suite_fingerprint
+        self._test_fingerprints = test_fingerprints
+        self.elapsed = timer.stop()
+        trace(5, f'WatchSession.update() {self.changed_tests} of {self.total_tests} tests in {self.elapsed} seconds')
+        return result
+
+    def close(self) -> None:
+        """Remove the transpiled test file"""
+        rmtree(self.run_dir, ignore_errors=True)
+
 class BatsppTest:
     """
     This is responsible to parse and run Batspp tests
@@ -99,48 +398,123 @@ class BatsppTest:
         """Whether is FILE is not a Jupyter notebook file"""
         return not self.is_ipynb_file(file)
 
-    def transpile_to_bats(
+    def warm_up(self) -> None:
+        """Build everything shared by the transpilation of test files in
+           advance (i.e. the grammars), e.g. for a long-lived process"""
+        parser.build_all_grammars()
+
+    def _resolve_options(self, file:str, args:BatsppArgs, opts:BatsppOpts) -> tuple:
+        """Return ARGS and OPTS to transpile FILE, checking for embedded tests"""
+        # Check for embedded tests
+        if opts.embedded_tests is None:
+            opts = opts.replace(embedded_tests=self._is_not_batspp_file(file) and self.is_not_ipynb_file(file))
+
+        # Check for sources files
+        if opts.embedded_tests:
+            args = args.replace(sources=(args.sources or ()) + (file,))
+        return args, opts
+
+    def _parse_file(self, context:TranspileContext) -> tuple:
+        """Return tree of the test file of CONTEXT, with its options and arguments"""
+        file, opts, args = context.file, context.opts, context.args
+        # Large files are parsed in parallel if requested,
+        # otherwise they are tokenized and parsed as a stream
+        file_size = os_path.getsize(file) if self.is_not_ipynb_file(file) else None
+        parallel = (file_size is not None and file_size > PARALLEL_PARSE_FILE_SIZE
+                    and args.parse_workers > 1 and not opts.embedded_tests)
+        if file_size is not None and file_size > STREAMING_FILE_SIZE and not parallel:
+            with open(file, encoding='utf-8') as handle:
+                tokens = context.lexer.tokenize_stream(handle, opts=opts, args=args)
+                return parser.parse(tokens, opts=opts, args=args)
+        if self.is_ipynb_file(file):
+            return self._parse_content(context, jupyter_to_batspp.convert(read_file(file)), parallel)
+        if opts.embedded_tests:
+            return self._parse_content(context, read_file(file), parallel)
+        # Lines are decoded only when required, the mapping is
+        # released once parsed, e.g. for long-running watch or server
+        with MappedSource(file) as content:
+            return self._parse_content(context, content, parallel)
+
+    def _parse_content(self, context:TranspileContext, content:'str|MappedSource', parallel:bool) -> tuple:
+        """Return tree of CONTENT of the test file of CONTEXT, with its options and arguments,
+           parsed in PARALLEL if requested"""
+        opts, args = context.opts, context.args
+        tokens, facts = context.lexer.tokenize_to_array(content, opts=opts, args=args)
+        if parallel:
+            return parser.parse_in_parallel(tokens, opts=opts, args=args, workers=args.parse_workers, facts=facts)
+        return parser.parse(tokens, opts=opts, args=args, facts=facts)
+
+    def _transpile_into(self, context:TranspileContext, sink:TextIOBase) -> None:
+        """Write transpiled content of the test file of CONTEXT to SINK"""
+        file, opts, args = context.file, context.opts, context.args
+        # Unchanged files reuse the cached tree,
+        # skipping the lexer and the parser
+        tree = None
+        ast_cache = cache.AstCache(args.cache_dir) if args.cache_dir else None
+        if ast_cache:
+            cache_key = ast_cache.key(file, opts, is_notebook=self.is_ipynb_file(file))
+            tree = ast_cache.load(cache_key)
+        if tree is None:
+            tree, opts, args = self._parse_file(context)
+            if ast_cache:
+                ast_cache.store(cache_key, tree)
+        tree, opts, args = context.semantic_analizer.analize(tree, opts=opts, args=args)
+        context.interpreter.interpret_into(tree, sink, opts=opts, args=args)
+
+    def transpile_into(
             self,
             file: str,
-            copy_path:str='',
+            sink: TextIOBase,
             args: BatsppArgs = BatsppArgs(),
             opts: BatsppOpts = BatsppOpts()
-            ) -> str:
-        """Return transpiled Bash content from Batspp test FILE"""
+            ) -> None:
+        """Write transpiled Bash content from Batspp test FILE to SINK (e.g. a
+           file or a pipe) as it is built, so it's never kept whole in memory"""
         assert file, 'File path cannot be empty'
         timer = Timer()
         timer.start()
 
-        # Check for embedded tests
-        if opts.embedded_tests is None:
-            opts.embedded_tests = self._is_not_batspp_file(file) and self.is_not_ipynb_file(file)
-
-        # Check for sources files
-        if opts.embedded_tests:
-            if args.sources:
-                args.sources.append(file)
-            else:
-                args.sources = [file]
+        args, opts = self._resolve_options(file, args, opts)
 
         # Transpilation
-        content = gh.read_file(file)
-        content = jupyter_to_batspp.convert(content) if self.is_ipynb_file(file) else content
-        tokens, opts, args = lexer.tokenize(content, opts=opts, args=args)
-        tree, opts, args = parser.parse(tokens, opts=opts, args=args)
-        tree, opts, args = semantic_analizer.analize(tree, opts=opts, args=args)
-        ## TODO: refactor with polymorfism but carefull with circular imports!
-        interpreter = None
-        if args.runner == BATS:
-            interpreter = bats_interpreter
-        elif args.runner == BASH:
-            interpreter = bash_interpreter
-        transpiled = interpreter.interpret(tree, opts=opts, args=args)
+        #
+        # Unchanged files reuse the cached output, otherwise
+        # this is transpiled into the cache and copied from there
+        context = TranspileContext(file, opts, args)
+        output_cache = cache.OutputCache(args.cache_dir) if args.cache_dir else None
+        if output_cache:
+            output_key = output_cache.key(file, opts, args, is_notebook=self.is_ipynb_file(file))
+            if not output_cache.copy_to(output_key, sink):
+                try:
+                    with output_cache.storing(output_key) as entry:
+                        self._transpile_into(context, entry)
+                except OSError as exc:
+                    trace(3, f'BatsppTest.transpile_into() not caching {file}: {exc}')
+                # NOTE: the entry could be already evicted (e.g. if it's larger
+                #       than the cache) or not stored (e.g. if the disk is full)
+                if not output_cache.copy_to(output_key, sink):
+                    self._transpile_into(context, sink)
+        else:
+            self._transpile_into(context, sink)
+
+        trace(5, f'BatsppTest.transpile_into() finished in {timer.stop()} seconds')
+
+    def transpile_to_bats(
+            self,
+            file: str,
+            copy_path:str='',
+            args: BatsppArgs = BatsppArgs(),
+            opts: BatsppOpts = BatsppOpts()
+            ) -> str:
+        """Return transpiled Bash content from Batspp test FILE"""
+        sink = StringIO()
+        self.transpile_into(file, sink, args=args, opts=opts)
+        transpiled = sink.getvalue()
 
         # Save copy if requested
         if copy_path:
             save_resolving_path(file, copy_path, args.runner, transpiled)
 
-        debug.trace(5, f'BatsppTest.transpile_to_bats() finished in {timer.stop()} seconds')
         return transpiled
 
     def transpile_and_save_bats(
@@ -152,7 +526,10 @@ class BatsppTest:
             ) -> None:
         """Save Batspp transiled test FILE to OUTPUT path,
            if OUTPUT is not provided or is a dir, a default is used 'generated_<file>.runner'"""
-        _ = self.transpile_to_bats(file, copy_path=output, args=args, opts=opts)
+        output = resolve_path(output, file, args.runner)
+        with _SavedFileSink(output) as sink:
+            self.transpile_into(file, sink, args=args, opts=opts)
+        gh.run(f'chmod +x {output}')
 
     def run(
             self,
@@ -164,20 +541,120 @@ class BatsppTest:
         """Run Batspp test FILE and return result"""
         timer = Timer()
         timer.start()
-        # Get tests
-        transpiled = self.transpile_to_bats(file, args=args, opts=opts)
-        # Save in TMP to run
+        # Save tests in TMP to run
         temp_bats = f'{gh.get_temp_file()}.tmp'
-        save_with_permissions(temp_bats, transpiled)
+        with _SavedFileSink(temp_bats) as sink:
+            self.transpile_into(file, sink, args=args, opts=opts)
+        gh.run(f'chmod +x {temp_bats}')
         # Save copy if requested
         if copy_path:
-            save_resolving_path(file, copy_path, args.runner, transpiled)
+            copy_path = resolve_path(copy_path, file, args.runner)
+            copyfile(temp_bats, copy_path)
+            gh.run(f'chmod +x {copy_path}')
         # Run
-        sudo = 'sudo' if 'sudo' in transpiled else ''
+        sudo = 'sudo' if file_contains(temp_bats, 'sudo') else ''
         output = gh.run(f'{sudo} {args.runner} {args.run_opts} {temp_bats}')
         #
-        debug.trace(5, f'BatsppTest.run() finished in {timer.stop()} seconds')
+        trace(5, f'BatsppTest.run() finished in {timer.stop()} seconds')
         return output
 
+    def precompile(
+            self,
+            directory:str,
+            copy_path:str='',
+            args: BatsppArgs = BatsppArgs(),
+            opts: BatsppOpts = BatsppOpts(),
+            workers:int=0,
+            ) -> dict:
+        """Transpile test files under DIRECTORY into the cache of ARGS, in parallel
+           with WORKERS processes (all CPUs by default), returns the error
+           message of every file, which is empty if it was transpiled"""
+        assert args.cache_dir, 'Cache directory cannot be empty'
+        timer = Timer()
+        timer.start()
+        files = find_test_files(directory)
+        errors = _precompile_files(files, repeat(copy_path), args, opts, workers)
+        trace(5, f'BatsppTest.precompile() {len(files)} files finished in {timer.stop()} seconds')
+        return dict(zip(files, errors))
+
+    def discover(
+            self,
+            directory:str,
+            include:'Iterable[str]'=DISCOVER_INCLUDE,
+            exclude:'Iterable[str]'=(),
+            args: BatsppArgs = BatsppArgs(),
+            opts: BatsppOpts = BatsppOpts(),
+            workers:int=0,
+            run_workers:int=0,
+            skip_run:bool=False,
+            ) -> list:
+        """Transpile and run test files under DIRECTORY (see find_test_files()
+           for INCLUDE and EXCLUDE globs), files are transpiled in parallel with
+           WORKERS processes and run by RUN_WORKERS at the same time (all
+           CPUs by default), returns a FileRunResult for every file,
+           which are only transpiled if SKIP_RUN"""
+        timer = Timer()
+        timer.start()
+        files = find_test_files(directory, include=include, exclude=exclude)
+        run_dir = mkdtemp(prefix='batspp-discover-')
+        try:
+            # NOTE: prefixed by the index, as files of different directories could have the same name
+            outputs = [f'{run_dir}/{index}_{os_path.basename(file)}.{args.runner}'
+                       for index, file in enumerate(files)]
+            errors = _precompile_files(files, outputs, args, opts, workers)
+            results = [FileRunResult(file, error=error) for file, error in zip(files, errors)]
+            pending = [index for index, error in enumerate(errors) if not error]
+            if not skip_run and pending:
+                # NOTE: threads are enough, as every test file is run by another process
+                run_workers = run_workers or os_cpu_count() or 1
+                with futures.ThreadPoolExecutor(max_workers=run_workers) as executor:
+                    runs = executor.map(_run_test_file, [outputs[index] for index in pending], repeat(args))
+                    for index, (exit_status, output) in zip(pending, runs):
+                        results[index] = FileRunResult(files[index], exit_status=exit_status, output=output)
+        finally:
+            rmtree(run_dir, ignore_errors=True)
+        trace(5, f'BatsppTest.discover() {len(files)} files finished in {timer.stop()} seconds')
+        return results
+
+    def watch_session(
+            self,
+            file:str,
+            args: BatsppArgs = BatsppArgs(),
+            opts: BatsppOpts = BatsppOpts(),
+            ) -> WatchSession:
+        """Return WatchSession of Batspp test FILE"""
+        assert file, 'File path cannot be empty'
+        args, opts = self._resolve_options(file, args, opts)
+        return WatchSession(file, opts, args)
+
+    def watch(
+            self,
+            file:str,
+            report:'Callable[[WatchSession, FileRunResult], None]',
+            args: BatsppArgs = BatsppArgs(),
+            opts: BatsppOpts = BatsppOpts(),
+            updates:int=0,
+            ) -> None:
+        """Run Batspp test FILE, and again every time it or the sources of
+           ARGS change, until interrupted or after UPDATES changes (if not 0),
+           only the changed tests are run (see WatchSession), REPORT is
+           called with the session and the result of every run"""
+        session = self.watch_session(file, args=args, opts=opts)
+        # NOTE: tests could depend on anything of the sourced files (e.g. the
+        #       script of embedded tests), so all of them are run if these change
+        sources = {os_path.abspath(source) for source in session.args.sources or ()}
+        try:
+            with watcher.FileWatcher([file, *sources]) as file_watcher:
+                report(session, session.update())
+                count = 0
+                while not updates or count < updates:
+                    changed = file_watcher.wait()
+                    if changed & sources:
+                        session.invalidate()
+                    report(session, session.update())
+                    count += 1
+        finally:
+            session.close()
+
 if __name__ == '__main__':
     warning_not_intended_for_cmd()
@@ -47,7 +47,7 @@ setuptools.setup(
         "License :: OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)",
         "Operating System :: OS Independent",
     ],
-    scripts=['batspp/batspp'],
+    scripts=['batspp/batspp', 'batspp/batsppc'],
     packages=['batspp'],
     python_requires=">=3.8",
     install_requires=required,
@@ -11,6 +11,11 @@
 """Tests for batspp script"""
 
 # Standard packages
+import subprocess
+import sys
+import threading
+import time
+from glob import glob
 from os import (
     path as os_path,
     )
@@ -29,6 +34,7 @@ from mezcla import debug
 # This and "script_module=None" solve problem:
 #     "Assertion failed: "No module named" not in help_usage"
 BATSPP_PATH = os_path.abspath('./batspp/batspp')
+BATSPPC_PATH = os_path.abspath('./batspp/batsppc')
 
 class TestBatspp(TestWrapper):
     """Class for testcase definition"""
@@ -145,6 +151,20 @@ class TestBatspp(TestWrapper):
         result = gh.run(f'TMP=/tmp/another/ python3 {BATSPP_PATH} --output {test_file}')
         self.assertTrue('TEMP_DIR="/tmp/another/batspp-' in result)
 
+    def test_cache_default_args(self):
+        """Test runs with the default arguments share the cached output"""
+        debug.trace(debug.DETAILED, f"TestBatspp.test_cache_default_args({self})")
+
+        test_file = f'{self.temp_file}.batspp'
+        gh.write_file(test_file, self.simple_test)
+        cache_dir = f'{self.temp_file}.cache'
+
+        first = gh.run(f'python3 {BATSPP_PATH} --output --cache_dir {cache_dir} {test_file}')
+        second = gh.run(f'python3 {BATSPP_PATH} --output --cache_dir {cache_dir} {test_file}')
+        self.assertEqual(first, second)
+        self.assertTrue('TEMP_DIR="/tmp/batspp-$$"' in first)
+        self.assertEqual(len(glob(f'{cache_dir}/*.txt')), 1)
+
     def test_copy_dir(self):
         """Test --copy_dir argument"""
         debug.trace(debug.DETAILED, f"TestBatspp.test_copy_dir({self})")
@@ -267,6 +287,75 @@ class TestBatspp(TestWrapper):
         ## TODO: fix parser raising exception when no tests or setup is found
         self.assertTrue('SyntaxError: Expected some of "(Test, Setup)" but got "EOF"' in result)
 
+    def test_serve(self):
+        """Test --serve argument, with the batsppc client"""
+        debug.trace(debug.DETAILED, f"TestBatspp.test_serve({self})")
+
+        test_file = f'{self.temp_file}.batspp'
+        gh.write_file(test_file, self.simple_test)
+        socket_path = f'{self.temp_file}.sock'
+
+        # Without server, the client runs batspp
+        expected = gh.run(f'python3 {BATSPP_PATH} --output --temp_dir /tmp/some_dir {test_file}')
+        result = gh.run(f'SERVER_SOCKET={socket_path} python3 {BATSPPC_PATH} --output --temp_dir /tmp/some_dir {test_file}')
+        self.assertEqual(result, expected)
+
+        server = subprocess.Popen(
+            [sys.executable, BATSPP_PATH, '--serve', '--server_socket', socket_path],
+            stdout=subprocess.DEVNULL,
+            )
+        try:
+            while not os_path.exists(socket_path):
+                self.assertIsNone(server.poll())
+                time.sleep(0.01)
+            result = gh.run(f'SERVER_SOCKET={socket_path} python3 {BATSPPC_PATH} --output --temp_dir /tmp/some_dir {test_file}')
+            self.assertEqual(result, expected)
+            process = subprocess.run(
+                [sys.executable, BATSPPC_PATH, '--server_socket', socket_path, '--output', f'{test_file}.missing'],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, check=False,
+                )
+            self.assertEqual(process.returncode, 1)
+            self.assertTrue('FileNotFoundError' in process.stdout)
+        finally:
+            server.terminate()
+            server.wait()
+        self.assertFalse(os_path.exists(socket_path))
+
+    def test_watch(self):
+        """Test --watch argument, only the changed tests are run again"""
+        debug.trace(debug.DETAILED, f"TestBatspp.test_watch({self})")
+
+        test_file = f'{self.temp_file}.batspp'
+        gh.write_file(test_file, self.simple_test + '# Test other\n$ echo other\nother\n\n')
+        process = subprocess.Popen(
+            [sys.executable, BATSPP_PATH, '--watch', '--runner', 'bash', test_file],
+            stdout=subprocess.PIPE, text=True,
+            )
+        # NOTE: the process is killed if some output is missing, instead of blocking
+        timer = threading.Timer(30, process.kill)
+        timer.start()
+
+        def read_update():
+            """Return output of the next update"""
+            lines = []
+            for line in process.stdout:
+                if line.startswith('Watching'):
+                    break
+                lines.append(line)
+            return ''.join(lines)
+
+        try:
+            output = read_update()
+            self.assertTrue('2 of 2 tests changed, 0 failed, 2 passed' in output)
+            gh.write_file(test_file, self.simple_test + '# Test other\n$ echo other\nchanged\n\n')
+            output = read_update()
+            self.assertTrue('not ok 1 other' in output)
+            self.assertTrue('1 of 2 tests changed, 1 failed, 0 passed' in output)
+        finally:
+            timer.cancel()
+            process.terminate()
+            process.wait()
+
 if __name__ == '__main__':
     debug.trace_current_context()
     pytest.main([__file__])
@@ -11,7 +11,17 @@
 
 
 # Standard packages
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+from io import StringIO
+from os import makedirs
+from os import path as os_path
+from random import Random
+from shutil import copy
 from sys import path as sys_path
+from tempfile import mkdtemp
 
 # Installed packages
 import pytest
@@ -26,6 +36,11 @@ sys_path.insert(0, './batspp')
 # Reference to the module being tested
 import batspp.batspp_test as THE_MODULE
 
+# Constants
+TESTS_PATH = os_path.dirname(__file__)
+EXAMPLES_PATH = f'{TESTS_PATH}/../docs/examples'
+CASES_PATH = f'{TESTS_PATH}/cases'
+
 
 class TestBatssTest:
     """Class for testcase definition"""
@@ -56,6 +71,231 @@ class TestBatssTest:
         assert '@test' in result
         assert 'echo "hello world"' in result
 
+    def test_transpile_and_save_bats_failed(self):
+        """Ensure transpile_and_save_bats leaves the previous output untouched if the transpilation fails"""
+        input_temp_file = f'{gh.get_temp_file()}.batspp'
+        gh.write_file(input_temp_file, self.simple_test)
+        output_directory = mkdtemp()
+        output_temp_file = f'{output_directory}/output.bats'
+        batspp_test = THE_MODULE.BatsppTest()
+        batspp_test.transpile_and_save_bats(input_temp_file, output_temp_file)
+        expected = gh.read_file(output_temp_file)
+        gh.write_file(input_temp_file, '# continuation of missing test\n$ echo "hello"\nhello\n')
+        with pytest.raises(SyntaxError):
+            batspp_test.transpile_and_save_bats(input_temp_file, output_temp_file)
+        assert gh.read_file(output_temp_file) == expected
+        assert glob(f'{output_directory}/.*') == []
+
+    def test_transpile_to_bats_in_parallel(self, monkeypatch):
+        """Ensure transpile_to_bats parsing in parallel gives the same result"""
+        monkeypatch.setattr(THE_MODULE, 'PARALLEL_PARSE_FILE_SIZE', 0)
+        temp_file = f'{gh.get_temp_file()}.batspp'
+        gh.write_file(temp_file, self.simple_test.replace('# Example test\n\n', '# Test example\n') * 10)
+        batspp_test = THE_MODULE.BatsppTest()
+        expected = batspp_test.transpile_to_bats(
+            temp_file, args=THE_MODULE.BatsppArgs(), opts=THE_MODULE.BatsppOpts())
+        result = batspp_test.transpile_to_bats(
+            temp_file, args=THE_MODULE.BatsppArgs(parse_workers=2), opts=THE_MODULE.BatsppOpts())
+        assert result.count('@test') == 10
+        assert result == expected
+
+    def test_transpile_to_bats_cached(self, monkeypatch):
+        """Ensure transpile_to_bats reuses the cached output and tree of unchanged files"""
+        temp_file = f'{gh.get_temp_file()}.batspp'
+        gh.write_file(temp_file, self.simple_test)
+        cache_dir = mkdtemp()
+        batspp_test = THE_MODULE.BatsppTest()
+        expected = batspp_test.transpile_to_bats(
+            temp_file, args=THE_MODULE.BatsppArgs(cache_dir=cache_dir), opts=THE_MODULE.BatsppOpts())
+        expected_bash = batspp_test.transpile_to_bats(
+            temp_file, args=THE_MODULE.BatsppArgs(runner='bash'), opts=THE_MODULE.BatsppOpts())
+        def fail(*args, **kwargs):
+            raise AssertionError('cached file was parsed again')
+        monkeypatch.setattr(batspp_test, '_parse_file', fail)
+        result = batspp_test.transpile_to_bats(
+            temp_file, args=THE_MODULE.BatsppArgs(cache_dir=cache_dir), opts=THE_MODULE.BatsppOpts())
+        assert result == expected
+        # Different output, but same tree
+        result = batspp_test.transpile_to_bats(
+            temp_file, args=THE_MODULE.BatsppArgs(runner='bash', cache_dir=cache_dir), opts=THE_MODULE.BatsppOpts())
+        assert result == expected_bash
+        monkeypatch.setattr(batspp_test, '_transpile_into', fail)
+        result = batspp_test.transpile_to_bats(
+            temp_file, args=THE_MODULE.BatsppArgs(cache_dir=cache_dir), opts=THE_MODULE.BatsppOpts())
+        assert result == expected
+
+    def test_transpile_to_bats_default_args(self):
+        """Ensure files with embedded tests don't add sources to the default arguments"""
+        temp_file = f'{gh.get_temp_file()}.bash'
+        gh.write_file(temp_file, '# $ echo "hello world"\n# hello world\n')
+        batspp_test = THE_MODULE.BatsppTest()
+        expected = batspp_test.transpile_to_bats(temp_file)
+        assert expected.count(f'source {temp_file}') == 1
+        assert batspp_test.transpile_to_bats(temp_file) == expected
+        assert THE_MODULE.BatsppArgs().sources is None
+
+    def test_transpile_into(self):
+        """Ensure transpile_into writes the same content of transpile_to_bats"""
+        temp_file = f'{gh.get_temp_file()}.batspp'
+        gh.write_file(temp_file, self.simple_test)
+        batspp_test = THE_MODULE.BatsppTest()
+        expected = batspp_test.transpile_to_bats(temp_file, opts=THE_MODULE.BatsppOpts())
+        for cache_dir in ('', mkdtemp()):
+            # NOTE: with the cache, the output is transpiled into the cache first
+            for _ in range(2):
+                sink = StringIO()
+                batspp_test.transpile_into(
+                    temp_file, sink, args=THE_MODULE.BatsppArgs(cache_dir=cache_dir), opts=THE_MODULE.BatsppOpts())
+                assert sink.getvalue() == expected
+
+    @staticmethod
+    def _transpiles(file:str) -> bool:
+        """Whether FILE is transpiled without errors"""
+        try:
+            THE_MODULE.BatsppTest().transpile_to_bats(file)
+        except SyntaxError:
+            return False
+        return True
+
+    def test_transpile_concurrently(self):
+        """Ensure files transpiled from many threads are the same as transpiled serially"""
+        directory = mkdtemp()
+        files = []
+        for path in glob(f'{EXAMPLES_PATH}/*_example.*') + glob(f'{CASES_PATH}/*.batspp') + glob(f'{CASES_PATH}/*.ipynb'):
+            if path.endswith(('.bash', '.batspp', '.ipynb')):
+                files.append(copy(path, directory))
+        # NOTE: some cases are syntax errors on purpose
+        files = [file for file in files if self._transpiles(file)]
+        files.append(f'{directory}/synthetic.batspp')
+        gh.write_file(files[-1], ''.join(f'# Test {i}\n$ echo "hello {i}"\nhello {i}\n\n' for i in range(200)))
+        jobs = [
+            (file, THE_MODULE.BatsppArgs(runner=runner, cache_dir=cache_dir))
+            for file in files for runner in ('bats', 'bash') for cache_dir in ('', mkdtemp())
+            ]
+        batspp_test = THE_MODULE.BatsppTest()
+        def transpile(job):
+            file, args = job
+            return batspp_test.transpile_to_bats(file, args=args)
+        expected = {job: transpile(job) for job in jobs}
+        concurrent_jobs = jobs * 3
+        Random(0).shuffle(concurrent_jobs)
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(transpile, concurrent_jobs))
+        finally:
+            sys.setswitchinterval(switch_interval)
+        for job, result in zip(concurrent_jobs, results):
+            assert result == expected[job], f'{job} differs'
+
+    def test_precompile(self):
+        """Ensure precompile transpiles test files of a directory into the cache"""
+        directory = mkdtemp()
+        makedirs(f'{directory}/some')
+        gh.write_file(f'{directory}/first.batspp', self.simple_test)
+        gh.write_file(f'{directory}/some/second.batspp', self.simple_test.replace('hello', 'bye'))
+        gh.write_file(f'{directory}/some/script.bash', 'echo hello')
+        gh.write_file(f'{directory}/wrong.batspp', '$ echo hello\n')
+        args = THE_MODULE.BatsppArgs(cache_dir=mkdtemp())
+        errors = THE_MODULE.BatsppTest().precompile(directory, args=args, workers=2)
+        assert sorted(errors) == [
+            f'{directory}/first.batspp',
+            f'{directory}/some/second.batspp',
+            f'{directory}/wrong.batspp',
+            ]
+        assert not errors[f'{directory}/first.batspp']
+        assert errors[f'{directory}/wrong.batspp']
+        cached = THE_MODULE.cache.OutputCache(args.cache_dir)
+        key = cached.key(f'{directory}/first.batspp', THE_MODULE.BatsppOpts(embedded_tests=False), args)
+        assert cached.load(key) == THE_MODULE.BatsppTest().transpile_to_bats(
+            f'{directory}/first.batspp', opts=THE_MODULE.BatsppOpts())
+
+    def test_find_test_files(self):
+        """Ensure find_test_files filters files and directories with include and exclude globs"""
+        directory = mkdtemp()
+        makedirs(f'{directory}/some/vendor')
+        for file in ('first.batspp', 'notebook.ipynb', 'script.bash', 'some/second.batspp',
+                     'some/slow.batspp', 'some/vendor/third.batspp'):
+            gh.write_file(f'{directory}/{file}', '')
+        assert THE_MODULE.find_test_files(directory) == [
+            f'{directory}/first.batspp',
+            f'{directory}/notebook.ipynb',
+            f'{directory}/some/second.batspp',
+            f'{directory}/some/slow.batspp',
+            f'{directory}/some/vendor/third.batspp',
+            ]
+        assert THE_MODULE.find_test_files(
+            directory, include=['*.batspp', '*.bash'], exclude=['vendor', 'some/slow.*']) == [
+            f'{directory}/first.batspp',
+            f'{directory}/script.bash',
+            f'{directory}/some/second.batspp',
+            ]
+
+    def test_file_run_result(self):
+        """Ensure FileRunResult counts the tests from the output of Bats or Bash"""
+        output = '1..3\nok 1 first\nnot ok 2 second\n# not ok here\nok 3 third\n'
+        result = THE_MODULE.FileRunResult('file.batspp', exit_status=1, output=output)
+        assert (result.passed, result.failed, result.ok) == (2, 1, False)
+        # NOTE: the Bash runner exits with 0 even if some test failed
+        result = THE_MODULE.FileRunResult('file.batspp', output=output)
+        assert not result.ok
+        result = THE_MODULE.FileRunResult('file.batspp', output='ok 1 first\n')
+        assert (result.passed, result.failed, result.ok) == (1, 0, True)
+        assert not THE_MODULE.FileRunResult('file.batspp', error='SyntaxError').ok
+
+    def test_discover(self):
+        """Ensure discover transpiles and runs every test file of a directory"""
+        directory = mkdtemp()
+        makedirs(f'{directory}/some')
+        gh.write_file(f'{directory}/first.batspp', self.simple_test)
+        gh.write_file(f'{directory}/some/first.batspp', self.simple_test + '# Failed\n$ echo a\nb\n\n')
+        gh.write_file(f'{directory}/wrong.batspp', '$ echo hello\n')
+        args = THE_MODULE.BatsppArgs(runner='bash')
+        results = THE_MODULE.BatsppTest().discover(directory, args=args, workers=2, run_workers=2)
+        assert [result.file for result in results] == [
+            f'{directory}/first.batspp',
+            f'{directory}/some/first.batspp',
+            f'{directory}/wrong.batspp',
+            ]
+        assert [(result.ok, result.passed, result.failed) for result in results] == [
+            (True, 1, 0),
+            (False, 1, 1),
+            (False, 0, 0),
+            ]
+        assert results[2].error
+        results = THE_MODULE.BatsppTest().discover(directory, exclude=['wrong.*'], args=args, skip_run=True)
+        assert [(result.file, result.ok) for result in results] == [
+            (f'{directory}/first.batspp', True),
+            (f'{directory}/some/first.batspp', True),
+            ]
+
+    def test_watch_session(self):
+        """Ensure a watch session only runs the tests changed since the previous update"""
+        temp_file = f'{mkdtemp()}/watched.batspp'
+        gh.write_file(temp_file, self.simple_test + '# Other\n$ echo other\nother\n\n')
+        args = THE_MODULE.BatsppArgs(runner='bash')
+        session = THE_MODULE.BatsppTest().watch_session(temp_file, args=args)
+        try:
+            result = session.update()
+            assert (result.passed, result.failed) == (2, 0)
+            assert (session.changed_tests, session.total_tests) == (2, 2)
+            gh.write_file(temp_file, self.simple_test + '# Other\n$ echo other\nchanged\n\n')
+            result = session.update()
+            assert (result.passed, result.failed) == (0, 1)
+            assert (session.changed_tests, session.total_tests) == (1, 2)
+            assert session.parser.parsed_blocks == 1
+            result = session.update()
+            assert (result.passed, result.failed, result.output) == (0, 0, '')
+            assert session.changed_tests == 0
+            session.invalidate()
+            assert session.update().failed == 1
+            assert session.changed_tests == 2
+            gh.write_file(temp_file, '$ echo hello\n')
+            assert session.update().error
+        finally:
+            session.close()
+
     def test_run(self):
         """Ensure run works as expected"""
         temp_file = f'{gh.get_temp_file()}.batspp'
@@ -64,6 +304,26 @@ class TestBatssTest:
         result = batspp_test.run(temp_file)
         assert '1..1\nok 1 test of line 3' == result
 
+    def test_light_import(self):
+        """Ensure the transpilation doesn't import heavy dependencies, these are imported on first use"""
+        code = (
+            'import sys\n'
+            'from batspp.batspp_test import BatsppTest\n'
+            f'BatsppTest().transpile_to_bats("{EXAMPLES_PATH}/batspp_example.batspp")\n'
+            'print(sorted(module for module in sys.modules if module.startswith(("mezcla", "concurrent"))))\n'
+            )
+        process = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, text=True, check=True)
+        assert process.stdout.strip() == '[]'
+        # Modules only required to cache, discover, watch or compile grammars
+        code = (
+            'import sys\n'
+            'import batspp.batspp_test\n'
+            'print(sorted(module for module in sys.modules if module in '
+            '("batspp._cache", "batspp._incremental", "batspp._parser_generator")))\n'
+            )
+        process = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, text=True, check=True)
+        assert process.stdout.strip() == '[]'
+
     def test_add_prefix_to_filename(self):
         """Ensure add_prefix_to_filename works as expected"""
         filename = '/example/some/file.txt'
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+#
+# Tests for _cache module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_cache.py
+#
+
+"""Tests for _cache module"""
+
+# Standard packages
+import os
+from io import StringIO
+from sys import path as sys_path
+from tempfile import mkdtemp
+
+# Installed packages
+import pytest
+from mezcla import debug
+from mezcla import glue_helpers as gh
+
+# Local packages
+sys_path.insert(0, './batspp')
+from batspp._lexer import lexer
+from batspp._parser import parser
+from batspp._token import ASSERT_EQ
+from batspp.batspp_args import BatsppArgs
+from batspp.batspp_opts import BatsppOpts
+
+# Reference to the module being tested
+import batspp._cache as THE_MODULE
+
+class TestAstCache:
+    """Class for testcase definition"""
+
+    text = '# Test greeting\n$ echo hi\nhi\n\nfibonacci 1 => 1\n'
+
+    def parse_file(self, text:str) -> tuple:
+        """Save TEXT to a temporal test file, returns the file and its tree and options"""
+        temp_file = f'{gh.get_temp_file()}.batspp'
+        gh.write_file(temp_file, text)
+        opts = BatsppOpts(embedded_tests=False)
+        tokens, facts = lexer.tokenize(text, opts=opts)
+        tree, opts, _ = parser.parse(tokens, opts=opts, facts=facts)
+        return temp_file, tree, opts
+
+    def test_store_and_load(self):
+        """Ensure cached trees are loaded"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestAstCache.test_store_and_load(); self={self}")
+        cache = THE_MODULE.AstCache(mkdtemp())
+        file, tree, opts = self.parse_file(self.text)
+        key = cache.key(file, opts)
+        assert cache.load(key) is None
+        cache.store(key, tree)
+        loaded_tree = cache.load(key)
+        assert len(loaded_tree.tests_or_setups) == len(tree.tests_or_setups)
+        arrow_assertion = loaded_tree.tests_or_setups[1].child.setup_assertions[0].assertion.assertion
+        # Token variants are compared by identity by the interpreter
+        assert arrow_assertion.assertion.variant is ASSERT_EQ
+        assert arrow_assertion.start_line == 5
+
+    def test_key(self):
+        """Ensure keys change with the content and the options"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestAstCache.test_key(); self={self}")
+        cache = THE_MODULE.AstCache(mkdtemp())
+        file, _, opts = self.parse_file(self.text)
+        other_file, _, _ = self.parse_file(self.text + '\n$ echo bye\nbye\n')
+        key = cache.key(file, opts)
+        assert key == cache.key(file, BatsppOpts(embedded_tests=False))
+        assert key != cache.key(other_file, opts)
+        assert key != cache.key(file, BatsppOpts(embedded_tests=True))
+        assert key != cache.key(file, opts, is_notebook=True)
+
+    def test_evict(self):
+        """Ensure least recently used entries are evicted"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestAstCache.test_evict(); self={self}")
+        cache = THE_MODULE.AstCache(mkdtemp())
+        keys = []
+        for i in range(3):
+            file, tree, opts = self.parse_file(self.text + f'\n$ echo {i}\n{i}\n')
+            keys.append(cache.key(file, opts))
+            cache.store(keys[-1], tree)
+            # NOTE: the modification time is used to sort the entries
+            os.utime(cache._path(keys[-1]), (i, i))
+        entry_size = os.path.getsize(cache._path(keys[0]))
+        cache.max_size = entry_size * 2
+        # Load first entry, so the second one is the least recently used
+        assert cache.load(keys[0]) is not None
+        cache.evict()
+        assert os.path.exists(cache._path(keys[0]))
+        assert not os.path.exists(cache._path(keys[1]))
+        assert os.path.exists(cache._path(keys[2]))
+
+    def test_corrupted_entry(self):
+        """Ensure corrupted entries are discarded"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestAstCache.test_corrupted_entry(); self={self}")
+        cache = THE_MODULE.AstCache(mkdtemp())
+        file, _, opts = self.parse_file(self.text)
+        key = cache.key(file, opts)
+        gh.write_file(cache._path(key), 'not a pickle')
+        assert cache.load(key) is None
+        assert not os.path.exists(cache._path(key))
+
+    def test_unwritable_directory(self):
+        """Ensure trees are not stored, without error, if the directory cannot be written"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestAstCache.test_unwritable_directory(); self={self}")
+        # NOTE: a directory under a file fails even if run as root
+        not_a_directory = gh.get_temp_file()
+        gh.write_file(not_a_directory, '')
+        cache = THE_MODULE.AstCache(f'{not_a_directory}/cache')
+        file, tree, opts = self.parse_file(self.text)
+        key = cache.key(file, opts)
+        cache.store(key, tree)
+        assert cache.load(key) is None
+
+class TestOutputCache:
+    """Class for testcase definition"""
+
+    def test_key(self):
+        """Ensure keys change with the options and arguments of the output"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestOutputCache.test_key(); self={self}")
+        cache = THE_MODULE.OutputCache(mkdtemp())
+        file = f'{gh.get_temp_file()}.batspp'
+        gh.write_file(file, '$ echo hi\nhi\n')
+        key = cache.key(file, BatsppOpts(), BatsppArgs())
+        assert key == cache.key(file, BatsppOpts(), BatsppArgs(parse_workers=4, cache_dir='/some/dir'))
+        assert key != cache.key(file, BatsppOpts(omit_trace=True), BatsppArgs())
+        assert key != cache.key(file, BatsppOpts(), BatsppArgs(runner='bash'))
+        assert key != cache.key(file, BatsppOpts(), BatsppArgs(temp_dir='/some/dir'))
+
+    def test_store_and_load(self):
+        """Ensure cached outputs are loaded and share the directory with trees"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestOutputCache.test_store_and_load(); self={self}")
+        directory = mkdtemp()
+        cache = THE_MODULE.OutputCache(directory)
+        file = f'{gh.get_temp_file()}.batspp'
+        gh.write_file(file, '$ echo hi\nhi\n')
+        key = cache.key(file, BatsppOpts(), BatsppArgs())
+        assert cache.load(key) is None
+        cache.store(key, 'transpiled')
+        assert cache.load(key) == 'transpiled'
+        sink = StringIO()
+        assert cache.copy_to(key, sink)
+        assert sink.getvalue() == 'transpiled'
+        # Failed outputs are not stored
+        other_key = cache.key(file, BatsppOpts(omit_trace=True), BatsppArgs())
+        with pytest.raises(ValueError):
+            with cache.storing(other_key) as entry:
+                entry.write('partial')
+                raise ValueError('failed transpilation')
+        assert not cache.copy_to(other_key, StringIO())
+        # Entries of other caches are not evicted
+        gh.write_file(os.path.join(directory, f'some{THE_MODULE.AstCache.entry_extension}'), 'tree')
+        cache.max_size = 0
+        cache.evict()
+        assert os.listdir(directory) == [f'some{THE_MODULE.AstCache.entry_extension}']
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
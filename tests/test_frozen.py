@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+#
+# Tests for _frozen module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_frozen.py
+#
+
+"""Tests for _frozen module"""
+
+# Standard packages
+import pickle
+from sys import path as sys_path
+
+# Installed packages
+import pytest
+from mezcla import debug
+
+# Local packages
+sys_path.insert(0, './batspp')
+from batspp.batspp_args import BatsppArgs
+from batspp.batspp_opts import BatsppOpts
+
+# Reference to the module being tested
+import batspp._frozen as THE_MODULE
+
+class TestFrozen:
+    """Class for testcase definition"""
+
+    def test_immutable(self):
+        """Ensure options and arguments can't be changed"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestFrozen.test_immutable(); self={self}")
+        opts = BatsppOpts()
+        args = BatsppArgs(sources=['first.bash'])
+        assert isinstance(opts, THE_MODULE.Frozen)
+        with pytest.raises(AttributeError, match='immutable'):
+            opts.embedded_tests = True
+        with pytest.raises(AttributeError, match='immutable'):
+            del args.runner
+        assert args.sources == ('first.bash',)
+
+    def test_replace(self):
+        """Ensure replace returns a changed copy"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestFrozen.test_replace(); self={self}")
+        args = BatsppArgs(sources=['first.bash'], runner='bash')
+        result = args.replace(sources=args.sources + ('second.bash',))
+        assert result.sources == ('first.bash', 'second.bash')
+        assert result.runner == 'bash'
+        assert args.sources == ('first.bash',)
+        with pytest.raises(Exception, match='Unknown test runner'):
+            args.replace(runner='sh')
+
+    def test_hash(self):
+        """Ensure equal options have the same hash, also once pickled"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestFrozen.test_hash(); self={self}")
+        opts = BatsppOpts(embedded_tests=True)
+        assert opts == BatsppOpts(embedded_tests=True)
+        assert opts != BatsppOpts(embedded_tests=False)
+        assert opts != BatsppArgs()
+        assert hash(opts) == hash(BatsppOpts(embedded_tests=True))
+        args = BatsppArgs(visible_paths=['/some/path'])
+        assert len({args, BatsppArgs(visible_paths=('/some/path',))}) == 1
+        loaded = pickle.loads(pickle.dumps(args))
+        assert loaded == args and hash(loaded) == hash(args)
+        with pytest.raises(AttributeError):
+            loaded.runner = 'bash'
+        assert repr(opts).startswith('BatsppOpts(')
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#
+# Tests for _incremental module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_incremental.py
+#
+
+"""Tests for _incremental module"""
+
+# Standard packages
+from glob import glob
+from os import path as os_path
+from sys import path as sys_path
+
+# Installed packages
+import pytest
+from mezcla import debug
+
+# Local packages
+sys_path.insert(0, './batspp')
+from batspp._lexer import Lexer
+from batspp._parser import parser
+from batspp.batspp_opts import BatsppOpts
+
+# Reference to the module being tested
+import batspp._incremental as THE_MODULE
+
+# Constants
+TESTS_PATH = os_path.dirname(__file__)
+CASES_PATH = f'{TESTS_PATH}/cases'
+OPTS = BatsppOpts(embedded_tests=False)
+
+TEXT = (
+    '# Test first\n'
+    '$ echo first\n'
+    'first\n'
+    '\n'
+    '# Test second\n'
+    '$ echo second\n'
+    'second\n'
+    '\n'
+    '# Test third\n'
+    '$ echo third\n'
+    'third\n'
+    )
+
+def full_parse(text:str) -> tuple:
+    """Return fingerprint of TEXT parsed from scratch"""
+    tokens, facts = Lexer().tokenize(text, opts=OPTS)
+    tree, _, _ = parser.parse(tokens, opts=OPTS, facts=facts)
+    return tree.fingerprint()
+
+class TestIncrementalParser:
+    """Class for testcase definition"""
+
+    @pytest.mark.parametrize('file', sorted(glob(f'{CASES_PATH}/*.batspp')))
+    def test_same_tree(self, file):
+        """Ensure the tree is the same of a parse from scratch, also if the lines are moved"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestIncrementalParser.test_same_tree(); self={self}")
+        with open(file, encoding='utf-8') as handle:
+            text = handle.read()
+        incremental_parser = THE_MODULE.IncrementalParser()
+        tree, _, _ = incremental_parser.parse(text, opts=OPTS)
+        assert tree.fingerprint() == full_parse(text)
+        text = f'\n\n{text}'
+        tree, _, _ = incremental_parser.parse(text, opts=OPTS)
+        assert tree.fingerprint() == full_parse(text)
+
+    def test_changed_parts(self):
+        """Ensure only changed lines are tokenized and only changed blocks are parsed"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestIncrementalParser.test_changed_parts(); self={self}")
+        incremental_parser = THE_MODULE.IncrementalParser()
+        incremental_parser.parse(TEXT, opts=OPTS)
+        # NOTE: the first block has the first two tests
+        assert incremental_parser.parsed_blocks == 2
+        text = TEXT.replace('second\n\n', 'changed\n\n')
+        tree, _, _ = incremental_parser.parse(text, opts=OPTS)
+        assert tree.fingerprint() == full_parse(text)
+        assert incremental_parser.lexed_lines == 1
+        assert (incremental_parser.parsed_blocks, incremental_parser.reused_blocks) == (1, 1)
+        # Moved blocks are reused, the second test is no longer in the first block
+        text = f'# Test zero\n$ echo zero\nzero\n\n{text}'
+        tree, _, _ = incremental_parser.parse(text, opts=OPTS)
+        assert tree.fingerprint() == full_parse(text)
+        assert (incremental_parser.parsed_blocks, incremental_parser.reused_blocks) == (2, 1)
+        text = text.replace('# Test third', '\n# Test third')
+        tree, _, _ = incremental_parser.parse(text, opts=OPTS)
+        assert tree.fingerprint() == full_parse(text)
+        assert (incremental_parser.parsed_blocks, incremental_parser.reused_blocks) == (1, 2)
+
+    def test_copied_tree(self):
+        """Ensure the trees could be modified without changing the next ones"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestIncrementalParser.test_copied_tree(); self={self}")
+        incremental_parser = THE_MODULE.IncrementalParser()
+        tree, _, _ = incremental_parser.parse(TEXT, opts=OPTS)
+        tree.tests_or_setups[0].child.setup_assertions.clear()
+        tree, _, _ = incremental_parser.parse(TEXT, opts=OPTS)
+        assert incremental_parser.reused_blocks == 2
+        assert tree.fingerprint() == full_parse(TEXT)
+
+    def test_syntax_error(self):
+        """Ensure syntax errors are raised same as a parse from scratch"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestIncrementalParser.test_syntax_error(); self={self}")
+        incremental_parser = THE_MODULE.IncrementalParser()
+        incremental_parser.parse(TEXT, opts=OPTS)
+        with pytest.raises(SyntaxError, match='line 12'):
+            incremental_parser.parse(TEXT + '# Continuation of nothing\n', opts=OPTS)
+        # NOTE: a global teardown is only valid at the end, blocks are parsed fine on their own
+        with pytest.raises(SyntaxError, match='line 15'):
+            incremental_parser.parse(TEXT + '# Global teardown\n$ echo x\n\n# Test after\n$ echo a\na\n', opts=OPTS)
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+#
+# Tests for _lazy module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_lazy.py
+#
+
+"""Tests for _lazy module"""
+
+# Standard packages
+import sys
+from sys import path as sys_path
+
+# Installed packages
+import pytest
+from mezcla import debug
+
+# Local packages
+sys_path.insert(0, './batspp')
+## NOTE: this is empty for now
+
+# Reference to the module being tested
+import batspp._lazy as THE_MODULE
+
+class TestLazy:
+    """Class for testcase definition"""
+
+    def test_lazy_module(self, monkeypatch):
+        """Ensure LazyModule imports the module on the first access to its attributes"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestLazy.test_lazy_module(); self={self}")
+        monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+        module = THE_MODULE.LazyModule('colorsys')
+        assert 'colorsys' not in sys.modules
+        assert 'imported=False' in repr(module)
+        assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+        assert 'colorsys' in sys.modules
+        assert 'imported=True' in repr(module)
+        with pytest.raises(AttributeError):
+            _ = module.missing_function
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
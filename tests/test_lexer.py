@@ -9,7 +9,11 @@
 """Tests for _lexer module"""
 
 # Standard packages
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 from sys import path as sys_path
+from os import path as os_path
+from glob import glob
 
 # Installed packages
 import pytest
@@ -17,7 +21,9 @@ from mezcla import debug
 
 # Local packages
 sys_path.insert(0, './batspp')
+import batspp._token
 from batspp._token import (
+    variant_code,
     Token, EOF, NEW_LINE, PESO,
     TEST, SETUP, CONTINUATION,
     POINTER, ASSERT_EQ, TEXT,
@@ -30,6 +36,11 @@ from batspp.batspp_opts import (
     BatsppOpts,
     )
 
+# Constants
+TESTS_PATH = os_path.dirname(__file__)
+EXAMPLES_PATH = f'{TESTS_PATH}/../docs/examples'
+CASES_PATH = f'{TESTS_PATH}/cases'
+
 class TestTextLiner:
     """Class for testcase definition"""
 
@@ -141,9 +152,8 @@ class TestLexer:
         """
         Tokenize STRING, verify tokens and returned variants
         """
-        opts = BatsppOpts()
-        opts.embedded_tests=embedded_tests
-        tokens, _, _ = THE_MODULE.Lexer().tokenize(string, opts=opts)
+        opts = BatsppOpts(embedded_tests=embedded_tests)
+        tokens, _ = THE_MODULE.Lexer().tokenize(string, opts=opts)
         assert tokens
         assert isinstance(tokens, list)
 
@@ -310,6 +320,95 @@ class TestLexer:
         """Test for line() method"""
         ## TODO: WORK-IN-PROGRESS
 
+    def test_same_tokens_as_legacy_extraction(self):
+        """Test master pattern extraction against legacy extraction"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestLexer.test_same_tokens_as_legacy_extraction(); self={self}")
+
+        def extract(text, embedded_tests, legacy):
+            opts = BatsppOpts(embedded_tests=embedded_tests)
+            lexer = THE_MODULE.Lexer(legacy_extraction=legacy)
+            tokens, facts = lexer.tokenize(text, opts=opts)
+            tokens = [
+                (tok.variant, tok.value, tok.data.text_line, tok.data.line, tok.data.column)
+                for tok in tokens
+                ]
+            return tokens, facts
+
+        texts = [
+            '# Global setup\n$ cmd\n> extension \n\n# Teardown\n$ rm file',
+            '# Test of foo =>\n# test\n$ # Setup\n$\n> # comment\n## double',
+            '# Continue of bar\nfunc a\\=>b => c =/> d\n<END>\n<EOF><BLANK>\n',
+            ]
+        for path in glob(f'{EXAMPLES_PATH}/*_example.*') + glob(f'{CASES_PATH}/*.batspp'):
+            with open(path, encoding='utf-8') as file:
+                texts.append(file.read())
+        for text in texts:
+            for embedded_tests in (False, True):
+                expected = extract(text, embedded_tests, legacy=True)
+                assert extract(text, embedded_tests, legacy=False) == expected
+
+    def test_tokenize_stream(self):
+        """Test streaming tokenization against full text tokenization"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestLexer.test_tokenize_stream(); self={self}")
+
+        def to_tuples(tokens):
+            return [
+                (tok.variant, tok.value, tok.data.text_line, tok.data.line, tok.data.column)
+                for tok in tokens
+                ]
+
+        paths = glob(f'{EXAMPLES_PATH}/*_example.*') + glob(f'{CASES_PATH}/*.batspp')
+        for path in paths:
+            with open(path, encoding='utf-8') as file:
+                text = file.read()
+            for embedded_tests in (False, True):
+                opts = BatsppOpts(embedded_tests=embedded_tests)
+                expected, _ = THE_MODULE.Lexer().tokenize(text, opts=opts)
+                stream = THE_MODULE.Lexer().tokenize_stream(StringIO(text), opts=opts)
+                assert not isinstance(stream, list)
+                assert to_tuples(stream) == to_tuples(expected)
+
+    def test_tokenize_to_array(self):
+        """Test compact token array against list of tokens"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestLexer.test_tokenize_to_array(); self={self}")
+
+        def to_tuples(tokens):
+            return [
+                (tok.variant, tok.value, tok.data.text_line, tok.data.line, tok.data.column)
+                for tok in tokens
+                ]
+
+        texts = ['$ some command\n<BLANK>\n<END>\n\nfunc => result\n']
+        for path in glob(f'{EXAMPLES_PATH}/*_example.*') + glob(f'{CASES_PATH}/*.batspp'):
+            with open(path, encoding='utf-8') as file:
+                texts.append(file.read())
+        for text in texts:
+            for embedded_tests in (False, True):
+                opts = BatsppOpts(embedded_tests=embedded_tests)
+                expected, expected_facts = THE_MODULE.Lexer().tokenize(text, opts=opts)
+                array, facts = THE_MODULE.Lexer().tokenize_to_array(text, opts=opts)
+                assert facts == expected_facts
+                assert len(array) == len(expected)
+                assert to_tuples(array.to_list()) == to_tuples(expected)
+                assert all(token.variant is array.to_list()[i].variant for i, token in enumerate(expected))
+
+    def test_variant_code(self, monkeypatch):
+        """Test unknown variants registered concurrently get a single code, up to the limit"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestLexer.test_variant_code(); self={self}")
+        variants = [f'CONCURRENT_VARIANT_{i}' for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            codes = list(executor.map(variant_code, variants * 8))
+        assert codes == [variant_code(variant) for variant in variants] * 8
+        assert len(set(codes)) == len(variants)
+        assert variant_code(PESO) == 0
+        monkeypatch.setattr(batspp._token, 'MAX_VARIANTS', len(batspp._token.VARIANTS))
+        with pytest.raises(ValueError, match='Cannot register'):
+            variant_code('ONE_VARIANT_TOO_MANY')
+
 if __name__ == '__main__':
     debug.trace_current_context()
     pytest.main([__file__])
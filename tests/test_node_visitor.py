@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+#
+# Tests for _node_visitor module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_node_visitor.py
+#
+
+"""Tests for _node_visitor module"""
+
+# Standard packages
+from sys import path as sys_path
+
+# Installed packages
+import pytest
+from mezcla import debug
+
+# Local packages
+sys_path.insert(0, './batspp')
+from batspp._ast_node import (
+    ASTnode, Text, MultilineText,
+    )
+from batspp._token import Token, TEXT
+
+# Reference to the module being tested
+import batspp._node_visitor as THE_MODULE
+
+class SomeNode(ASTnode):
+    """Node defined after the visitors"""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text: Text) -> None:
+        self.text = text
+
+class TextVisitor(THE_MODULE.NodeVisitor):
+    """Visitor that collects visited text"""
+
+    def __init__(self) -> None:
+        self.visited = []
+
+    # pylint: disable=invalid-name
+    def visit_Text(self, node: Text) -> str:
+        """Visit Text NODE"""
+        self.visited.append(node.text.value)
+        return node.text.value
+
+    # pylint: disable=invalid-name
+    def visit_MultilineText(self, node: MultilineText) -> None:
+        """Visit MultilineText NODE"""
+        self.visited.append('multiline')
+
+    # pylint: disable=invalid-name
+    def visit_SomeNode(self, node: SomeNode) -> None:
+        """Visit SomeNode NODE"""
+        self.visited.append('some')
+
+def build_text(text:str) -> Text:
+    """Build Text node with TEXT"""
+    return Text(Token(TEXT, text))
+
+class TestNodeVisitor:
+    """Class for testcase definition"""
+
+    def test_visit(self):
+        """Ensure nodes are dispatched to their visit methods"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestNodeVisitor.test_visit(); self={self}")
+        assert Text in TextVisitor._dispatch
+        visitor = TextVisitor()
+        assert visitor.visit(build_text('hi')) == 'hi'
+        # Node types unknown when the visitor was defined
+        visitor.visit(SomeNode(build_text('hi')))
+        assert visitor.visited == ['hi', 'some']
+        with pytest.raises(Exception, match="can't be None"):
+            visitor.visit(None)
+        with pytest.raises(Exception, match='must be a ASTnode'):
+            visitor.visit('hi')
+        with pytest.raises(Exception, match='No visit_Constants method'):
+            visitor.visit(THE_MODULE.node_types()['Constants']([]))
+
+    def test_walk(self):
+        """Ensure walk yields nodes in pre-order and post-order"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestNodeVisitor.test_walk(); self={self}")
+        tree = MultilineText([build_text('a'), Token(TEXT, 'token'), SomeNode(build_text('b'))])
+        pre_order = [type(node).__name__ for node in THE_MODULE.walk(tree)]
+        assert pre_order == ['MultilineText', 'Text', 'SomeNode', 'Text']
+        post_order = [type(node).__name__ for node in THE_MODULE.walk(tree, post_order=True)]
+        assert post_order == ['Text', 'Text', 'SomeNode', 'MultilineText']
+        visitor = TextVisitor()
+        visitor.visit_walk(tree, post_order=True)
+        assert visitor.visited == ['a', 'b', 'some', 'multiline']
+
+    def test_walk_deep_tree(self):
+        """Ensure walk doesn't reach the recursion limit"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestNodeVisitor.test_walk_deep_tree(); self={self}")
+        tree = build_text('leaf')
+        for _ in range(10000):
+            tree = SomeNode(tree)
+        assert sum(1 for _ in THE_MODULE.walk(tree, post_order=True)) == 10001
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
@@ -9,6 +9,7 @@
 """Tests for _parser module"""
 
 # Standard packages
+import gc
 from sys import path as sys_path
 
 # Installed packages
@@ -19,9 +20,15 @@ from mezcla import debug
 sys_path.insert(0, './batspp')
 
 # Reference to the module being tested
-from batspp._parser import _Rule
+from batspp._parser import (
+    _Rule, _Parser, _TokenCursor, _PackratMemo, _Failure,
+    paused_gc,
+    )
+from batspp._lexer import lexer
+from batspp.batspp_opts import BatsppOpts
 from batspp._token import (
-    Token, TokenData,
+    TEST, Token, TokenData, TokenList, TokenStream,
+    variant_code,
     )
 
 # Tokens for testing purposes
@@ -140,10 +147,181 @@ class TestRule:
         result, _ = rule.build_tree_from(tokens)
         self.assert_tokens_variants(result.children[0], [TOKEN_ONE, TOKEN_ONE])
 
+    def test_backtracking(self):
+        """Test that failed rules don't consume tokens"""
+        partial = _Rule(TestAstNode, None) \
+            .expect(TOKEN_ONE).expect(TOKEN_ONE)
+        rule = _Rule(TestAstNode, None) \
+            .expect_some_of(partial, TOKEN_ONE).expect(TOKEN_TWO)
+        variants = [TOKEN_ONE, TOKEN_TWO, TOKEN_ONE]
+        tokens = self.generate_list_of_tokens(variants)
+        result, remaining = rule.build_tree_from(tokens)
+        self.assert_tokens_variants(result.children, [TOKEN_ONE, TOKEN_TWO])
+        self.assert_tokens_variants(remaining, [TOKEN_ONE])
+
+    def test_compute_lookahead(self):
+        """Test for compute_lookahead() rule method"""
+        optional = _Rule(TestAstNode, None) \
+            .optionally(TOKEN_ONE)
+        rule = _Rule(TestAstNode, None) \
+            .expect(optional).expect_some_of(TOKEN_TWO, TOKEN_ONE)
+        rule.compute_lookahead()
+        assert optional._nullable
+        assert not rule._nullable
+        assert rule._first == {variant_code(TOKEN_ONE), variant_code(TOKEN_TWO)}
+
+    def test_predictive(self):
+        """Test that predictive rules build the same tree and errors"""
+        def build_rule():
+            partial = _Rule(TestAstNode, None) \
+                .expect(TOKEN_ONE).expect(TOKEN_ONE)
+            return _Rule(TestAstNode, None) \
+                .zero_or_more(TOKEN_TWO) \
+                .expect_some_of(partial, TOKEN_ONE).expect(TOKEN_TWO)
+        def build_tree_or_error(rule, tokens):
+            try:
+                result, _ = rule.build_tree_from(tokens)
+            except SyntaxError as exc:
+                return str(exc)
+            loop, choice, *rest = result.children
+            choice = choice.children if isinstance(choice, TestAstNode) else [choice]
+            return [token.variant for token in loop + list(choice) + rest]
+        predictive = build_rule()
+        predictive.compute_lookahead()
+        for variants in (
+                [TOKEN_ONE, TOKEN_TWO],
+                [TOKEN_TWO, TOKEN_ONE, TOKEN_ONE, TOKEN_TWO],
+                [TOKEN_TWO, TOKEN_ONE, TOKEN_ONE, TOKEN_ONE],
+                [TOKEN_TWO, 'TOKEN_THREE'],
+                ):
+            tokens = self.generate_list_of_tokens(variants)
+            expected = build_tree_or_error(build_rule(), tokens)
+            assert build_tree_or_error(predictive, tokens) == expected
+
+    def test_packrat_memo(self):
+        """Test that memoized rules are not run twice on the same tokens"""
+        partial = _Rule(TestAstNode, None) \
+            .expect(TOKEN_ONE).expect(TOKEN_ONE)
+        rule = _Rule(TestAstNode, None) \
+            .zero_or_more(TOKEN_TWO).until(partial).expect(partial)
+        memo = _PackratMemo()
+        tokens = TokenList(self.generate_list_of_tokens([TOKEN_TWO, TOKEN_ONE, TOKEN_ONE]))
+        result = rule.build_tree_at(_TokenCursor(tokens, memo=memo), 0)
+        self.assert_tokens_variants(result.children[0], [TOKEN_TWO])
+        self.assert_tokens_variants(result.children[1].children, [TOKEN_ONE, TOKEN_ONE])
+        # Lookahead of partial failed on first token, then succeeded
+        # on second one, and the expected partial reused that result
+        assert memo.hits == 1
+        assert memo.misses == 3
+
+    def test_failure(self):
+        """Test that failed rules return a failure instead of raising an error"""
+        partial = _Rule(TestAstNode, None) \
+            .expect(TOKEN_ONE).expect(TOKEN_ONE)
+        rule = _Rule(TestAstNode, None) \
+            .expect_some_of(partial, TOKEN_TWO)
+        tokens = TokenList(self.generate_list_of_tokens([TOKEN_ONE, TOKEN_TWO]))
+        failure = rule.build_tree_at(_TokenCursor(tokens), 0)
+        assert isinstance(failure, _Failure)
+        assert failure.position == 0
+        # The syntax error is only built when required
+        with pytest.raises(SyntaxError) as exc_info:
+            failure.raise_error(tokens)
+        assert 'Expected some of "(TestAstNode, \'TOKEN_TWO\')" but got "TOKEN_ONE"' in str(exc_info.value)
+
+    def test_token_stream(self):
+        """Test building a tree from a lazy stream of tokens"""
+        rule = _Rule(TestAstNode, None) \
+            .one_or_more(TOKEN_ONE).expect(TOKEN_TWO)
+        variants = [TOKEN_ONE] * 50 + [TOKEN_TWO]
+        stream = TokenStream(iter(self.generate_list_of_tokens(variants)))
+        result, _ = rule.build_tree_from(stream.view())
+        self.assert_tokens_variants(result.children[0], variants[:-1])
+        self.assert_tokens_variants(result.children[1:], [TOKEN_TWO])
+        # Consumed tokens are released by the root rule loop
+        assert len(stream._buffer) < len(variants)
+
     def test_nested_rules(self):
         """Test for nested rules"""
         ## TODO: implement
 
+class TestParser:
+    """Class for testcase definition"""
+
+    def test_grammar_cache(self):
+        """Test that grammars are built once and can be reused"""
+        parser = _Parser()
+        grammar = parser.get_grammar(False, True, False)
+        assert parser.get_grammar(None, True, False) is grammar
+        assert parser.get_grammar(False, False, False) is not grammar
+        text = '# Test greeting\n$ echo hi\nhi\n\nfibonacci 1 => 1\n'
+        opts = BatsppOpts(embedded_tests=False)
+        tokens, facts = lexer.tokenize(text, opts=opts)
+        first_tree, _, _ = parser.parse(tokens, opts=opts, facts=facts)
+        second_tree, _, _ = parser.parse(tokens, opts=opts, facts=facts)
+        assert len(parser._grammars) == 2
+        assert first_tree is not second_tree
+        assert len(first_tree.tests_or_setups) == len(second_tree.tests_or_setups) == 2
+
+    def test_line_spans(self):
+        """Test that nodes built by the parser have the span of their lines"""
+        text = '# Test greeting\n$ echo hi\nhi\n\nfibonacci 1 => 1\n'
+        for compiled in (False, True):
+            opts = BatsppOpts(embedded_tests=False)
+            tokens, facts = lexer.tokenize(text, opts=opts)
+            tree, _, _ = _Parser(compiled=compiled).parse(tokens, opts=opts, facts=facts)
+            first_test, second_test = [test_or_setup.child for test_or_setup in tree.tests_or_setups]
+            assert (first_test.start_line, first_test.end_line) == (1, 4)
+            assert (second_test.start_line, second_test.end_line) == (5, 5)
+            assert first_test.setup_assertions[0].assertion.line == 2
+            assert tree.line == 1
+
+    def test_parse_in_parallel(self):
+        """Test that blocks parsed in parallel build the same test suite"""
+        parser = _Parser()
+        text = '# Global setup\n$ alias hi="echo hi"\n\n'
+        text += ''.join(f'# Test number {i}\n$ hi\nhi\n\nfibonacci {i} => {i}\n\n' for i in range(20))
+        text += '# Teardown\n$ unalias hi\n'
+        opts = BatsppOpts(embedded_tests=False)
+        tokens, facts = lexer.tokenize_to_array(text, opts=opts)
+        blocks = parser.split_blocks(tokens, 4)
+        assert len(blocks) == 4
+        assert all(tokens.get(start).variant == TEST for start, _ in blocks[1:])
+        expected, _, _ = parser.parse(tokens, opts=opts, facts=facts)
+        result, _, _ = parser.parse_in_parallel(tokens, opts=opts, workers=2, facts=facts)
+        assert len(result.tests_or_setups) == len(expected.tests_or_setups) == 40
+        assert result.global_setup is not None and result.global_teardown is not None
+        for test_or_setup, expected_test_or_setup in zip(result.tests_or_setups, expected.tests_or_setups):
+            assert type(test_or_setup.child) is type(expected_test_or_setup.child)
+            assert test_or_setup.line == expected_test_or_setup.line
+
+    def test_parse_in_parallel_syntax_error(self):
+        """Test that syntax errors of blocks parsed in parallel are the same"""
+        parser = _Parser()
+        text = ''.join(f'# Test number {i}\n$ echo {i}\n{i}\n\n' for i in range(10))
+        text += '# Test without assertion\n\n# Test last\n$ echo last\nlast\n'
+        messages = []
+        for workers in (1, 2):
+            opts = BatsppOpts(embedded_tests=False)
+            tokens, facts = lexer.tokenize(text, opts=opts)
+            with pytest.raises(SyntaxError) as exc_info:
+                parser.parse_in_parallel(tokens, opts=opts, workers=workers, facts=facts)
+            messages.append(str(exc_info.value))
+        assert messages[0] == messages[1]
+
+    def test_paused_gc(self):
+        """Test that the garbage collector is enabled again after the last pause ends"""
+        assert gc.isenabled()
+        first = paused_gc()
+        second = paused_gc()
+        first.__enter__()
+        second.__enter__()
+        # NOTE: pauses of threads could end in any order
+        first.__exit__(None, None, None)
+        assert not gc.isenabled()
+        second.__exit__(None, None, None)
+        assert gc.isenabled()
+
 if __name__ == '__main__':
     debug.trace_current_context()
     pytest.main([__file__])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#
+# Tests for _parser_generator module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_parser_generator.py
+#
+
+"""Tests for _parser_generator module"""
+
+# Standard packages
+from sys import path as sys_path
+from os import path as os_path
+from glob import glob
+from tempfile import mkdtemp
+
+# Installed packages
+import pytest
+from mezcla import debug
+from mezcla import glue_helpers as gh
+
+# Local packages
+sys_path.insert(0, './batspp')
+from batspp._ast_node import ASTnode
+from batspp._lexer import lexer
+from batspp._parser import _Parser
+from batspp._token import Token
+from batspp.batspp_opts import BatsppOpts
+
+# Reference to the module being tested
+import batspp._parser_generator as THE_MODULE
+
+# Constants
+TESTS_PATH = os_path.dirname(__file__)
+EXAMPLES_PATH = f'{TESTS_PATH}/../docs/examples'
+CASES_PATH = f'{TESTS_PATH}/cases'
+
+def dump_tree(node) -> 'tuple|list|None':
+    """Returns comparable representation of AST NODE"""
+    if isinstance(node, list):
+        return [dump_tree(child) for child in node]
+    if isinstance(node, Token):
+        return (node.variant, node.value, node.data.line, node.data.column)
+    if isinstance(node, ASTnode):
+        children = {name: dump_tree(child) for name, child in node.children().items()}
+        span = (getattr(node, 'start_line', None), getattr(node, 'end_line', None))
+        return (type(node).__name__, span, children)
+    return node
+
+class TestParserGenerator:
+    """Class for testcase definition"""
+
+    def test_same_tree_as_interpreted_grammar(self):
+        """Ensure compiled grammars build the same trees"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestParserGenerator.test_same_tree_as_interpreted_grammar(); self={self}")
+        files = glob(f'{EXAMPLES_PATH}/*_example.batspp') + glob(f'{CASES_PATH}/*.batspp')
+        assert files
+        interpreted_parser = _Parser(compiled=False)
+        compiled_parser = _Parser(compiled=True)
+        for file in files:
+            for to_array in (False, True):
+                opts = BatsppOpts(embedded_tests=False)
+                tokenize = lexer.tokenize_to_array if to_array else lexer.tokenize
+                tokens, facts = tokenize(gh.read_file(file), opts=opts)
+                grammar = compiled_parser.get_compiled_grammar(
+                    opts.embedded_tests, facts.has_arrow_assertion, facts.greater_token_present)
+                expected, _, _ = interpreted_parser.parse(tokens, opts=opts, facts=facts)
+                result, _, _ = compiled_parser.parse(tokens, opts=opts, facts=facts)
+                store = tokens if to_array else THE_MODULE.TokenList(tokens)
+                assert grammar.parse(store) is not None
+                assert dump_tree(result) == dump_tree(expected)
+
+    def test_syntax_error(self):
+        """Ensure syntax errors are the same of the interpreted grammar"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestParserGenerator.test_syntax_error(); self={self}")
+        text = '$ echo hi\nhi\n\n# Test some title\n'
+        messages = []
+        for parser in (_Parser(compiled=False), _Parser(compiled=True)):
+            opts = BatsppOpts(embedded_tests=False)
+            tokens, facts = lexer.tokenize(text, opts=opts)
+            with pytest.raises(SyntaxError) as exc_info:
+                parser.parse(tokens, opts=opts, facts=facts)
+            messages.append(str(exc_info.value))
+        assert messages[0] == messages[1]
+
+    def test_generated_dir(self):
+        """Ensure generated source is written to disk"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestParserGenerator.test_generated_dir(); self={self}")
+        generated_dir = mkdtemp()
+        parser = _Parser(generated_dir=generated_dir)
+        compiled_grammar = parser.get_compiled_grammar(False, True, False)
+        assert parser.get_compiled_grammar(False, True, False) is compiled_grammar
+        assert gh.read_file(f'{generated_dir}/grammar_0_1_0.py') == compiled_grammar.source
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
@@ -17,14 +17,66 @@ from mezcla import debug
 
 # Local packages
 sys_path.insert(0, './batspp')
+from batspp._lexer import lexer
+from batspp._parser import parser
+from batspp.batspp_args import BatsppArgs
+from batspp.batspp_opts import BatsppOpts
 
 # Reference to the module being tested
-import batspp._exceptions as THE_MODULE
+import batspp._semantic_analizer as THE_MODULE
 
 class TestSemanticAnalizer:
     """Class for testcase definition"""
 
-    ## TODO: WORK-IN-PROGRESS
+    @staticmethod
+    def analize(text:str) -> 'TestSuite':
+        """Return analized tree of TEXT"""
+        opts = BatsppOpts(embedded_tests=False)
+        args = BatsppArgs()
+        tokens, facts = lexer.tokenize(text, opts=opts, args=args)
+        tree, opts, args = parser.parse(tokens, opts=opts, args=args, facts=facts)
+        tree, _, _ = THE_MODULE.semantic_analizer.analize(tree, opts=opts, args=args)
+        return tree
+
+    def test_merged_entities_into_tests(self):
+        """Ensure setups and continuations are merged into their tests"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestSemanticAnalizer.test_merged_entities_into_tests(); self={self}")
+        tree = self.analize(
+            '# Test first\n$ echo 1\n1\n\n'
+            '# Test second\n$ echo 2\n2\n\n'
+            '# Setup of first\n$ a=1\n\n'
+            '# Setup of second\n$ b=2\n\n'
+            '# Setup of first\n$ c=3\n\n'
+            '# Continuation of first\n$ echo $a$c\n13\n\n'
+            '# Continuation of second\n$ echo $b\n2\n\n'
+            )
+        assert [test.reference.reference.value for test in tree.tests_or_setups] == ['first', 'second']
+        first, second = tree.tests_or_setups
+        assert len(first.setup_assertions) == 2
+        assert len(second.setup_assertions) == 2
+        commands = first.setup_assertions[1].setup.commands.commands
+        assert [command.command.value for command in commands] == ['a=1', 'c=3']
+
+    def test_referenced_before_assignment(self):
+        """Ensure references to later tests are reported"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestSemanticAnalizer.test_referenced_before_assignment(); self={self}")
+        with pytest.raises(SyntaxError, match='Continuation "first" referenced before assignment'):
+            self.analize('# Continuation of first\n$ echo 1\n1\n\n# Test first\n$ echo 1\n1\n')
+        with pytest.raises(SyntaxError, match='Setup "first" referenced before assignment'):
+            self.analize('# Setup of first\n$ a=1\n\n# Test first\n$ echo 1\n1\n')
+
+    def test_setups_without_porpuse(self):
+        """Ensure setups not followed by their tests are reported"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestSemanticAnalizer.test_setups_without_porpuse(); self={self}")
+        with pytest.raises(SyntaxError, match='in line 5\nin line 8'):
+            self.analize(
+                '# Test first\n$ echo 1\n1\n\n'
+                '# Setup of first\n$ a=1\n\n'
+                '# Setup of first\n$ b=2\n'
+                )
 
 if __name__ == '__main__':
     debug.trace_current_context()
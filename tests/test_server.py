@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# Tests for _server module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_server.py
+#
+
+"""Tests for _server module"""
+
+# Standard packages
+import os
+import socket
+import sys
+from stat import S_IMODE
+from sys import path as sys_path
+from tempfile import mkdtemp
+from threading import Thread
+
+# Installed packages
+import pytest
+from mezcla import debug
+
+# Local packages
+sys_path.insert(0, './batspp')
+## NOTE: this is empty for now
+
+# Reference to the module being tested
+import batspp._server as THE_MODULE
+
+def run_command() -> None:
+    """Print the request received by the server, then exit with status 3"""
+    print(f'argv={sys.argv[1:]} cwd={os.getcwd()} var={os.environ.get("SOME_VAR")}')
+    sys.exit(3)
+
+class TestServer:
+    """Class for testcase definition"""
+
+    def test_forward(self, monkeypatch, capfd):
+        """Ensure forward runs the command on the server with the client arguments, directory, environment and streams"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestServer.test_forward(); self={self}")
+        directory = os.path.realpath(mkdtemp())
+        socket_path = f'{directory}/batspp.sock'
+        server = THE_MODULE.Server(socket_path, run_command)
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            assert S_IMODE(os.stat(socket_path).st_mode) == 0o600
+            monkeypatch.chdir(directory)
+            monkeypatch.setenv('SOME_VAR', 'some value')
+            assert THE_MODULE.forward(socket_path, ['--output', 'some file']) == 3
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        out = capfd.readouterr().out
+        assert f"argv=['--output', 'some file'] cwd={directory} var=some value" in out
+        assert not os.path.exists(socket_path)
+
+    def test_forward_without_server(self):
+        """Ensure forward fails if no server is listening"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestServer.test_forward_without_server(); self={self}")
+        socket_path = f'{mkdtemp()}/batspp.sock'
+        with pytest.raises(FileNotFoundError):
+            THE_MODULE.forward(socket_path, [])
+        # Stale socket, e.g. of a killed server
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(socket_path)
+        with pytest.raises(ConnectionRefusedError):
+            THE_MODULE.forward(socket_path, [])
+        server = THE_MODULE.Server(socket_path, run_command)
+        try:
+            with pytest.raises(OSError, match='already listening'):
+                THE_MODULE.Server(socket_path, run_command)
+        finally:
+            server.server_close()
+
+    def test_forward_to_another_user(self, monkeypatch):
+        """Ensure forward refuses a server run by another user, before sending the request"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestServer.test_forward_to_another_user(); self={self}")
+        socket_path = f'{mkdtemp()}/batspp.sock'
+        server = THE_MODULE.Server(socket_path, run_command)
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        monkeypatch.setattr(THE_MODULE, 'peer_uid', lambda connection: os.getuid() + 1)
+        monkeypatch.setattr(THE_MODULE, 'send_request', lambda *args: pytest.fail('request sent'))
+        try:
+            with pytest.raises(PermissionError, match='another user'):
+                THE_MODULE.forward(socket_path, [])
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    def test_private_directory(self):
+        """Ensure private_directory creates a directory only accessible by the user and refuses shared ones"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestServer.test_private_directory(); self={self}")
+        directory = f'{mkdtemp()}/batspp'
+        THE_MODULE.private_directory(directory)
+        assert S_IMODE(os.stat(directory).st_mode) == 0o700
+        THE_MODULE.private_directory(directory)
+        os.chmod(directory, 0o755)
+        with pytest.raises(PermissionError, match='accessible by other users'):
+            THE_MODULE.private_directory(directory)
+        link = f'{directory}.link'
+        os.symlink(directory, link)
+        with pytest.raises(PermissionError, match='not a directory'):
+            THE_MODULE.private_directory(link)
+
+    def test_exit_status(self, capsys):
+        """Ensure exit_status returns the status of the Python interpreter"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestServer.test_exit_status(); self={self}")
+        assert THE_MODULE.exit_status(SystemExit()) == 0
+        assert THE_MODULE.exit_status(SystemExit(2)) == 2
+        assert THE_MODULE.exit_status(SystemExit('some error')) == 1
+        assert 'some error' in capsys.readouterr().err
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+#
+# Tests for _source module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_source.py
+#
+
+"""Tests for _source module"""
+
+# Standard packages
+from sys import path as sys_path
+
+# Installed packages
+import pytest
+from mezcla import debug
+from mezcla import glue_helpers as gh
+
+# Local packages
+sys_path.insert(0, './batspp')
+
+# Reference to the module being tested
+import batspp._source as THE_MODULE
+
+class TestMappedSource:
+    """Class for testcase definition"""
+
+    def map_content(self, content:str) -> THE_MODULE.MappedSource:
+        """Save CONTENT to a temporal file and map it"""
+        temp_file = gh.get_temp_file()
+        with open(temp_file, 'w', encoding='utf-8', newline='') as file:
+            file.write(content)
+        return THE_MODULE.MappedSource(temp_file)
+
+    def test_lines(self):
+        """Ensure lines are the same as str.splitlines()"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestMappedSource.test_lines(); self={self}")
+        contents = [
+            '',
+            '\n',
+            'single line',
+            '$ echo "hello"\nhello\n\n# Test\n',
+            'windows\r\nold mac\rform\x0cfeed\n',
+            'unicode ñ  separator\u0085next\n',
+            ]
+        for content in contents:
+            source = self.map_content(content)
+            assert list(source) == content.splitlines()
+            assert len(source) == len(content.splitlines())
+
+    def test_line_span(self):
+        """Ensure line spans are byte offsets"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestMappedSource.test_line_span(); self={self}")
+        source = self.map_content('ab\r\nñc\nd')
+        assert source.line_span(0) == (0, 2)
+        assert source.line_span(1) == (4, 7)
+        assert source.line_span(2) == (8, 9)
+        assert source[1] == 'ñc'
+
+    def test_read(self):
+        """Ensure read() returns content with universal newlines"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestMappedSource.test_read(); self={self}")
+        source = self.map_content('a\r\nb\rc\n')
+        assert source.read() == 'a\nb\nc\n'
+
+    def test_close(self):
+        """Ensure the mapping is released by close() or the context manager"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestMappedSource.test_close(); self={self}")
+        with self.map_content('a\nb\n') as source:
+            assert list(source) == ['a', 'b']
+            content = source._content
+        assert content.closed
+        assert len(source) == 0
+        source.close()
+        empty = self.map_content('')
+        empty.close()
+        assert len(empty) == 0
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+#
+# Tests for _trace module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_trace.py
+#
+
+"""Tests for _trace module"""
+
+# Standard packages
+import sys
+from sys import path as sys_path
+
+# Installed packages
+import pytest
+from mezcla import debug
+
+# Local packages
+sys_path.insert(0, './batspp')
+from batspp._lexer import lexer
+from batspp.batspp_args import BatsppArgs
+from batspp.batspp_opts import BatsppOpts
+
+# Reference to the module being tested
+import batspp._trace as THE_MODULE
+
+class TestTrace:
+    """Class for testcase definition"""
+
+    def test_trace(self, monkeypatch, capsys):
+        """Ensure lazy messages are only built if the level is traced"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestTrace.test_trace(); self={self}")
+        built = []
+        def message():
+            built.append(True)
+            return 'some message'
+        monkeypatch.setattr(debug, 'trace_level', 3)
+        assert not THE_MODULE.tracing(7)
+        THE_MODULE.trace(7, message)
+        assert not built
+        assert 'some message' not in capsys.readouterr().err
+        monkeypatch.setattr(debug, 'trace_level', 7)
+        assert THE_MODULE.tracing(7)
+        THE_MODULE.trace(7, message)
+        THE_MODULE.trace(7, 'plain message')
+        assert built == [True]
+        err = capsys.readouterr().err
+        assert 'some message' in err
+        assert 'plain message' in err
+
+    def test_trace_without_debug(self, monkeypatch):
+        """Ensure mezcla.debug is only imported to print traces"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestTrace.test_trace_without_debug(); self={self}")
+        monkeypatch.delitem(sys.modules, 'mezcla.debug')
+        monkeypatch.setattr(THE_MODULE, 'INITIAL_TRACE_LEVEL', 2)
+        assert THE_MODULE.trace_level() == 2
+        assert not THE_MODULE.tracing(5)
+        THE_MODULE.trace(5, 'some message')
+        assert 'mezcla.debug' not in sys.modules
+        monkeypatch.setenv('DEBUG_LEVEL', '6')
+        assert THE_MODULE._initial_trace_level() == 6
+        monkeypatch.setenv('DEBUG_LEVEL', 'wrong')
+        assert THE_MODULE._initial_trace_level() == 2
+
+    def test_tokenize_traced(self, monkeypatch, capsys):
+        """Ensure the pipeline traces are still printed when enabled"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestTrace.test_tokenize_traced(); self={self}")
+        monkeypatch.setattr(debug, 'trace_level', 7)
+        lexer.tokenize('$ echo hi\nhi\n', BatsppOpts(), BatsppArgs())
+        err = capsys.readouterr().err
+        assert 'Lexer.push_token(' in err
+        assert 'Lexer.tokenize(text=$ echo hi' in err
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+#
+# Tests for _watcher module
+#
+# This test must be runned with the command:
+# $ PYTHONPATH="$(pwd):$PYTHONPATH" ./tests/test_watcher.py
+#
+
+"""Tests for _watcher module"""
+
+# Standard packages
+import os
+from sys import path as sys_path
+from tempfile import mkdtemp
+
+# Installed packages
+import pytest
+from mezcla import debug
+
+# Local packages
+sys_path.insert(0, './batspp')
+## NOTE: this is empty for now
+
+# Reference to the module being tested
+import batspp._watcher as THE_MODULE
+
+def write_file(file:str, text:str) -> None:
+    """Write TEXT to FILE"""
+    with open(file, 'w', encoding='utf-8') as handle:
+        handle.write(text)
+
+class TestFileWatcher:
+    """Class for testcase definition"""
+
+    @pytest.mark.parametrize('inotify', [True, False])
+    def test_wait(self, monkeypatch, inotify):
+        """Ensure changes of the watched files are returned, saved in place or replaced"""
+        debug.trace(debug.QUITE_DETAILED,
+                    f"TestFileWatcher.test_wait(); self={self}")
+        if not inotify:
+            monkeypatch.setattr(THE_MODULE, '_inotify_init', lambda directories: None)
+        directory = mkdtemp()
+        watched = f'{directory}/watched.batspp'
+        other = f'{directory}/other.batspp'
+        write_file(watched, 'some text')
+        with THE_MODULE.FileWatcher([watched], poll_interval=0.01) as watcher:
+            assert watcher.wait(timeout=0.05) == set()
+            write_file(other, 'other text')
+            assert watcher.wait(timeout=0.05) == set()
+            write_file(watched, 'changed text')
+            assert watcher.wait(timeout=5) == {watched}
+            write_file(f'{watched}.tmp', 'replaced text')
+            os.rename(f'{watched}.tmp', watched)
+            assert watcher.wait(timeout=5) == {watched}
+
+if __name__ == '__main__':
+    debug.trace_current_context()
+    pytest.main([__file__])
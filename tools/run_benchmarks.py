@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+#
+# Run benchmarks
+#
+# Usage examples:
+#   $ run_benchmarks.py
+#   $ run_benchmarks.py lexer --repeat 10
+#
+
+"""
+Run benchmarks
+
+This measures the cost of the transpilation stages
+on docs/examples and on synthetic large inputs.
+"""
+
+# Standard packages
+import argparse
+import compileall
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stderr
+from tempfile import mkdtemp
+from os import path as os_path
+from glob import glob
+
+# Installed packages
+from mezcla import debug
+
+# Local packages
+BASE_PATH = os_path.join(os_path.dirname(os_path.realpath(__file__)), '..')
+sys.path.insert(0, BASE_PATH)
+from batspp._cache import AstCache
+from batspp._incremental import IncrementalParser
+from batspp._lexer import Lexer
+from batspp._parser import _Parser
+from batspp._bats_interpreter import BatsInterpreter
+from batspp._node_visitor import walk
+from batspp._semantic_analizer import semantic_analizer
+from batspp.batspp_args import BatsppArgs
+from batspp.batspp_opts import BatsppOpts
+from batspp.batspp_test import BatsppTest
+
+EXAMPLES_PATH = os_path.join(BASE_PATH, 'docs', 'examples')
+CASES_PATH = os_path.join(BASE_PATH, 'tests', 'cases')
+
+def build_synthetic_suite(tests:int) -> str:
+    """Build a synthetic Batspp suite with TESTS tests"""
+    result = '# Global Setup\n$ alias count-words="wc -w"\n\n'
+    for i in range(tests):
+        result += (
+            f'# Test number {i}\n'
+            f'$ echo "hello world {i}" | count-words\n'
+            '3\n\n'
+            f'$ printf "line one\\nline two\\n" # comment {i}\n'
+            'line one\n'
+            'line two\n\n'
+            f'fibonacci {i % 10} => some expected output\n\n'
+            )
+        if i % 10 == 0:
+            result += (
+                f'# Continuation of number {i}\n'
+                f'$ echo "continued {i}"\n'
+                f'continued {i}\n\n'
+                )
+    return result
+
+def build_references_suite(tests:int) -> str:
+    """Build a synthetic Batspp suite with TESTS tests, followed by
+       the setups and the continuations that reference them"""
+    result = ''.join(f'# Test number {i}\n$ echo {i}\n{i}\n\n' for i in range(tests))
+    result += ''.join(f'# Setup of number {i}\n$ value={i}\n\n' for i in range(tests))
+    result += ''.join(f'# Continuation of number {i}\n$ echo $value\n{i}\n\n' for i in range(tests))
+    return result
+
+def load_examples(cases:bool=False) -> dict:
+    """Returns the content of docs/examples test files by name,
+       and of tests/cases too if CASES is True"""
+    result = {}
+    examples = glob(os_path.join(EXAMPLES_PATH, '*_example.batspp'))
+    examples += glob(os_path.join(EXAMPLES_PATH, '*_example.bash'))
+    if cases:
+        examples += glob(os_path.join(CASES_PATH, '*.batspp'))
+    for example in sorted(examples):
+        with open(example, encoding='utf-8') as file:
+            result[os_path.basename(example)] = file.read()
+    return result
+
+def measure(func, repeat:int) -> float:
+    """Returns the best time of FUNC running REPEAT times"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def print_row(name:str, *columns) -> None:
+    """Print a benchmark table row"""
+    print(f'{name:<32}' + ''.join(f'{column:>16}' for column in columns))
+
+def benchmark_lexer(repeat:int) -> None:
+    """Compare the master-pattern lexer against the legacy lexer"""
+    inputs = load_examples()
+    for tests in (1000, 10000):
+        inputs[f'synthetic ({tests} tests)'] = build_synthetic_suite(tests)
+
+    print_row('lexer', 'legacy (s)', 'master (s)', 'speedup')
+    for name, text in inputs.items():
+        embedded_tests = name.endswith('.bash')
+        def tokenize(legacy, text=text, embedded_tests=embedded_tests):
+            opts = BatsppOpts(embedded_tests=embedded_tests)
+            Lexer(legacy_extraction=legacy).tokenize(text, opts=opts)
+        legacy_time = measure(lambda: tokenize(True), repeat)
+        master_time = measure(lambda: tokenize(False), repeat)
+        print_row(name, f'{legacy_time:.5f}', f'{master_time:.5f}', f'x{legacy_time / master_time:.2f}')
+
+def measure_memory(func) -> int:
+    """Returns the size in bytes of the object returned by FUNC"""
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def benchmark_tokens_memory(repeat:int) -> None:
+    """Compare memory of a list of tokens against a token array"""
+    # pylint: disable=unused-argument
+    print_row('tokens memory', 'tokens', 'list (B/tok)', 'array (B/tok)')
+    for tests in (1000, 10000):
+        text = build_synthetic_suite(tests)
+        opts = BatsppOpts(embedded_tests=False)
+        count = len(Lexer().tokenize(text, opts=opts)[0])
+        list_size = measure_memory(lambda: Lexer().tokenize(text, opts=opts)[0])
+        array_size = measure_memory(lambda: Lexer().tokenize_to_array(text, opts=opts)[0])
+        print_row(f'synthetic ({tests} tests)', count, f'{list_size / count:.1f}', f'{array_size / count:.1f}')
+
+def build_suite_of_tokens(tokens:int) -> str:
+    """Build a synthetic Batspp suite with about TOKENS tokens"""
+    opts = BatsppOpts(embedded_tests=False)
+    sample_tests = 100
+    sample_tokens = len(Lexer().tokenize(build_synthetic_suite(sample_tests), opts=opts)[0])
+    return build_synthetic_suite(max(1, tokens * sample_tests // sample_tokens))
+
+def benchmark_parser_scaling(repeat:int) -> None:
+    """Measure parser time per token on growing inputs, this
+       should stay flat while the parser is linear, with and
+       without predictive parsing"""
+    print_row('parser scaling', 'tokens', 'backtrack (s)', 'predictive (s)', 'us/token')
+    for tokens in (1000, 10000, 100000):
+        text = build_suite_of_tokens(tokens)
+        opts = BatsppOpts(embedded_tests=False)
+        array, facts = Lexer().tokenize_to_array(text, opts=opts)
+        backtracking_time = measure(lambda: _Parser(predictive=False, compiled=False).parse(array, opts=opts, facts=facts), repeat)
+        predictive_time = measure(lambda: _Parser(predictive=True, compiled=False).parse(array, opts=opts, facts=facts), repeat)
+        print_row(
+            f'synthetic ({tokens} tokens)', len(array),
+            f'{backtracking_time:.5f}', f'{predictive_time:.5f}',
+            f'{predictive_time / len(array) * 1e6:.2f}',
+            )
+
+def benchmark_parser_memo(repeat:int) -> None:
+    """Compare the parser with and without packrat memoization"""
+    inputs = load_examples()
+    inputs['synthetic (10000 tokens)'] = build_suite_of_tokens(10000)
+    print_row('parser memo', 'no memo (s)', 'memo (s)', 'hits', 'hit rate')
+    for name, text in inputs.items():
+        opts = BatsppOpts(embedded_tests=name.endswith('.bash'))
+        array, facts = Lexer().tokenize_to_array(text, opts=opts)
+        try:
+            plain_time = measure(lambda: _Parser(memoize=False, compiled=False).parse(array, opts=opts, facts=facts), repeat)
+        except SyntaxError:
+            print_row(name, 'syntax error')
+            continue
+        memo_parser = _Parser(memoize=True, compiled=False)
+        memo_time = measure(lambda: memo_parser.parse(array, opts=opts, facts=facts), repeat)
+        memo = memo_parser.last_memo
+        print_row(name, f'{plain_time:.5f}', f'{memo_time:.5f}', memo.hits, f'{memo.hit_rate():.1%}')
+
+def benchmark_grammar_cache(repeat:int) -> None:
+    """Compare parsing many small files building
+       the grammar every time against a cached grammar"""
+    files = 1000
+    text = load_examples()['batspp_example.batspp']
+    opts = BatsppOpts(embedded_tests=False)
+    array, facts = Lexer().tokenize_to_array(text, opts=opts)
+    def parse_files(parser=None):
+        for _ in range(files):
+            (parser or _Parser()).parse(array, opts=opts, facts=facts)
+    uncached_time = measure(parse_files, repeat)
+    cached_time = measure(lambda: parse_files(_Parser()), repeat)
+    print_row('grammar cache', 'rebuilt (s)', 'cached (s)', 'speedup')
+    print_row(f'batspp_example.batspp x{files}', f'{uncached_time:.5f}', f'{cached_time:.5f}', f'x{uncached_time / cached_time:.2f}')
+
+def benchmark_parser_compiled(repeat:int) -> None:
+    """Compare the interpreted grammar against the compiled grammar"""
+    inputs = load_examples(cases=True)
+    long_outputs = inputs['5_long_outputs.batspp']
+    inputs['5_long_outputs.batspp x100'] = ''.join(f'# Test {i}\n{long_outputs}\n' for i in range(100))
+    inputs['synthetic (10000 tokens)'] = build_suite_of_tokens(10000)
+    print_row('parser compiled', 'interpreted (s)', 'compiled (s)', 'speedup')
+    interpreted_parser = _Parser(compiled=False)
+    compiled_parser = _Parser(compiled=True)
+    for name, text in inputs.items():
+        opts = BatsppOpts(embedded_tests=name.endswith('.bash'))
+        array, facts = Lexer().tokenize_to_array(text, opts=opts)
+        try:
+            interpreted_time = measure(lambda: interpreted_parser.parse(array, opts=opts, facts=facts), repeat)
+        except SyntaxError:
+            print_row(name, 'syntax error')
+            continue
+        compiled_time = measure(lambda: compiled_parser.parse(array, opts=opts, facts=facts), repeat)
+        print_row(name, f'{interpreted_time:.5f}', f'{compiled_time:.5f}', f'x{interpreted_time / compiled_time:.2f}')
+
+def benchmark_parser_parallel(repeat:int) -> None:
+    """Compare parsing large files in this process against
+       parsing blocks of tests in a pool of processes"""
+    workers = max(2, os.cpu_count() or 1)
+    print_row(f'parser parallel ({workers} workers)', 'tokens', 'serial (s)', 'parallel (s)', 'speedup')
+    for tests in (5000, 20000):
+        text = build_synthetic_suite(tests)
+        opts = BatsppOpts(embedded_tests=False)
+        array, facts = Lexer().tokenize_to_array(text, opts=opts)
+        parser = _Parser()
+        serial_time = measure(lambda: parser.parse(array, opts=opts, facts=facts), repeat)
+        parallel_time = measure(lambda: parser.parse_in_parallel(array, opts=opts, workers=workers, facts=facts), repeat)
+        print_row(
+            f'synthetic ({tests} tests)', len(array),
+            f'{serial_time:.5f}', f'{parallel_time:.5f}', f'x{serial_time / parallel_time:.2f}',
+            )
+
+def benchmark_ast_cache(repeat:int) -> None:
+    """Compare lexing and parsing files against loading their cached trees"""
+    cache = AstCache(mkdtemp())
+    print_row('ast cache', 'parsed (s)', 'cached (s)', 'speedup')
+    for tests in (1000, 10000):
+        path = os_path.join(cache.directory, f'synthetic_{tests}.batspp')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(build_synthetic_suite(tests))
+        def parse(path=path):
+            with open(path, encoding='utf-8') as file:
+                opts = BatsppOpts(embedded_tests=False)
+                array, facts = Lexer().tokenize_to_array(file.read(), opts=opts)
+            return _Parser().parse(array, opts=opts, facts=facts)
+        parsed_time = measure(parse, repeat)
+        tree, opts, _ = parse()
+        key = cache.key(path, opts)
+        cache.store(key, tree)
+        cached_time = measure(lambda path=path: cache.load(cache.key(path, opts)), repeat)
+        print_row(f'synthetic ({tests} tests)', f'{parsed_time:.5f}', f'{cached_time:.5f}', f'x{parsed_time / cached_time:.2f}')
+
+def benchmark_output_cache(repeat:int) -> None:
+    """Compare transpiling files against loading their cached output"""
+    directory = mkdtemp()
+    print_row('output cache', 'transpiled (s)', 'cached (s)', 'speedup')
+    for tests in (1000, 10000):
+        path = os_path.join(directory, f'synthetic_{tests}.batspp')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(build_synthetic_suite(tests))
+        def transpile(cache_dir, path=path):
+            args = BatsppArgs(temp_dir='/tmp', cache_dir=cache_dir)
+            BatsppTest().transpile_to_bats(path, args=args, opts=BatsppOpts())
+        transpiled_time = measure(lambda: transpile(''), repeat)
+        transpile(directory)
+        cached_time = measure(lambda: transpile(directory), repeat)
+        print_row(f'synthetic ({tests} tests)', f'{transpiled_time:.5f}', f'{cached_time:.5f}', f'x{transpiled_time / cached_time:.2f}')
+
+def benchmark_semantic_analizer(repeat:int) -> None:
+    """Measure semantic analysis time per test on growing suites
+       with heavy setup and continuation references, this
+       should stay flat while the analysis is linear"""
+    print_row('semantic analizer', 'tests', 'analysis (s)', 'us/test')
+    for tests in (1000, 4000, 16000):
+        opts = BatsppOpts(embedded_tests=False)
+        array, facts = Lexer().tokenize_to_array(build_references_suite(tests), opts=opts)
+        parser = _Parser()
+        def analize():
+            tree, _, args = parser.parse(array, opts=opts, args=BatsppArgs(), facts=facts)
+            start = time.perf_counter()
+            semantic_analizer.analize(tree, opts=opts, args=args)
+            return time.perf_counter() - start
+        analysis_time = min(analize() for _ in range(repeat))
+        print_row(f'references ({tests} tests)', tests, f'{analysis_time:.5f}', f'{analysis_time / tests * 1e6:.2f}')
+
+def benchmark_emitter_memory(repeat:int) -> None:
+    """Compare peak memory of interpreting into a string
+       against interpreting into a file as it is built"""
+    # pylint: disable=unused-argument
+    print_row('emitter memory', 'output (B)', 'string (B)', 'file (B)')
+    for tests in (1000, 10000):
+        opts = BatsppOpts(embedded_tests=False)
+        array, facts = Lexer().tokenize_to_array(build_synthetic_suite(tests), opts=opts)
+        tree, opts, args = _Parser().parse(array, opts=opts, args=BatsppArgs(), facts=facts)
+        tree, opts, args = semantic_analizer.analize(tree, opts=opts, args=args)
+        def peak_memory(func):
+            tracemalloc.start()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak
+        output_size = len(BatsInterpreter().interpret(tree, opts=opts, args=args))
+        string_peak = peak_memory(lambda: BatsInterpreter().interpret(tree, opts=opts, args=args))
+        with open(os.devnull, 'w', encoding='utf-8') as sink:
+            file_peak = peak_memory(lambda: BatsInterpreter().interpret_into(tree, sink, opts=opts, args=args))
+        print_row(f'synthetic ({tests} tests)', output_size, string_peak, file_peak)
+
+def benchmark_visitors(repeat:int) -> None:
+    """Measure the visitors, the semantic analysis and the interpretation"""
+    print_row('visitors', 'nodes', 'analysis (s)', 'interpret (s)')
+    for tests in (1000, 10000):
+        opts = BatsppOpts(embedded_tests=False)
+        array, facts = Lexer().tokenize_to_array(build_synthetic_suite(tests), opts=opts)
+        parser = _Parser()
+        analysis_time = interpret_time = None
+        for _ in range(repeat):
+            tree, opts, args = parser.parse(array, opts=opts, args=BatsppArgs(), facts=facts)
+            start = time.perf_counter()
+            tree, opts, args = semantic_analizer.analize(tree, opts=opts, args=args)
+            elapsed = time.perf_counter() - start
+            analysis_time = elapsed if analysis_time is None else min(analysis_time, elapsed)
+            with open(os.devnull, 'w', encoding='utf-8') as sink:
+                start = time.perf_counter()
+                BatsInterpreter().interpret_into(tree, sink, opts=opts, args=args)
+                elapsed = time.perf_counter() - start
+            interpret_time = elapsed if interpret_time is None else min(interpret_time, elapsed)
+        nodes = sum(1 for _ in walk(tree))
+        print_row(f'synthetic ({tests} tests)', nodes, f'{analysis_time:.5f}', f'{interpret_time:.5f}')
+
+def benchmark_incremental_parser(repeat:int) -> None:
+    """Compare parsing a file with one changed test from
+       scratch and reusing the parts of the previous version"""
+    print_row('incremental parser', 'full (s)', 'one changed (s)', 'speedup', 'parsed blocks')
+    opts = BatsppOpts(embedded_tests=False)
+    for tests in (1000, 3000):
+        text = build_synthetic_suite(tests)
+        changed_text = text.replace(f'hello world {tests // 2}"', f'hello world {tests // 2} changed"')
+        def parse():
+            tokens, facts = Lexer().tokenize(changed_text, opts=opts)
+            _Parser().parse(tokens, opts=opts, args=BatsppArgs(), facts=facts)
+        full_time = measure(parse, repeat)
+        incremental_parser = IncrementalParser()
+        def parse_changed():
+            # NOTE: the parse of the previous version isn't measured
+            incremental_parser.parse(text, opts=opts)
+            start = time.perf_counter()
+            incremental_parser.parse(changed_text, opts=opts)
+            return time.perf_counter() - start
+        changed_time = min(parse_changed() for _ in range(repeat))
+        print_row(f'synthetic ({tests} tests)', f'{full_time:.5f}', f'{changed_time:.5f}',
+                  f'x{full_time / changed_time:.2f}', incremental_parser.parsed_blocks)
+
+def benchmark_watch(repeat:int) -> None:
+    """Compare the first update of a watched file, running all the tests,
+       against an update after saving it with one changed test"""
+    print_row('watch (bash runner)', 'all tests (s)', 'one changed (s)', 'speedup')
+    directory = mkdtemp()
+    args = BatsppArgs(runner='bash', temp_dir=directory)
+    for tests in (10, 100):
+        path = os_path.join(directory, f'synthetic_{tests}.batspp')
+        text = build_synthetic_suite(tests)
+        def save(text, path=path):
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+        def update_all():
+            save(text)
+            session = BatsppTest().watch_session(path, args=args)
+            try:
+                session.update()
+            finally:
+                session.close()
+        all_time = measure(update_all, repeat)
+        session = BatsppTest().watch_session(path, args=args)
+        def update_changed(index):
+            # NOTE: the update of the previous version isn't measured
+            save(text)
+            session.update()
+            save(text.replace(f'hello world {index}"', f'hello world {index} changed"'))
+            start = time.perf_counter()
+            session.update()
+            return time.perf_counter() - start
+        try:
+            changed_time = min(update_changed(index) for index in range(repeat))
+        finally:
+            session.close()
+        print_row(f'synthetic ({tests} tests)', f'{all_time:.5f}', f'{changed_time:.5f}', f'x{all_time / changed_time:.2f}')
+
+def benchmark_tracing(repeat:int) -> None:
+    """Compare the transpilation pipeline with debug tracing
+       disabled and enabled, traces are written to /dev/null"""
+    print_row('tracing', 'disabled (s)', 'enabled (s)', 'overhead')
+    for tests in (100, 1000):
+        text = build_synthetic_suite(tests)
+        def transpile(text=text):
+            opts = BatsppOpts(embedded_tests=False)
+            tokens, facts = Lexer().tokenize(text, opts=opts)
+            tree, opts, args = _Parser().parse(tokens, opts=opts, args=BatsppArgs(), facts=facts)
+            tree, opts, args = semantic_analizer.analize(tree, opts=opts, args=args)
+            BatsInterpreter().interpret(tree, opts=opts, args=args)
+        level = debug.get_level()
+        try:
+            debug.set_level(debug.WARNING)
+            disabled_time = measure(transpile, repeat)
+            debug.set_level(debug.QUITE_VERBOSE)
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stderr(devnull):
+                enabled_time = measure(transpile, repeat)
+        finally:
+            debug.set_level(level)
+        print_row(f'synthetic ({tests} tests)', f'{disabled_time:.5f}', f'{enabled_time:.5f}', f'x{enabled_time / disabled_time:.2f}')
+
+def start_server(socket_path:str) -> subprocess.Popen:
+    """Start a Batspp server on SOCKET_PATH, returns once it's listening"""
+    server = subprocess.Popen(
+        [sys.executable, os_path.join(BASE_PATH, 'batspp', 'batspp'), '--serve', '--server_socket', socket_path],
+        env={**os.environ, 'PYTHONPATH': BASE_PATH},
+        stdout=subprocess.DEVNULL,
+        )
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(socket_path)
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError('Batspp server exited before listening')
+            time.sleep(0.01)
+
+def benchmark_server(repeat:int) -> None:
+    """Compare the latency of transpiling files running batspp (cold) against
+       forwarding the same arguments to a warm server with batsppc (warm)"""
+    directory = mkdtemp()
+    socket_path = os_path.join(directory, 'batspp.sock')
+    env = {**os.environ, 'PYTHONPATH': BASE_PATH, 'SERVER_SOCKET': socket_path}
+    paths = sorted(glob(os_path.join(EXAMPLES_PATH, '*_example.batspp')))
+    path = os_path.join(directory, 'synthetic_1000.batspp')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(build_synthetic_suite(1000))
+    paths.append(path)
+    server = start_server(socket_path)
+    print_row('server', 'cold (s)', 'warm (s)', 'speedup')
+    try:
+        for path in paths:
+            def transpile(script, path=path):
+                subprocess.run(
+                    [sys.executable, os_path.join(BASE_PATH, 'batspp', script), '--output', '--no_cache', path],
+                    env=env, stdout=subprocess.DEVNULL, check=True,
+                    )
+            cold_time = measure(lambda: transpile('batspp'), repeat)
+            warm_time = measure(lambda: transpile('batsppc'), repeat)
+            print_row(os_path.basename(path), f'{cold_time:.5f}', f'{warm_time:.5f}', f'x{cold_time / warm_time:.2f}')
+    finally:
+        server.terminate()
+        server.wait()
+
+# Budgets of the import time of the modules, measured in a new process (see
+# benchmark_import_time) as multiples of the import time of REFERENCE_MODULE
+# in the same run, so these hold on slower or faster machines, exceeding them
+# is a regression, e.g. importing mezcla or other heavy dependencies on the
+# transpilation path
+REFERENCE_MODULE = 're'
+IMPORT_TIME_BUDGETS = {
+    'batspp._lexer': 2.5,
+    'batspp._parser': 3.0,
+    'batspp._semantic_analizer': 3.0,
+    'batspp._bats_interpreter': 3.0,
+    'batspp._bash_interpreter': 3.0,
+    'batspp.batspp_test': 5.0,
+    'batspp._server': 4.0,
+    }
+
+def measure_import_time(module:str) -> float:
+    """Returns the cumulative import time in milliseconds
+       of MODULE in a new process, see python -X importtime"""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        env={**os.environ, 'PYTHONPATH': BASE_PATH},
+        stderr=subprocess.PIPE, text=True, check=True,
+        )
+    # NOTE: lines are "import time: self [us] | cumulative | imported package"
+    for line in process.stderr.splitlines():
+        _, cumulative, name = line.split('|')
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise RuntimeError(f'import time of {module} not found')
+
+def benchmark_import_time(repeat:int) -> bool:
+    """Compare the import time of the modules against their budgets, relative
+       to the import time of REFERENCE_MODULE, returns False if some module
+       exceeded its budget"""
+    # NOTE: the bytecode is written first, otherwise the compilation of the
+    #       modules is measured if stale (e.g. with PYTHONDONTWRITEBYTECODE)
+    compileall.compile_dir(os_path.join(BASE_PATH, 'batspp'), quiet=1)
+    reference_time = min(measure_import_time(REFERENCE_MODULE) for _ in range(repeat))
+    print_row('import time', 'time (ms)', f'x {REFERENCE_MODULE}', 'budget', 'status')
+    print_row(REFERENCE_MODULE, f'{reference_time:.2f}', 'x1.00', '', '')
+    result = True
+    for module, budget in IMPORT_TIME_BUDGETS.items():
+        import_time = min(measure_import_time(module) for _ in range(repeat))
+        ratio = import_time / reference_time
+        result = result and ratio <= budget
+        print_row(module, f'{import_time:.2f}', f'x{ratio:.2f}', f'x{budget:.2f}',
+                  'ok' if ratio <= budget else 'OVER BUDGET')
+    return result
+
+BENCHMARKS = {
+    'lexer': benchmark_lexer,
+    'tokens_memory': benchmark_tokens_memory,
+    'parser_scaling': benchmark_parser_scaling,
+    'parser_memo': benchmark_parser_memo,
+    'grammar_cache': benchmark_grammar_cache,
+    'parser_compiled': benchmark_parser_compiled,
+    'parser_parallel': benchmark_parser_parallel,
+    'ast_cache': benchmark_ast_cache,
+    'output_cache': benchmark_output_cache,
+    'semantic_analizer': benchmark_semantic_analizer,
+    'visitors': benchmark_visitors,
+    'incremental_parser': benchmark_incremental_parser,
+    'watch': benchmark_watch,
+    'emitter_memory': benchmark_emitter_memory,
+    'tracing': benchmark_tracing,
+    'server': benchmark_server,
+    'import_time': benchmark_import_time,
+    }
+
+def main() -> None:
+    """Process command-line and run requested benchmarks"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmarks', nargs='*',
+                        help=f'benchmarks to run {list(BENCHMARKS)}, all by default')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='times that every measure is repeated')
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark "{name}"')
+    failed = []
+    for name in args.benchmarks or BENCHMARKS:
+        # NOTE: benchmarks with budgets return False if exceeded
+        if BENCHMARKS[name](args.repeat) is False:
+            failed.append(name)
+        print()
+    if failed:
+        sys.exit(f'Benchmarks over budget: {", ".join(failed)}')
+
+if __name__ == '__main__':
+    main()